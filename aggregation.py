@@ -0,0 +1,301 @@
+import csv
+import io
+import json
+import math
+import random
+from array import array
+from functools import lru_cache
+from itertools import filterfalse, repeat
+from operator import itemgetter, mul, sub
+from sample_store import SampleColumns
+
+CSV_LINE_TERMINATOR = "\r\n"
+NUMBER_TYPES = {int, float}
+# Maps the missing values results hold to NaN, any other value to itself.
+MISSING_VALUES = {None: math.nan, "": math.nan}
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_BOOTSTRAP_RESAMPLES = 1000
+
+# Statistics written as labelled rows after the AVERAGES row, in this order.
+CSV_STATISTICS = ["median", "p90", "p95", "p99", "min", "max", "stdev", "cv", "ci_low", "ci_high"]
+
+def load_column(samples, key, default=None):
+    """Gets one field of every sample as a list, from inline samples or from the columnar store."""
+    if isinstance(samples, SampleColumns):
+        if key not in samples.columns:
+            return [default] * len(samples)
+        return samples.values(key)
+    return [sample.get(key, default) for sample in samples]
+
+def to_metric_array(values):
+    """
+    Loads the values of one metric into a contiguous float64 array.
+
+    Missing, empty and non-numeric values are stored as NaN, like in columnar samples. The
+    averages skip them together with zeros, the statistics only skip them.
+    """
+    if set(map(type, values)) <= NUMBER_TYPES:
+        return array("d", values)
+    try:
+        return array("d", map(MISSING_VALUES.get, values, values))
+    except TypeError:
+        # Other text, such as a label, is not a measurement either.
+        return array("d", (value if isinstance(value, (int, float)) else math.nan for value in values))
+
+def load_metric(samples, key, values=None):
+    """
+    Loads one metric of every sample into a float64 array, straight from the mapped file for columnar samples.
+
+    values is the column of inline samples when load_column already got it, it is not scanned again.
+    """
+    if isinstance(samples, SampleColumns):
+        column = samples.columns.get(key)
+        if column is None:
+            return to_metric_array([None]) * len(samples)
+        if column["encoding"] == "constant":
+            return to_metric_array([column["value"]]) * len(samples)
+        if column["encoding"] == "array":
+            return array("d", samples.column(key))
+    return to_metric_array(values if values is not None else load_column(samples, key))
+
+def get_present_values(metric):
+    """Returns the values of a metric array the aggregates use, skipping zeros and missing values."""
+    # NaN marks a missing value, filter(None) drops the zeros.
+    return list(filterfalse(math.isnan, filter(None, metric)))
+
+def get_measured_values(metric):
+    """Returns the values of a metric array that were measured, zeros included."""
+    return list(filterfalse(math.isnan, metric))
+
+def nonzero_mean(metric, divisor=1):
+    """Averages the non-zero values of a metric array, rounded to 2 decimals, or "" when there are none."""
+    values = get_present_values(metric)
+    return round(sum(values) / len(values) / divisor, 2) if values else ""
+
+def percentile(sorted_values, p):
+    """Returns the p-th percentile of sorted values, interpolating linearly between the closest ranks."""
+    position = (len(sorted_values) - 1) * p / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+@lru_cache(maxsize=64)
+def get_bootstrap_picker(count, resamples):
+    """
+    Gets a function that picks the values of every bootstrap resample of count values, one
+    resample after the other.
+
+    The generator is seeded and the picks are shared by every metric with as many values, so
+    converting the same results twice gives the same intervals. Up to 256 values the indices
+    are random bytes mapped onto the values in C, bytes that would bias the modulo are dropped.
+    """
+    rng = random.Random(0)
+    total = count * resamples
+    if count > 256:
+        return itemgetter(*rng.choices(range(count), k=total))
+    to_index = bytes(byte % count for byte in range(256))
+    biased = bytes(range(256 - 256 % count, 256))
+    indices = b""
+    while len(indices) < total:
+        indices += rng.randbytes(total).translate(to_index, biased)
+    return itemgetter(*indices[:total])
+
+def bootstrap_mean_ci(values, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Returns a percentile bootstrap confidence interval of the mean."""
+    count = len(values)
+    picks = iter(get_bootstrap_picker(count, resamples)(values))
+    # zip() over the same iterator cuts the picks into resamples, the sums stay in C.
+    sums = sorted(map(sum, zip(*[picks] * count)))
+    tail = (1 - confidence) / 2 * 100
+    return percentile(sums, tail) / count, percentile(sums, 100 - tail) / count
+
+def get_student_t_coverage(t, df):
+    """Returns P(|T| < t) of Student's t distribution with an integer df, in closed form."""
+    theta = math.atan(t / math.sqrt(df))
+    cos_sq = math.cos(theta) ** 2
+    if df % 2:
+        term, total = math.cos(theta), 0.0
+        for k in range(3, df + 1, 2):
+            total += term
+            term *= cos_sq * (k - 1) / k
+        return 2 / math.pi * (theta + math.sin(theta) * total) if df > 1 else 2 * theta / math.pi
+    term, total = 1.0, 0.0
+    for k in range(2, df + 1, 2):
+        total += term
+        term *= cos_sq * (k - 1) / k
+    return math.sin(theta) * total
+
+def get_student_t_quantile(confidence, df):
+    """Returns the t for which P(|T| < t) equals confidence, found by bisection."""
+    low, high = 0.0, 1.0
+    while get_student_t_coverage(high, df) < confidence:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if get_student_t_coverage(middle, df) < confidence:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+def student_t_mean_ci(values, confidence=DEFAULT_CONFIDENCE):
+    """Returns the Student-t confidence interval of the mean, which stays honest for a handful of values."""
+    count = len(values)
+    mean = math.fsum(values) / count
+    stdev = math.sqrt(math.fsum((value - mean) ** 2 for value in values) / (count - 1))
+    half_width = get_student_t_quantile(confidence, count - 1) * stdev / math.sqrt(count)
+    return mean - half_width, mean + half_width
+
+def get_distribution(metric, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Computes the unscaled statistics of a metric array, see describe_metric."""
+    values = sorted(get_measured_values(metric))
+    if not values:
+        return {"count": 0}
+    count = len(values)
+    mean = sum(values) / count
+    stdev = None
+    if count > 1:
+        deviations = list(map(sub, values, repeat(mean)))
+        stdev = math.sqrt(math.fsum(map(mul, deviations, deviations)) / (count - 1))
+    if values[0] == values[-1]:
+        # Every resample of equal values has the same mean.
+        ci_low = ci_high = values[0] if resamples and count > 1 else None
+    else:
+        ci_low, ci_high = bootstrap_mean_ci(values, confidence, resamples) if resamples else (None, None)
+    return {
+        "count": count,
+        "mean": mean,
+        "median": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "min": values[0],
+        "max": values[-1],
+        "stdev": stdev,
+        "cv": round(stdev / mean, 4) if stdev is not None and mean else None,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+    }
+
+def scale_distribution(distribution, divisor=1):
+    """Divides the statistics of a distribution by divisor and rounds them to 2 decimals."""
+    if not distribution["count"]:
+        return {"count": 0, **{name: None for name in ["mean", *CSV_STATISTICS]}}
+    return {
+        name: value if name in ("count", "cv") or value is None else round(value / divisor, 2)
+        for name, value in distribution.items()
+    }
+
+def describe_metric(metric, divisor=1, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """
+    Describes the distribution of a metric array.
+
+    Unlike the averages, which have always skipped zeros, a measured zero (an idle CPU sample)
+    is part of the distribution, only missing values are left out. resamples=0 leaves out the
+    confidence interval, for values that are not independent observations. Missing statistics
+    are None.
+    """
+    return scale_distribution(get_distribution(metric, confidence, resamples), divisor)
+
+def describe_columns(metrics, columns, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Describes every CSV column, columns maps a column to the metric it is computed from and a divisor."""
+    # Columns of one metric in other units (duration_ms and duration_s) share its distribution.
+    distributions = {}
+    descriptions = {}
+    for column, (metric, divisor) in columns.items():
+        if metric not in distributions:
+            distributions[metric] = get_distribution(metrics[metric], confidence, resamples)
+        descriptions[column] = scale_distribution(distributions[metric], divisor)
+    return descriptions
+
+def get_statistics_label(statistic, confidence=DEFAULT_CONFIDENCE):
+    """Gets the file_name label of a statistics row, e.g. MEDIAN or CI95_LOW."""
+    if statistic.startswith("ci_"):
+        return f"CI{round(confidence * 100)}_{statistic[3:].upper()}"
+    return statistic.upper()
+
+def get_statistics_rows(descriptions, suffix="", confidence=DEFAULT_CONFIDENCE, include_ci=True):
+    """Turns column descriptions into labelled CSV rows, one per statistic."""
+    rows = []
+    for statistic in CSV_STATISTICS:
+        if statistic.startswith("ci_") and not include_ci:
+            continue
+        row = {"file_name": f"{get_statistics_label(statistic, confidence)}{suffix}"}
+        for column, description in descriptions.items():
+            value = description[statistic]
+            row[column] = value if value is not None else ""
+        rows.append(row)
+    return rows
+
+def encode_summary(value, indent=""):
+    """
+    Encodes the summary JSON indented like indent=2, except that objects and lists holding no
+    others, such as the statistics of a column, stay on one line.
+
+    json only encodes in C without indent, this keeps the nesting readable at that speed.
+    """
+    inner = indent + "  "
+    if isinstance(value, dict) and any(isinstance(item, (dict, list)) for item in value.values()):
+        items = ",\n".join(f"{inner}{json.dumps(str(key))}: {encode_summary(item, inner)}" for key, item in value.items())
+        return f"{{\n{items}\n{indent}}}"
+    if isinstance(value, list) and any(isinstance(item, (dict, list)) for item in value):
+        items = ",\n".join(f"{inner}{encode_summary(item, inner)}" for item in value)
+        return f"[\n{items}\n{indent}]"
+    return json.dumps(value)
+
+def write_summary(path, summary):
+    """Writes the statistics of a converted results directory as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(encode_summary(summary))
+
+@lru_cache(maxsize=4096)
+def encode_text_cell(value):
+    """Quotes a text value exactly like the csv module does."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow([value, ""])
+    return buffer.getvalue()[:-1]
+
+def encode_cell(value):
+    """Formats one value as a CSV cell."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value) if value == value else ""
+    if isinstance(value, int):
+        return str(value)
+    return encode_text_cell(str(value))
+
+def encode_column(values):
+    """Formats the values of one column as CSV cells, numeric columns without a per-value type check."""
+    column_types = set(map(type, values))
+    if column_types <= NUMBER_TYPES | {bool}:
+        # repr() of a float is what the csv module writes, and equals str() for ints and bools.
+        return map(repr, values)
+    if column_types == {str}:
+        return map(encode_text_cell, values)
+    return map(encode_cell, values)
+
+def write_rows(csvfile, fieldnames, columns, constants, count):
+    """
+    Writes one CSV row per sample in bulk.
+
+    columns maps a field to the values of every sample, constants holds the fields shared by
+    every row. Each column is formatted once and the rows are joined without per-row dicts,
+    the output matches csv.DictWriter.
+    """
+    if count == 0:
+        return
+    cells = []
+    shared = None
+    for field in fieldnames:
+        if field in columns:
+            if shared is not None:
+                cells.append(repeat(",".join(shared), count))
+                shared = None
+            cells.append(encode_column(columns[field]))
+        else:
+            # Neighbouring shared fields are joined once, not once per row.
+            shared = (shared or []) + [encode_cell(constants.get(field, ""))]
+    if shared is not None:
+        cells.append(repeat(",".join(shared), count))
+    csvfile.write(CSV_LINE_TERMINATOR.join(map(",".join, zip(*cells))) + CSV_LINE_TERMINATOR)
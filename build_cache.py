@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_DIR = Path(".build_cache")
+
+# Build outputs and dependencies are not sources, the lockfiles stand in for node_modules.
+SOURCE_EXCLUDES = {"node_modules", "target", "dist", ".git", ".build_cache"}
+LOCKFILES = ["package-lock.json", "src-tauri/Cargo.lock"]
+
+def hash_project_sources(project_dir):
+    """Hashes the relative paths and contents of every source file in the project."""
+    project_dir = Path(project_dir)
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(project_dir):
+        dirs[:] = sorted(d for d in dirs if d not in SOURCE_EXCLUDES)
+        for file_name in sorted(files):
+            file_path = Path(root) / file_name
+            digest.update(file_path.relative_to(project_dir).as_posix().encode())
+            digest.update(b"\0")
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+def hash_lockfiles(project_dir):
+    """Hashes the lockfiles of the project, missing lockfiles hash as empty."""
+    hashes = {}
+    for lockfile in LOCKFILES:
+        lockfile_path = Path(project_dir) / lockfile
+        if lockfile_path.exists():
+            hashes[lockfile] = hashlib.sha256(lockfile_path.read_bytes()).hexdigest()
+        else:
+            hashes[lockfile] = None
+    return hashes
+
+def get_cache_key_inputs(project_type, project_dir, executable_type, build_commands, framework_versions):
+    """Collects everything that decides the content of a build."""
+    return {
+        "cache_format_version": CACHE_FORMAT_VERSION,
+        "project_type": project_type,
+        "executable_type": executable_type,
+        "sources": hash_project_sources(project_dir),
+        "lockfiles": hash_lockfiles(project_dir),
+        "toolchain": framework_versions,
+        "build_commands": build_commands,
+    }
+
+def compute_cache_key(key_inputs):
+    """Returns the content address for the given cache key inputs."""
+    return hashlib.sha256(json.dumps(key_inputs, sort_keys=True).encode()).hexdigest()
+
+def get_artifact_dir(project_type, src_dir, executable_type):
+    """Gets the directory that holds the runnable build."""
+    if project_type == "tauri":
+        return src_dir / "target" / executable_type
+    return src_dir / "dist" / "win-unpacked"
+
+def store_artifacts(cache_dir, key, key_inputs, artifact_dir, exe_path, top_level_only=False):
+    """
+    Copies the runnable build into the cache under its key.
+
+    Tauri executables embed their frontend, so only the top-level files of target/<type>/ are kept
+    (top_level_only) and the intermediate build directories are skipped.
+    Electron needs its whole unpacked directory.
+    """
+    entry_dir = Path(cache_dir) / key
+    staging_dir = Path(cache_dir) / f"{key}.tmp"
+    if staging_dir.exists():
+        shutil.rmtree(staging_dir)
+
+    if top_level_only:
+        staging_dir.mkdir(parents=True)
+        for entry in artifact_dir.iterdir():
+            if entry.is_file():
+                shutil.copy2(entry, staging_dir / entry.name)
+    else:
+        shutil.copytree(artifact_dir, staging_dir)
+
+    with open(staging_dir / "cache_entry.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "key": key,
+            "key_inputs": key_inputs,
+            "executable": exe_path.relative_to(artifact_dir).as_posix(),
+            "created_ms": time.time_ns() // 1_000_000,
+        }, f, indent=2)
+
+    # The rename makes a half written entry impossible to hit.
+    if entry_dir.exists():
+        shutil.rmtree(entry_dir)
+    staging_dir.rename(entry_dir)
+    return entry_dir
+
+def get_cached_executable(cache_dir, key):
+    """Returns the cached executable for the key, or None on a cache miss."""
+    entry_file = Path(cache_dir) / key / "cache_entry.json"
+    if not entry_file.exists():
+        return None
+    with open(entry_file, "r", encoding="utf-8") as f:
+        entry = json.load(f)
+    exe_path = entry_file.parent / entry["executable"]
+    return exe_path if exe_path.exists() else None
+
+def store_alias(cache_dir, key, target_key, exe_relative_path):
+    """Points the entry for key at the executable stored under target_key."""
+    alias_dir = Path(cache_dir) / key
+    alias_dir.mkdir(parents=True, exist_ok=True)
+    with open(alias_dir / "cache_entry.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "key": key,
+            "alias_of": target_key,
+            "executable": f"../{target_key}/{exe_relative_path}",
+            "created_ms": time.time_ns() // 1_000_000,
+        }, f, indent=2)
+
+def get_or_build_executable(cache_dir, get_key_inputs, artifact_dir, exe_path, build):
+    """
+    Returns the executable to launch for the given build, building it only on a cache miss.
+
+    get_key_inputs is called before and after building, because npm install may rewrite the
+    lockfile. The build is stored under the key of the state it leaves behind, and the key from
+    before the build is stored as an alias of it, so the next run hits either way.
+    build is called without arguments and returns True when the build succeeded.
+    Both hits and fresh builds are launched from the cache, so every iteration runs the same copy.
+    """
+    key = compute_cache_key(get_key_inputs())
+    cached_exe_path = get_cached_executable(cache_dir, key)
+    cache_info = {
+        "key": key,
+        "hit": cached_exe_path is not None,
+    }
+    if cached_exe_path is not None:
+        print(f"Build cache hit ({key[:12]}), skipping build.")
+        cache_info["executable"] = str(cached_exe_path)
+        return cached_exe_path, cache_info
+
+    print(f"Build cache miss ({key[:12]}), building.")
+    if not build() or not exe_path.exists():
+        print("Build failed, nothing stored in the build cache.")
+        cache_info["executable"] = str(exe_path)
+        return exe_path, cache_info
+
+    key_inputs = get_key_inputs()
+    built_key = compute_cache_key(key_inputs)
+    top_level_only = key_inputs["project_type"] == "tauri"
+    entry_dir = store_artifacts(cache_dir, built_key, key_inputs, artifact_dir, exe_path, top_level_only)
+    exe_relative_path = exe_path.relative_to(artifact_dir)
+    if built_key != key:
+        store_alias(cache_dir, key, built_key, exe_relative_path.as_posix())
+        cache_info["stored_key"] = built_key
+
+    cached_exe_path = entry_dir / exe_relative_path
+    cache_info["executable"] = str(cached_exe_path)
+    return cached_exe_path, cache_info
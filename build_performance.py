@@ -1,103 +1,26 @@
-import subprocess
 import time
 import json
 import shutil
 import argparse
 from pathlib import Path
-import platform
 import psutil
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from command_runner import ECHO_MODES, get_log_name, get_logs_dir, run_command
+from build_phases import BUILD_PHASE_MARKERS
+from cargo_timings import DEFAULT_TOP_CRATES, TIMINGS_ARG, add_timings_arg, describe_timings, ingest_timings
+from environment_probe import get_framework_versions, get_system_info
+from resource_accounting import DEFAULT_RESOURCE_INTERVAL_MS
+from result_writer import ResultWriter
+from stopping_rule import StoppingRule, add_iteration_arguments, get_iteration_plan
+from workspace_state import STATE_LINK_MODES, WorkspaceState, empty_trash, get_preconditions, get_state_paths, move_to_trash
 
 ITERATIONS = 5
+MIN_ITERATIONS = 3
 
-def get_cpu_model():
-    """Get the CPU model human readable value."""
-    try:
-        if platform.system() == "Windows":
-            output = subprocess.check_output("wmic cpu get Name", shell=True).decode()
-            lines = [line.strip() for line in output.splitlines() if line.strip()]
-            return lines[1] if len(lines) > 1 else "Unknown"
-        else:
-            return platform.processor() or "Unknown"
-    except Exception as e:
-        print(f"Error detecting CPU model: {e}")
-        return "Unknown"
-
-def get_system_info():
-    """
-    Get system info, like CPU, GPU, core and thread count etc.
-    Source: https://stackoverflow.com/questions/37825360/determine-what-gpu-is-running-through-wmi
-    """
-    try:
-        cpu = get_cpu_model()
-        cores = psutil.cpu_count(logical=False)
-        threads = psutil.cpu_count(logical=True)
-        ram = f"{round(psutil.virtual_memory().total / (1024**3))} GB"
-        os_info = f"{platform.system()} {platform.release()} ({platform.version()})"
-        try:
-            gpu = subprocess.check_output("wmic path win32_VideoController get name", shell=True).decode()
-            gpu = [line.strip() for line in gpu.splitlines() if line.strip()][1]
-        except Exception:
-            gpu = "Unknown"
-        return {
-            "os": os_info,
-            "cpu": cpu,
-            "ram": ram,
-            "gpu": gpu,
-            "cpu_cores": cores,
-            "cpu_threads": threads
-        }
-    except Exception as e:
-        print(f"System info error: {e}")
-        return {}
-
-def get_tool_version_with_cmd(cmd):
-    """Executes a version retrieval command and return the result."""
-    try:
-        return subprocess.check_output(cmd, shell=True).decode().strip()
-    except Exception:
-        return "Unknown"
-
-def get_framework_version_from_package_json(project_type, project_root_directory):
-    """Gets projects frameworks version from package.json."""
-    package_json_path = os.path.join(project_root_directory, "package.json")
-    try:
-        with open(package_json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        deps = data.get("dependencies", {})
-        dev_deps = data.get("devDependencies", {})
-        
-        if project_type == "tauri":
-            return deps.get("@tauri-apps/api") or dev_deps.get("@tauri-apps/api") or "Unknown"
-        elif project_type == "electronjs":
-            return deps.get("electron") or dev_deps.get("electron") or "Unknown"
-    except Exception:
-        return "Unknown"
-
-
-def get_framework_versions(project_type, project_root_directory):
-    """Get the versions for the project used tools."""
-    framework_version = get_framework_version_from_package_json(project_type, project_root_directory)
-    if project_type == "tauri":
-        return {
-            "tauri": framework_version,
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-            "cargo": get_tool_version_with_cmd("cargo --version").replace("cargo ", ""),
-            "rust": get_tool_version_with_cmd("rustc --version").replace("rustc ", ""),
-        }
-    elif project_type == "electronjs":
-        return {
-            "electron": framework_version,
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-        }
-    else:
-        return {
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-        }
-
+# Build outputs are never copied into worker workspaces, every test case recreates them.
+WORKSPACE_EXCLUDES = ["node_modules", "target", "dist"]
 
 def get_file_size(file_path):
     """Returns the size of the file in bytes."""
@@ -105,38 +28,67 @@ def get_file_size(file_path):
         return file_path.stat().st_size
     return 0
 
-def run_command(cmd, cwd):
-    """Executes a given cmd and outputs its stdout to the terminal."""
-    
-    print(f"\nRunning passed command: {cmd} (in {cwd})")
-    start_ms = time.time_ns() // 1_000_000
-    proc = subprocess.Popen(cmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    if proc.stdout:
-        for line in proc.stdout:
-            print(line, end='')
-    
-    proc.wait()
-    end_ms = time.time_ns() // 1_000_000 # From ns to ms.
-    return {
-        "cmd": cmd,
-        "cwd": str(cwd),
-        "start_ms": start_ms,
-        "end_ms": end_ms,
-        "duration_ms": end_ms - start_ms,
-        "success": proc.returncode == 0,
-    }
-    
 def delete_node_modules(project_dir):
     node_modules = Path(project_dir) / "node_modules"
     if node_modules.exists():
         print("Deleting node_modules...")
-        shutil.rmtree(node_modules)
+        move_to_trash(node_modules, project_dir)
 
 def delete_dist(project_dir):
     dist_directory = Path(project_dir) / "dist"
     if dist_directory.exists():
             print("Deleting dist directory...")
-            shutil.rmtree(dist_directory)
+            move_to_trash(dist_directory, project_dir)
+
+def split_cpu_sets(worker_count):
+    """Splits the logical CPUs into disjoint, equally sized sets, one per worker."""
+    cpus = list(range(psutil.cpu_count(logical=True)))
+    per_worker = len(cpus) // worker_count
+    if per_worker == 0:
+        print(f"Warning: {worker_count} workers for {len(cpus)} CPUs, workers are not pinned.")
+        return [None] * worker_count
+    return [cpus[i * per_worker:(i + 1) * per_worker] for i in range(worker_count)]
+
+def create_workspace(project_dir, workspace_dir, mode="copy"):
+    """
+    Creates an isolated copy of the project sources for a build worker.
+
+    Build outputs are left out. "hardlink" links the source files instead of copying them,
+    which is faster but shares files that a build rewrites in place with the original project.
+    """
+    project_dir = Path(project_dir)
+    workspace_dir = Path(workspace_dir)
+    workspace_dir.mkdir(parents=True, exist_ok=True)
+
+    # Drop stale sources from an earlier run. Build outputs (and src-tauri, which holds target)
+    # are kept, the test cases clean them as needed.
+    for entry in workspace_dir.iterdir():
+        if entry.name in WORKSPACE_EXCLUDES or entry.name == "src-tauri":
+            continue
+        if entry.is_dir():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+
+    def link_or_copy(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+    def replace_copy(src, dst):
+        if os.path.exists(dst):
+            os.unlink(dst)
+        return (link_or_copy if mode == "hardlink" else shutil.copy2)(src, dst)
+
+    shutil.copytree(
+        project_dir,
+        workspace_dir,
+        ignore=shutil.ignore_patterns(*WORKSPACE_EXCLUDES),
+        copy_function=replace_copy,
+        dirs_exist_ok=True,
+    )
+    return workspace_dir
 
 def get_build_file_sizes(project_type, src_dir, target_type):
     """Gets the file sizes of the .msi and .exe files for the given target type."""
@@ -182,21 +134,176 @@ def get_build_file_sizes(project_type, src_dir, target_type):
             "exe_size_bytes": 0
         }
         
+def get_build_duration_ms(iteration):
+    """Gets the key metric of a build iteration, the summed duration of the test case's build commands."""
+    durations = [step["duration_ms"] for step in iteration["steps"] if step["cmd"] in iteration.get("build_commands_used", [])]
+    return sum(durations) if durations else None
+
+def run_test_case(test_case, project_type, project_dir, result_dir, worker=None, state_link_mode=None, resume=False, iteration_plan=None, echo="throttled", resource_interval_ms=None, cargo_timings_top=None):
+    """
+    Runs the iterations of a build test case and writes its result file.
+
+    With a state_link_mode, the build state left by the first iteration is snapshotted and every
+    later iteration starts from the precondition the test case declares instead of from
+    whatever the previous iteration left behind. iteration_plan decides how many iterations
+    run, see StoppingRule. Command output goes to a log file per step, echo decides what of it
+    is printed. With resource_interval_ms, every step records the resources its process tree used.
+    With cargo_timings_top, tauri builds run cargo with --timings and record the slowest crates
+    and the critical path of the compile.
+    """
+    if project_type == "tauri":
+        src_dir = project_dir / "src-tauri"
+    elif project_type == "electronjs":
+        src_dir = project_dir
+
+    worker = worker or {"id": None, "cpus": None, "concurrency": 1}
+    label = f"worker {worker['id']}" if worker["id"] is not None else None
+
+    print(f"\n=== Running test case: {test_case['result_file_name']} ===")
+    writer = ResultWriter(result_dir, test_case["result_file_name"], resume=resume)
+    stopping_rule = StoppingRule("build_duration_ms", **(iteration_plan or get_iteration_plan(None, ITERATIONS)))
+    stopping_rule.seed(writer.records, get_build_duration_ms)
+    if stopping_rule.is_done():
+        print("All iterations already done, skipping.")
+        writer.close()
+        return writer.path
+
+    system_info = get_system_info()
+    framework_versions = get_framework_versions(project_type, project_dir)
+
+    logs_dir = get_logs_dir(result_dir, test_case["result_file_name"])
+
+    state = None
+    if state_link_mode:
+        state_dir = project_dir.parent / f"{project_dir.name}-state"
+        state = WorkspaceState(project_dir, state_dir, get_state_paths(project_type), state_link_mode)
+
+    for i in range(stopping_rule.max_iterations):
+        if writer.is_completed(i + 1):
+            continue
+        print(f"\n--- Iteration {i+1}/{stopping_rule.max_iterations} ({test_case['result_file_name']}) ---")
+        session_start_ms = time.time_ns() // 1_000_000
+        iteration = {
+            "iteration": i + 1,
+            "system_info": system_info,
+            "framework_versions": framework_versions,
+            "session_start_ms": session_start_ms,
+            "concurrency": worker["concurrency"],
+            "worker": worker["id"],
+            "cpu_affinity": worker["cpus"],
+            "workspace": str(project_dir),
+            "steps": [],
+            "build_commands_used": test_case.get("build_commands", [])
+        }
+
+        def run_step(cmd, cwd, phase_markers=None):
+            log_path = logs_dir / get_log_name(i + 1, len(iteration["steps"]) + 1, cmd)
+            step = run_command(cmd, cwd=cwd, cpus=worker["cpus"], label=label, log_path=log_path, echo=echo, phase_markers=phase_markers, resource_interval_ms=resource_interval_ms)
+            # Relative to the result file, like the columnar samples, so the results can be moved.
+            step["log_path"] = log_path.relative_to(result_dir).as_posix()
+            if step.get("phases"):
+                print("Phases: " + ", ".join(f"{phase} {timing['duration_ms'] / 1000:.1f} s" for phase, timing in step["phases"].items()))
+            iteration["steps"].append(step)
+            return step
+
+        if state and i > 0:
+            iteration["state_restore"] = state.restore(get_preconditions(test_case, project_type))
+
+        if (i == 0 and project_type == "electronjs") or test_case.get("delete_dist"):
+            delete_dist(project_dir)
+
+        if (i == 0 and project_type == "tauri") or test_case.get("cargo_clean"):
+            run_step("cargo clean", src_dir)
+
+        if i == 0 or test_case.get("delete_node_modules"):
+            delete_node_modules(project_dir)
+
+        if i == 0 or test_case.get("npm_install"):
+            run_step("npm install", project_dir)
+
+        for cmd in test_case.get("build_commands", []):
+            if not cargo_timings_top:
+                run_step(cmd, project_dir, BUILD_PHASE_MARKERS.get(project_type))
+                continue
+            step = run_step(add_timings_arg(cmd), project_dir, BUILD_PHASE_MARKERS.get(project_type))
+            # Recorded under the configured command, the build duration and the converter match on it.
+            step["cmd"] = cmd
+            step["cargo_args"] = [TIMINGS_ARG]
+            report_copy = logs_dir / f"iteration_{i + 1}_cargo-timing.html"
+            timings = ingest_timings(src_dir / "target", step["start_ms"], report_copy, cargo_timings_top)
+            if timings:
+                timings["report"] = report_copy.relative_to(result_dir).as_posix()
+                print(describe_timings(timings))
+            else:
+                print("Warning: cargo wrote no timings report.")
+            step["cargo_timings"] = timings
+
+        # Get the file sizes of the generated build (MSI, EXE)
+        build_sizes = get_build_file_sizes(project_type, src_dir, test_case["target_type"])
+        iteration.update(build_sizes)
+
+        if state and i == 0:
+            state.snapshot()
+
+        iteration["stopping_rule"] = stopping_rule.add(i + 1, get_build_duration_ms(iteration))
+        print(stopping_rule.describe())
+        writer.append(iteration)
+        if stopping_rule.is_done():
+            break
+
+    if state:
+        state.discard()
+    empty_trash(project_dir)
+
+    writer.close()
+    print(f"\nResults saved to {writer.path}")
+    return writer.path
+
+def run_test_cases_in_parallel(test_cases, project_type, project_dir, result_dir, worker_count, workspace_root, workspace_mode, state_link_mode=None, resume=False, iteration_plan=None, echo="throttled", resource_interval_ms=None, cargo_timings_top=None):
+    """Runs independent test cases concurrently, each worker in its own workspace and CPU set."""
+    workers = queue.Queue()
+    for worker_id, cpus in enumerate(split_cpu_sets(worker_count)):
+        workspace_dir = workspace_root / f"worker-{worker_id}"
+        print(f"Preparing workspace {workspace_dir} (CPUs {cpus})")
+        create_workspace(project_dir, workspace_dir, workspace_mode)
+        workers.put({"id": worker_id, "cpus": cpus, "concurrency": worker_count, "workspace": workspace_dir})
+
+    def run_on_free_worker(test_case):
+        worker = workers.get()
+        try:
+            return run_test_case(test_case, project_type, worker["workspace"], result_dir, worker, state_link_mode, resume, iteration_plan, echo, resource_interval_ms, cargo_timings_top)
+        finally:
+            workers.put(worker)
+
+    with ThreadPoolExecutor(max_workers=worker_count) as pool:
+        futures = [pool.submit(run_on_free_worker, test_case) for test_case in test_cases]
+        for future in futures:
+            future.result()
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--project_type", required=True)
     parser.add_argument("--config", required=True)
     parser.add_argument("--output_dir", required=False)
+    parser.add_argument("--resume", action="store_true", help="Continue after the iterations already in the output directory")
+    parser.add_argument("--parallel", type=int, default=1, help="Number of test cases to build concurrently in isolated workspaces")
+    parser.add_argument("--workspace_root", required=False, help="Directory for the worker workspaces, defaults to <project_dir>-workspaces")
+    parser.add_argument("--workspace_mode", choices=["copy", "hardlink"], default="copy")
+    parser.add_argument("--state_snapshots", action="store_true", help="Restore node_modules, target and dist from a snapshot before every iteration after the first")
+    parser.add_argument("--state_link_mode", choices=STATE_LINK_MODES, default="auto")
+    parser.add_argument("--echo", choices=ECHO_MODES, default="throttled", help="Command output printed to the console, it is always written to a log file per step")
+    parser.add_argument("--resource_usage", action="store_true", help="Sample the process tree of every step for CPU time, peak RSS, I/O and concurrency")
+    parser.add_argument("--resource_interval_ms", type=int, default=DEFAULT_RESOURCE_INTERVAL_MS)
+    parser.add_argument("--cargo_timings", action="store_true", help="Run cargo with --timings in tauri builds and record the slowest crates and the critical path")
+    parser.add_argument("--cargo_timings_top", type=int, default=DEFAULT_TOP_CRATES, help="Number of slowest crates to record")
+    add_iteration_arguments(parser, MIN_ITERATIONS)
     args = parser.parse_args()
+    iteration_plan = get_iteration_plan(args, ITERATIONS)
 
     with open(args.config, "r", encoding="utf-8") as f:
         config = json.load(f)
 
     project_dir = Path(config["project_dir"])
-    if args.project_type == "tauri":
-        src_dir = project_dir / "src-tauri"
-    elif args.project_type == "electronjs":
-        src_dir = project_dir
 
     # Use overridden result dir if given
     if args.output_dir:
@@ -206,53 +313,21 @@ def main():
     result_dir.mkdir(parents=True, exist_ok=True)
 
     test_cases = config["tests"]
+    state_link_mode = args.state_link_mode if args.state_snapshots else None
+    resource_interval_ms = args.resource_interval_ms if args.resource_usage else None
+    cargo_timings_top = None
+    if args.cargo_timings and args.project_type != "tauri":
+        print("Warning: --cargo_timings only applies to tauri builds, ignored.")
+    elif args.cargo_timings:
+        cargo_timings_top = args.cargo_timings_top
+
+    if args.parallel > 1:
+        workspace_root = Path(args.workspace_root) if args.workspace_root else project_dir.parent / f"{project_dir.name}-workspaces"
+        run_test_cases_in_parallel(test_cases, args.project_type, project_dir, result_dir, args.parallel, workspace_root, args.workspace_mode, state_link_mode, args.resume, iteration_plan, args.echo, resource_interval_ms, cargo_timings_top)
+        return
 
     for test_case in test_cases:
-        print(f"\n=== Running test case: {test_case['result_file_name']} ===")
-        all_results = []
-
-        system_info = get_system_info()
-        framework_versions = get_framework_versions(args.project_type, project_dir)
-
-        for i in range(ITERATIONS):
-            print(f"\n--- Iteration {i+1}/{ITERATIONS} ---")
-            session_start_ms = time.time_ns() // 1_000_000
-            iteration = {
-                "iteration": i + 1,
-                "system_info": system_info,
-                "framework_versions": framework_versions,
-                "session_start_ms": session_start_ms,
-                "steps": [],
-                "build_commands_used": test_case.get("build_commands", [])
-            }
-
-            if (i == 0 and args.project_type == "electronjs") or test_case.get("delete_dist"):
-                delete_dist(project_dir)
-
-            if (i == 0 and args.project_type == "tauri") or test_case.get("cargo_clean"):
-                iteration["steps"].append(run_command("cargo clean", cwd=src_dir))
-
-            if i == 0 or test_case.get("delete_node_modules"):
-                delete_node_modules(project_dir)
-
-            if i == 0 or test_case.get("npm_install"):
-                iteration["steps"].append(run_command("npm install", cwd=project_dir))
-
-            for cmd in test_case.get("build_commands", []):
-                iteration["steps"].append(run_command(cmd, cwd=project_dir))
-
-            # Get the file sizes of the generated build (MSI, EXE)
-            build_sizes = get_build_file_sizes(args.project_type, src_dir, test_case["target_type"])
-            iteration.update(build_sizes)
-
-            all_results.append(iteration)
-
-        # Write results to the corresponding test case's file
-        result_file = result_dir / test_case["result_file_name"]
-        with open(result_file, "w", encoding="utf-8") as f:
-            json.dump(all_results, f, indent=2)
-
-        print(f"\nResults saved to {result_file}")
+        run_test_case(test_case, args.project_type, project_dir, result_dir, state_link_mode=state_link_mode, resume=args.resume, iteration_plan=iteration_plan, echo=args.echo, resource_interval_ms=resource_interval_ms, cargo_timings_top=cargo_timings_top)
 
 if __name__ == "__main__":
     main()
@@ -2,6 +2,12 @@ import json
 import csv
 import argparse
 from pathlib import Path
+from result_writer import list_result_files, read_results
+from aggregation import (
+    DEFAULT_BOOTSTRAP_RESAMPLES, DEFAULT_CONFIDENCE, describe_columns, get_statistics_rows,
+    load_column, nonzero_mean, to_metric_array, write_summary,
+)
+from build_phases import get_phase_names
 from datetime import datetime
 
 def find_step(steps, startswith_cmd):
@@ -17,46 +23,87 @@ def find_build_step(steps):
             return step
     return None
 
-def compute_averages(rows, project_type):
-    def safe_avg(key, divisor=1):
-        values = [int(r[key]) for r in rows if r.get(key)]
-        return round(sum(values) / len(values) / divisor, 2) if values else ""
-
-    if project_type == "tauri":
-        return {
-            "file_name": "AVERAGES",
-            "cargo_clean_duration_ms": safe_avg("cargo_clean_duration_ms"),
-            "cargo_clean_duration_s": safe_avg("cargo_clean_duration_ms", divisor=1000),
-            "npm_install_duration_ms": safe_avg("npm_install_duration_ms"),
-            "npm_install_duration_s": safe_avg("npm_install_duration_ms", divisor=1000),
-            "build_duration_ms": safe_avg("build_duration_ms"),
-            "build_duration_s": safe_avg("build_duration_ms", divisor=1000),
-            "msi_size_bytes": safe_avg("msi_size_bytes"),
-            "exe_size_bytes": safe_avg("exe_size_bytes")
-        }
-    else: # elif project_type == "electronjs":
-        return {
-            "file_name": "AVERAGES",
-            "npm_install_duration_ms": safe_avg("npm_install_duration_ms"),
-            "npm_install_duration_s": safe_avg("npm_install_duration_ms", divisor=1000),
-            "build_duration_ms": safe_avg("build_duration_ms"),
-            "build_duration_s": safe_avg("build_duration_ms", divisor=1000),
-            "msi_size_bytes": safe_avg("msi_size_bytes"),
-            "exe_size_bytes": safe_avg("exe_size_bytes")
-        }
+def get_phase_columns(project_type):
+    """Gets the duration columns of the build phases, see build_phases.py."""
+    columns = {}
+    for phase in get_phase_names(project_type):
+        columns[f"{phase}_duration_ms"] = (f"{phase}_duration_ms", 1)
+        columns[f"{phase}_duration_s"] = (f"{phase}_duration_ms", 1000)
+    return columns
 
+def get_phase_cells(build_step, project_type):
+    """Gets the phase durations of a build step, empty for phases that were not found."""
+    phases = build_step.get("phases", {}) if build_step else {}
+    cells = {}
+    for phase in get_phase_names(project_type):
+        duration_ms = phases[phase]["duration_ms"] if phase in phases else ""
+        cells[f"{phase}_duration_ms"] = duration_ms
+        cells[f"{phase}_duration_s"] = round(duration_ms / 1000, 2) if phase in phases else ""
+    return cells
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--project_type", required=True)
-    parser.add_argument("--input_dir", required=True)
-    parser.add_argument("--output_csv", default="build_results_detailed.csv")
-    parser.add_argument("--config", required=True)
-    args = parser.parse_args()
+RESOURCE_FIELDS = ["cpu_user_s", "cpu_system_s", "peak_rss_bytes", "read_bytes", "write_bytes", "max_processes"]
+
+def get_resource_columns(prefix):
+    """Gets the resource usage columns of a step, see resource_accounting.py."""
+    return {f"{prefix}_{field}": (f"{prefix}_{field}", 1) for field in RESOURCE_FIELDS}
+
+def get_resource_cells(step, prefix):
+    """Gets the resource usage of a step, empty when it was not recorded."""
+    resources = step.get("resources", {}) if step else {}
+    return {f"{prefix}_{field}": resources.get(field, "") for field in RESOURCE_FIELDS}
+
+# CSV columns that get averages and statistics, with the value they are computed from and its divisor.
+AVERAGED_COLUMNS = {
+    "tauri": {
+        "cargo_clean_duration_ms": ("cargo_clean_duration_ms", 1),
+        "cargo_clean_duration_s": ("cargo_clean_duration_ms", 1000),
+        "npm_install_duration_ms": ("npm_install_duration_ms", 1),
+        "npm_install_duration_s": ("npm_install_duration_ms", 1000),
+        **get_resource_columns("npm_install"),
+        "build_duration_ms": ("build_duration_ms", 1),
+        "build_duration_s": ("build_duration_ms", 1000),
+        **get_phase_columns("tauri"),
+        **get_resource_columns("build"),
+        "msi_size_bytes": ("msi_size_bytes", 1),
+        "exe_size_bytes": ("exe_size_bytes", 1),
+    },
+    "electronjs": {
+        "npm_install_duration_ms": ("npm_install_duration_ms", 1),
+        "npm_install_duration_s": ("npm_install_duration_ms", 1000),
+        **get_resource_columns("npm_install"),
+        "build_duration_ms": ("build_duration_ms", 1),
+        "build_duration_s": ("build_duration_ms", 1000),
+        **get_phase_columns("electronjs"),
+        **get_resource_columns("build"),
+        "msi_size_bytes": ("msi_size_bytes", 1),
+        "exe_size_bytes": ("exe_size_bytes", 1),
+    },
+}
+
+def get_metrics(rows, project_type):
+    keys = {metric for metric, _ in AVERAGED_COLUMNS[project_type].values()}
+    return {key: to_metric_array(load_column(rows, key)) for key in keys}
+
+def compute_averages(metrics, project_type):
+    return {
+        "file_name": "AVERAGES",
+        **{column: nonzero_mean(metrics[metric], divisor) for column, (metric, divisor) in AVERAGED_COLUMNS[project_type].items()},
+    }
 
-    input_dir = Path(args.input_dir)
-    config_path = Path(args.config)
-    output_csv = Path(args.output_csv)
+
+def convert(project_type, input_dir, output_csv, config_path, summary_json=None, confidence=DEFAULT_CONFIDENCE, bootstrap_resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Converts the result files of one suite run to a CSV and a statistics summary JSON."""
+    input_dir = Path(input_dir)
+    config_path = Path(config_path)
+    output_csv = Path(output_csv)
+    summary_json = Path(summary_json) if summary_json else output_csv.with_name(f"{output_csv.stem}_summary.json")
+    summary = {
+        "suite": "build",
+        "project_type": project_type,
+        "confidence": confidence,
+        "bootstrap_resamples": bootstrap_resamples,
+        "tests": {},
+    }
 
     # Load test config
     with open(config_path, "r", encoding="utf-8") as f:
@@ -66,44 +113,49 @@ def main():
 
     with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
         fieldnames = []
-        if args.project_type == "tauri":
+        if project_type == "tauri":
             fieldnames = [
-                "file_name", "iteration", "target_type",
+                "file_name", "iteration", "target_type", "concurrency",
                 "system_cpu", "system_gpu", "system_os", "system_ram", "cpu_cores", "cpu_threads",
                 "tauri", "node_version", "npm_version", "cargo_version", "rust_version", 
                 "build_commands_used",
                 "cargo_clean", "cargo_clean_start_ms", "cargo_clean_end_ms", "cargo_clean_duration_ms", "cargo_clean_duration_s",
                 "delete_node_modules",
                 "npm_install", "npm_install_start_ms", "npm_install_end_ms", "npm_install_duration_ms", "npm_install_duration_s",
+                *get_resource_columns("npm_install"),
                 "build_start_ms", "build_end_ms", "build_duration_ms", "build_duration_s",
+                *get_phase_columns(project_type),
+                *get_resource_columns("build"),
                 "exe_size_bytes", "msi_size_bytes", 
             ]
-        elif args.project_type == "electronjs":
+        elif project_type == "electronjs":
             fieldnames = [
-                "file_name", "iteration", "target_type",
+                "file_name", "iteration", "target_type", "concurrency",
                 "system_cpu", "system_gpu", "system_os", "system_ram", "cpu_cores", "cpu_threads",
                 "electron", "node_version", "npm_version",
                 "build_commands_used",
                 "delete_dist",
                 "delete_node_modules",
                 "npm_install", "npm_install_start_ms", "npm_install_end_ms", "npm_install_duration_ms", "npm_install_duration_s",
+                *get_resource_columns("npm_install"),
                 "build_start_ms", "build_end_ms", "build_duration_ms", "build_duration_s",
+                *get_phase_columns(project_type),
+                *get_resource_columns("build"),
                 "exe_size_bytes", "msi_size_bytes", 
             ]
 
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
-        for json_file in sorted(input_dir.glob("*.json")):
-            if json_file.name not in test_map:
+        for result_file_name, json_file in list_result_files(input_dir):
+            if result_file_name not in test_map:
                 print(f"Skipping unrecognized file: {json_file.name}")
                 continue
 
-            test_params = test_map[json_file.name]
+            test_params = test_map[result_file_name]
 
             try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    iterations = json.load(f)
+                iterations = read_results(json_file)
             except Exception as e:
                 print(f"Failed to read {json_file.name}: {e}")
                 continue
@@ -118,11 +170,13 @@ def main():
                 build_step = find_build_step(steps)
                 
                 row = {}
-                if args.project_type == "tauri":
+                if project_type == "tauri":
                     row = {
-                        "file_name": json_file.name,
+                        "file_name": result_file_name,
                         "iteration": iter_data["iteration"],
                         "target_type": test_params.get("target_type", ""),
+                        # Results from before parallel builds always ran alone.
+                        "concurrency": iter_data.get("concurrency", 1),
                         "system_cpu": iter_data["system_info"].get("cpu", ""),
                         "system_gpu": iter_data["system_info"].get("gpu", ""),
                         "system_os": iter_data["system_info"].get("os", ""),
@@ -146,18 +200,23 @@ def main():
                         "npm_install_end_ms": npm_install_step["end_ms"] if npm_install_step else "",
                         "npm_install_duration_ms": npm_install_step["duration_ms"] if npm_install_step else "",
                         "npm_install_duration_s": round(npm_install_step["duration_ms"] / 1000, 2) if npm_install_step else "",
+                        **get_resource_cells(npm_install_step, "npm_install"),
                         "build_start_ms": build_step["start_ms"] if build_step else "",
                         "build_end_ms": build_step["end_ms"] if build_step else "",
                         "build_duration_ms": build_step["duration_ms"] if build_step else "",
                         "build_duration_s": round(build_step["duration_ms"] / 1000, 2) if build_step else "",
+                        **get_phase_cells(build_step, project_type),
+                        **get_resource_cells(build_step, "build"),
                         "exe_size_bytes": iter_data.get("exe_size_bytes", ""),
                         "msi_size_bytes": iter_data.get("msi_size_bytes", ""),
                     }
-                elif args.project_type == "electronjs":
+                elif project_type == "electronjs":
                     row = {
-                        "file_name": json_file.name,
+                        "file_name": result_file_name,
                         "iteration": iter_data["iteration"],
                         "target_type": test_params.get("target_type", ""),
+                        # Results from before parallel builds always ran alone.
+                        "concurrency": iter_data.get("concurrency", 1),
                         "system_cpu": iter_data["system_info"].get("cpu", ""),
                         "system_gpu": iter_data["system_info"].get("gpu", ""),
                         "system_os": iter_data["system_info"].get("os", ""),
@@ -175,10 +234,13 @@ def main():
                         "npm_install_end_ms": npm_install_step["end_ms"] if npm_install_step else "",
                         "npm_install_duration_ms": npm_install_step["duration_ms"] if npm_install_step else "",
                         "npm_install_duration_s": round(npm_install_step["duration_ms"] / 1000, 2) if npm_install_step else "",
+                        **get_resource_cells(npm_install_step, "npm_install"),
                         "build_start_ms": build_step["start_ms"] if build_step else "",
                         "build_end_ms": build_step["end_ms"] if build_step else "",
                         "build_duration_ms": build_step["duration_ms"] if build_step else "",
                         "build_duration_s": round(build_step["duration_ms"] / 1000, 2) if build_step else "",
+                        **get_phase_cells(build_step, project_type),
+                        **get_resource_cells(build_step, "build"),
                         "exe_size_bytes": iter_data.get("exe_size_bytes", ""),
                         "msi_size_bytes": iter_data.get("msi_size_bytes", ""),
                     }
@@ -186,11 +248,35 @@ def main():
                 writer.writerow(row)
                 all_rows.append(row)
                 
-            # Write average row
-            avg_row = compute_averages(all_rows, args.project_type)
+            # Write average and statistics rows
+            metrics = get_metrics(all_rows, project_type)
+            avg_row = compute_averages(metrics, project_type)
             writer.writerow(avg_row)
+            descriptions = describe_columns(metrics, AVERAGED_COLUMNS[project_type], confidence, bootstrap_resamples)
+            for statistics_row in get_statistics_rows(descriptions, confidence=confidence):
+                writer.writerow(statistics_row)
             writer.writerow({}) # Add empty row.
+            summary["tests"][result_file_name] = {
+                "iterations": len(all_rows),
+                "columns": descriptions,
+            }
+
+    write_summary(summary_json, summary)
     print(f"\n Detailed CSV created at: {output_csv}")
+    print(f"Statistics summary created at: {summary_json}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project_type", required=True)
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_csv", default="build_results_detailed.csv")
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--summary_json", required=False, help="Defaults to <output_csv stem>_summary.json")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--bootstrap_resamples", type=int, default=DEFAULT_BOOTSTRAP_RESAMPLES)
+    args = parser.parse_args()
+
+    convert(args.project_type, args.input_dir, args.output_csv, args.config, args.summary_json, args.confidence, args.bootstrap_resamples)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,74 @@
+import re
+import time
+
+MAX_LINE_BYTES = 4096
+
+# Phases of a build command in the order they run, each starts at the first output line matching
+# its marker. A phase without a marker starts with the command.
+BUILD_PHASE_MARKERS = {
+    "tauri": [
+        ("frontend", None),
+        # The first line cargo prints, "Finished" alone when nothing had to be compiled.
+        ("rust_compile", r"^\s*(Compiling|Updating|Locking|Downloading|Downloaded|Blocking|Finished)\s"),
+        ("bundle", r"^\s*Finished\b.*target\(s\) in"),
+    ],
+    "electronjs": [
+        ("frontend", None),
+        ("package", r"^\s*• electron-builder\s"),
+        ("installer", r"^\s*• building\s+target="),
+    ],
+}
+
+def get_phase_names(project_type):
+    return [phase for phase, _ in BUILD_PHASE_MARKERS.get(project_type, [])]
+
+class PhaseTimer:
+    """
+    Times the phases of a command from markers in its output.
+
+    feed() gets the output chunks as they are read and timestamps the markers found in them
+    with the monotonic clock. Only whole lines are matched, a line cut by a chunk boundary is
+    matched with the next chunk. A phase whose marker never shows up is left out, the phase
+    before it then lasts until the next one found.
+    """
+
+    def __init__(self, markers, start_ns):
+        self.markers = [(phase, re.compile(pattern.encode(), re.M) if pattern else None) for phase, pattern in markers]
+        self.start_ns = start_ns
+        self.starts = {}
+        self.next_index = 0
+        self.partial = b""
+        while self.next_index < len(self.markers) and self.markers[self.next_index][1] is None:
+            self.starts[self.markers[self.next_index][0]] = 0
+            self.next_index += 1
+
+    def find_markers(self, lines, now_ns):
+        for index in range(self.next_index, len(self.markers)):
+            phase, pattern = self.markers[index]
+            if pattern is not None and pattern.search(lines):
+                self.starts[phase] = now_ns - self.start_ns
+                self.next_index = index + 1
+
+    def feed(self, chunk):
+        now_ns = time.monotonic_ns()
+        data = self.partial + chunk
+        cut = data.rfind(b"\n") + 1
+        # Only the start of an overlong line is kept, a marker is near the start of its line.
+        self.partial = data[cut:][:MAX_LINE_BYTES]
+        if cut:
+            self.find_markers(data[:cut], now_ns)
+
+    def finish(self, end_ns):
+        """Returns the offset and duration of every phase found, in ms from the start of the command."""
+        if self.partial:
+            self.find_markers(self.partial, end_ns)
+        # Output read after the command exited is timed after end_ns, it counts as the end.
+        ordered = sorted(((phase, min(start, end_ns - self.start_ns)) for phase, start in self.starts.items()), key=lambda item: item[1])
+        phases = {}
+        for position, (phase, start) in enumerate(ordered):
+            end = ordered[position + 1][1] if position + 1 < len(ordered) else end_ns - self.start_ns
+            phases[phase] = {
+                "offset_ms": start // 1_000_000,
+                "duration_ms": (end - start) // 1_000_000,
+            }
+        return phases
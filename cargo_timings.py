@@ -0,0 +1,104 @@
+import json
+import shutil
+from pathlib import Path
+
+DEFAULT_TOP_CRATES = 10
+TIMINGS_ARG = "--timings"
+UNIT_DATA_MARKER = "const UNIT_DATA = "
+
+def add_timings_arg(cmd):
+    """
+    Adds --timings to the cargo arguments of a tauri build command.
+
+    The tauri CLI passes the arguments after its own "--" to cargo, npm needs one more "--"
+    before the tauri arguments, e.g. "npm run tauri build -- --debug -- --timings".
+    """
+    return f"{cmd} -- {TIMINGS_ARG}" if " -- " in cmd else f"{cmd} -- -- {TIMINGS_ARG}"
+
+def find_timings_report(target_dir, since_ms):
+    """Finds the newest cargo-timing-<timestamp>.html written after since_ms, or None."""
+    reports = [
+        path for path in (Path(target_dir) / "cargo-timings").glob("cargo-timing-*.html")
+        if path.stat().st_mtime * 1000 >= since_ms
+    ]
+    return max(reports, key=lambda path: path.stat().st_mtime) if reports else None
+
+def read_unit_data(report_path):
+    """Reads the compilation units cargo embeds as JSON in its HTML timings report."""
+    with open(report_path, "r", encoding="utf-8") as f:
+        html = f.read()
+    start = html.index(UNIT_DATA_MARKER) + len(UNIT_DATA_MARKER)
+    units, _ = json.JSONDecoder().raw_decode(html, start)
+    return units
+
+def describe_unit(unit):
+    return {
+        "name": unit["name"],
+        "version": unit["version"],
+        "target": unit.get("target", "").strip(),
+        "start_s": round(unit["start"], 2),
+        "duration_s": round(unit["duration"], 2),
+    }
+
+def get_critical_path(units):
+    """
+    Follows the units that unlocked each other back from the one that finished last.
+
+    Every unit lists the units it unlocked when it finished (or when its metadata was ready),
+    i.e. the units it was the last dependency of. Walking that chain back from the last unit
+    gives the path that decided the compile time. Units unlocked by metadata start before the
+    unit that unlocked them finished, so the time of the path is its span, not the sum of its
+    unit durations.
+    """
+    by_index = {unit["i"]: unit for unit in units}
+    unlocked_by = {}
+    for unit in units:
+        for index in unit.get("unlocked_units", []) + unit.get("unlocked_rmeta_units", []):
+            unlocked_by[index] = unit["i"]
+    path = [max(units, key=lambda unit: unit["start"] + unit["duration"])]
+    while path[-1]["i"] in unlocked_by and len(path) <= len(units):
+        path.append(by_index[unlocked_by[path[-1]["i"]]])
+    return path[::-1]
+
+def summarize_timings(units, top_crates=DEFAULT_TOP_CRATES):
+    """Summarizes the compilation units into the slowest crates and the critical path."""
+    crates = {}
+    for unit in units:
+        crate = crates.setdefault((unit["name"], unit["version"]), {"name": unit["name"], "version": unit["version"], "units": 0, "duration_s": 0.0})
+        crate["units"] += 1
+        crate["duration_s"] += unit["duration"]
+    slowest = sorted(crates.values(), key=lambda crate: crate["duration_s"], reverse=True)[:top_crates]
+    critical_path = get_critical_path(units) if units else []
+    return {
+        "units": len(units),
+        "crates": len(crates),
+        "total_s": round(max((unit["start"] + unit["duration"] for unit in units), default=0.0), 2),
+        "unit_time_s": round(sum(unit["duration"] for unit in units), 2),
+        "slowest_crates": [{**crate, "duration_s": round(crate["duration_s"], 2)} for crate in slowest],
+        "critical_path_s": round(critical_path[-1]["start"] + critical_path[-1]["duration"] - critical_path[0]["start"], 2) if critical_path else 0.0,
+        "critical_path": [describe_unit(unit) for unit in critical_path],
+    }
+
+def ingest_timings(target_dir, since_ms, copy_path=None, top_crates=DEFAULT_TOP_CRATES):
+    """
+    Reads the timings report of the cargo build that started at since_ms.
+
+    The report is copied to copy_path, as the target directory only keeps it until the next
+    cargo clean. Returns None when cargo wrote no report.
+    """
+    report = find_timings_report(target_dir, since_ms)
+    if report is None:
+        return None
+    summary = summarize_timings(read_unit_data(report), top_crates)
+    if copy_path:
+        copy_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(report, copy_path)
+    return {"report": report.name, **summary}
+
+def describe_timings(summary, count=3):
+    """Returns a one line summary of the slowest crates and the critical path."""
+    slowest = ", ".join(f"{crate['name']} {crate['duration_s']:.1f} s" for crate in summary["slowest_crates"][:count])
+    return (
+        f"cargo: {summary['units']} units in {summary['total_s']:.1f} s, slowest {slowest}; "
+        f"critical path {summary['critical_path_s']:.1f} s over {len(summary['critical_path'])} units"
+    )
@@ -0,0 +1,178 @@
+import codecs
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+import psutil
+from build_phases import PhaseTimer
+from resource_accounting import ResourceAccount, start_resource_sampler
+
+ECHO_MODES = ["full", "throttled", "off"]
+READ_CHUNK_BYTES = 64 * 1024
+ECHO_INTERVAL_S = 1.0
+FAILURE_TAIL_BYTES = 4 * 1024
+LOGS_SUFFIX = ".logs"
+# Windows process creation flag, subprocess does not export it.
+CREATE_SUSPENDED = 0x00000004
+
+def get_logs_dir(result_dir, result_file_name):
+    """Gets the directory the command logs of a test case are written to, next to its result file."""
+    return Path(result_dir) / Path(result_file_name).with_suffix(LOGS_SUFFIX).name
+
+def get_log_name(iteration_number, step_number, cmd):
+    """Gets the file name of one step's log, e.g. iteration_1_step_2_npm_run_build.log."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", cmd).strip("_")[:48]
+    return f"iteration_{iteration_number}_step_{step_number}_{slug}.log"
+
+def read_log_tail(log_path, size=FAILURE_TAIL_BYTES):
+    """Reads the last bytes of a log, from the start of the first whole line."""
+    with open(log_path, "rb") as f:
+        f.seek(max(0, os.path.getsize(log_path) - size))
+        tail = f.read()
+    if len(tail) == size and b"\n" in tail:
+        tail = tail.split(b"\n", 1)[1]
+    return tail.decode(errors="replace")
+
+class OutputEcho:
+    """
+    Echoes command output to the console.
+
+    "full" writes every line, "throttled" the latest complete line at most once per
+    ECHO_INTERVAL_S, so a slow terminal cannot hold the command back.
+    """
+
+    def __init__(self, mode, prefix):
+        self.mode = mode
+        self.prefix = prefix
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial = ""
+        self.last_line = None
+        self.skipped = 0
+        self.next_echo = time.monotonic()
+
+    def write(self, chunk):
+        text = self.partial + self.decoder.decode(chunk)
+        lines = text.split("\n")
+        self.partial = lines.pop()
+        if not lines:
+            return
+        if self.mode == "full":
+            sys.stdout.write("".join(f"{self.prefix}{line}\n" for line in lines))
+            sys.stdout.flush()
+            return
+        self.skipped += len(lines)
+        self.last_line = lines[-1]
+        if time.monotonic() >= self.next_echo:
+            self.flush()
+
+    def flush(self):
+        if self.mode == "full" and self.partial:
+            print(self.prefix + self.partial)
+        elif self.mode == "throttled" and self.last_line is not None:
+            skipped = f" (+{self.skipped - 1} lines)" if self.skipped > 1 else ""
+            print(f"{self.prefix}{self.last_line.rstrip()}{skipped}")
+            self.last_line = None
+            self.skipped = 0
+            self.next_echo = time.monotonic() + ECHO_INTERVAL_S
+
+def drain(stream, log_file, echo, phase_timer):
+    """Copies the command output to the log file, the echo and the phase timer in large binary chunks until EOF."""
+    while True:
+        chunk = stream.read1(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if log_file:
+            log_file.write(chunk)
+        if echo:
+            echo.write(chunk)
+        if phase_timer:
+            phase_timer.feed(chunk)
+
+def run_command(cmd, cwd, cpus=None, label=None, log_path=None, echo="full", phase_markers=None, resource_interval_ms=None):
+    """
+    Executes a given cmd, capturing its merged stdout and stderr.
+
+    The output is drained on a separate thread in binary chunks, written unchanged to log_path
+    and echoed to the console as the echo mode says. The duration is measured with the
+    monotonic clock, start_ms and end_ms are wall clock time. When a command fails without
+    full echo, the end of its log is printed. With phase_markers, the step also gets the
+    phases found in the output, see PhaseTimer. With resource_interval_ms, the process tree is
+    sampled at that interval and the step gets its resource usage, see ResourceAccount.
+    """
+    prefix = f"[{label}] " if label else ""
+    print(f"\n{prefix}Running passed command: {cmd} (in {cwd})")
+    # Affinity is per thread on Linux and a forked child inherits the mask of the forking thread,
+    # so pinning this thread around Popen pins the command and everything it spawns from the start.
+    pin_thread = bool(cpus) and hasattr(os, "sched_setaffinity")
+    # A Windows child inherits the affinity of its parent when it is created, so the shell is started
+    # suspended and pinned before it runs and spawns anything.
+    pin_suspended = bool(cpus) and not pin_thread and sys.platform == "win32"
+    output_echo = OutputEcho(echo, prefix) if echo != "off" else None
+    log_file = None
+    if log_path:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        log_file = open(log_path, "wb")
+
+    start_ms = time.time_ns() // 1_000_000
+    start_ns = time.monotonic_ns()
+    phase_timer = PhaseTimer(phase_markers, start_ns) if phase_markers else None
+    if pin_thread:
+        thread_cpus = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cpus)
+    try:
+        proc = subprocess.Popen(
+            cmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            creationflags=CREATE_SUSPENDED if pin_suspended else 0,
+        )
+    finally:
+        if pin_thread:
+            os.sched_setaffinity(0, thread_cpus)
+    reader = threading.Thread(target=drain, args=(proc.stdout, log_file, output_echo, phase_timer), daemon=True)
+    reader.start()
+    if cpus and not pin_thread:
+        try:
+            psutil.Process(proc.pid).cpu_affinity(cpus)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError) as e:
+            print(f"{prefix}Warning: Failed to pin {cmd} to CPUs {cpus}: {e}")
+        finally:
+            if pin_suspended:
+                psutil.Process(proc.pid).resume()
+    account = ResourceAccount() if resource_interval_ms else None
+    sampler = start_resource_sampler(proc.pid, account, resource_interval_ms) if account else None
+
+    if account:
+        account.wait(proc)
+    else:
+        proc.wait()
+    end_ns = time.monotonic_ns()
+    duration_ms = (end_ns - start_ns) // 1_000_000
+    if sampler:
+        sampler.stop()
+        sampler.join()
+    reader.join()
+    proc.stdout.close()
+    if output_echo:
+        output_echo.flush()
+    if log_file:
+        log_file.close()
+        if proc.returncode != 0 and echo != "full":
+            print(f"{prefix}{cmd} failed with exit code {proc.returncode}, end of {log_path}:")
+            print(read_log_tail(log_path))
+
+    step = {
+        "cmd": cmd,
+        "cwd": str(cwd),
+        "start_ms": start_ms,
+        "end_ms": start_ms + duration_ms,
+        "duration_ms": duration_ms,
+        "success": proc.returncode == 0,
+        "log_path": str(log_path) if log_path else None,
+    }
+    if phase_timer:
+        step["phases"] = phase_timer.finish(end_ns)
+    if account:
+        step["resources"] = account.totals()
+    return step
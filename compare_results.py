@@ -0,0 +1,202 @@
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from aggregation import get_present_values, load_metric, nonzero_mean, percentile
+from build_performance import get_build_duration_ms
+from result_writer import list_result_files, read_results
+from runtime_performance import get_mean_ram_bytes
+from sample_store import load_samples
+from startup_performance import get_startup_duration_ms
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_THRESHOLD = 0.05
+DEFAULT_PERMUTATIONS = 10000
+
+def get_mean_cpu_percent(iteration, result_dir):
+    """Gets the mean summed CPU usage of a runtime iteration, None when monitoring failed."""
+    runtime = iteration.get("runtime_resource_usage") or {}
+    if not runtime.get("success"):
+        return None
+    mean = nonzero_mean(load_metric(load_samples(runtime, "resource_usage_instances", result_dir), "cpu_percent"))
+    return mean if mean != "" else None
+
+# Every metric is lower-is-better, each one is read from a single iteration record.
+SUITE_METRICS = {
+    "build": {
+        "build_duration_ms": lambda iteration, result_dir: get_build_duration_ms(iteration),
+        "exe_size_bytes": lambda iteration, result_dir: iteration.get("exe_size_bytes"),
+        "msi_size_bytes": lambda iteration, result_dir: iteration.get("msi_size_bytes"),
+    },
+    "startup": {
+        "duration_ms": lambda iteration, result_dir: get_startup_duration_ms(iteration),
+    },
+    "runtime": {
+        "ram_bytes": get_mean_ram_bytes,
+        "cpu_percent": get_mean_cpu_percent,
+    },
+}
+
+def get_suite(iteration):
+    """Tells which suite wrote an iteration record."""
+    if "steps" in iteration:
+        return "build"
+    if "runtime_resource_usage" in iteration:
+        return "runtime"
+    if "startup_instances" in iteration:
+        return "startup"
+    return None
+
+def load_run(result_dir):
+    """Reads the per-iteration metric values of every test case in a suite run directory."""
+    result_dir = Path(result_dir)
+    test_cases = {}
+    for result_file_name, path in list_result_files(result_dir):
+        try:
+            iterations = read_results(path)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(iterations, list) or not iterations or get_suite(iterations[0]) is None:
+            continue
+        suite = get_suite(iterations[0])
+        test_cases[result_file_name] = {
+            metric: get_present_values(value for value in (get_value(iteration, result_dir) for iteration in iterations) if isinstance(value, (int, float)))
+            for metric, get_value in SUITE_METRICS[suite].items()
+        }
+    return test_cases
+
+def rank(values):
+    """Ranks values from 1, ties get the average of the ranks they span."""
+    order = sorted(range(len(values)), key=values.__getitem__)
+    ranks = [0.0] * len(values)
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and values[order[end + 1]] == values[order[start]]:
+            end += 1
+        for position in range(start, end + 1):
+            ranks[order[position]] = (start + end) / 2 + 1
+        start = end + 1
+    return ranks
+
+def rank_sum_test(baseline, candidate, permutations=DEFAULT_PERMUTATIONS):
+    """
+    Two-sided Mann-Whitney rank-sum test with a permutation p-value.
+
+    The p-value comes from randomly reassigning the pooled ranks to the two runs, which stays
+    valid for the handful of iterations a build test case has. The generator is seeded, so the
+    same runs always compare the same way.
+    """
+    ranks = rank(baseline + candidate)
+    count = len(baseline)
+    expected = count * (len(ranks) + 1) / 2
+    observed = abs(sum(ranks[:count]) - expected)
+    rng = random.Random(0)
+    extreme = sum(1 for _ in range(permutations) if abs(sum(rng.sample(ranks, count)) - expected) >= observed - 1e-9)
+    return (extreme + 1) / (permutations + 1)
+
+def compare_metric(baseline, candidate, alpha, threshold, permutations):
+    """Compares one metric of a test case between two runs."""
+    result = {
+        "baseline_n": len(baseline),
+        "candidate_n": len(candidate),
+        "baseline_median": None,
+        "candidate_median": None,
+        "change": None,
+        "p_value": None,
+        "verdict": "missing",
+    }
+    if not baseline or not candidate:
+        return result
+
+    baseline_median = percentile(sorted(baseline), 50)
+    candidate_median = percentile(sorted(candidate), 50)
+    change = (candidate_median - baseline_median) / baseline_median
+    if min(baseline) == max(baseline) and min(candidate) == max(candidate):
+        # Values that never vary (artifact sizes) changed for certain when they differ at all.
+        p_value = 0.0 if baseline_median != candidate_median else 1.0
+    else:
+        p_value = rank_sum_test(baseline, candidate, permutations)
+
+    if p_value < alpha and change > threshold:
+        verdict = "regression"
+    elif p_value < alpha and change < -threshold:
+        verdict = "improvement"
+    else:
+        verdict = "unchanged"
+    result.update({
+        "baseline_median": round(baseline_median, 2),
+        "candidate_median": round(candidate_median, 2),
+        "change": round(change, 4),
+        "p_value": round(p_value, 4),
+        "verdict": verdict,
+    })
+    return result
+
+def compare_runs(baseline_dir, candidate_dir, alpha=DEFAULT_ALPHA, threshold=DEFAULT_THRESHOLD, permutations=DEFAULT_PERMUTATIONS):
+    """Compares every test case the two suite runs have in common, matched by result_file_name."""
+    baseline = load_run(baseline_dir)
+    candidate = load_run(candidate_dir)
+    comparisons = []
+    for result_file_name in sorted(baseline.keys() & candidate.keys()):
+        for metric in baseline[result_file_name]:
+            comparisons.append({
+                "result_file_name": result_file_name,
+                "metric": metric,
+                **compare_metric(baseline[result_file_name][metric], candidate[result_file_name].get(metric, []), alpha, threshold, permutations),
+            })
+    unmatched = sorted(baseline.keys() ^ candidate.keys())
+    return comparisons, unmatched
+
+def print_table(comparisons):
+    """Prints the comparisons as a table."""
+    header = f"{'test case':<32} {'metric':<18} {'baseline':>14} {'candidate':>14} {'change':>8} {'p':>7}  verdict"
+    print(header)
+    print("-" * len(header))
+    for c in comparisons:
+        if c["verdict"] == "missing":
+            print(f"{c['result_file_name']:<32} {c['metric']:<18} {'-':>14} {'-':>14} {'-':>8} {'-':>7}  missing")
+            continue
+        print(f"{c['result_file_name']:<32} {c['metric']:<18} {c['baseline_median']:>14} {c['candidate_median']:>14} "
+            f"{c['change']:>+8.1%} {c['p_value']:>7.4f}  {c['verdict'].upper() if c['verdict'] == 'regression' else c['verdict']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares a candidate suite run with a baseline run and fails on regressions.")
+    parser.add_argument("--baseline", required=True, help="Result directory of the baseline run")
+    parser.add_argument("--candidate", required=True, help="Result directory of the candidate run")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="Significance level of the rank-sum test")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative change of the median that counts, e.g. 0.05 for 5%%")
+    parser.add_argument("--permutations", type=int, default=DEFAULT_PERMUTATIONS)
+    parser.add_argument("--output_json", required=False)
+    args = parser.parse_args()
+
+    comparisons, unmatched = compare_runs(args.baseline, args.candidate, args.alpha, args.threshold, args.permutations)
+    if not comparisons:
+        print("No test cases in common between the two runs.")
+        sys.exit(2)
+
+    print_table(comparisons)
+    for result_file_name in unmatched:
+        print(f"Only in one run, not compared: {result_file_name}")
+
+    regressions = [c for c in comparisons if c["verdict"] == "regression"]
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump({
+                "baseline": str(args.baseline),
+                "candidate": str(args.candidate),
+                "alpha": args.alpha,
+                "threshold": args.threshold,
+                "comparisons": comparisons,
+                "unmatched": unmatched,
+            }, f, indent=2)
+        print(f"\nComparison saved to {args.output_json}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.1%} at alpha {args.alpha}.")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import subprocess
+import threading
+import time
+import psutil
+import json
+import argparse
+from pathlib import Path
+from build_cache import DEFAULT_CACHE_DIR, get_artifact_dir, get_cache_key_inputs, get_or_build_executable
+from environment_probe import get_framework_versions, get_system_info
+from result_writer import ResultWriter
+from sampler import SAMPLING_BACKENDS, SAMPLING_MODES, Sampler, collect_cpu, get_sampling_config
+from startup_calibration import CALIBRATION_MODES, DEFAULT_CALIBRATION_DURATION_MS, DEFAULT_CALIBRATION_RUNS, get_calibration_path, get_startup_criteria, terminate_process_tree
+from startup_performance import build_executable, collect_main_process_count, get_build_file_path, get_windowed_cpu_percent
+from stopping_rule import StoppingRule, add_iteration_arguments, get_iteration_plan
+
+ITERATIONS = 10
+MIN_ITERATIONS = 5
+DEFAULT_INSTANCE_COUNTS = [1, 2, 4, 8]
+LAUNCH_PATTERNS = ["simultaneous", "staggered"]
+DEFAULT_STAGGER_MS = 250
+DEFAULT_INSTANCE_TIMEOUT_MS = 60000
+MEMORY_FIELDS = ["rss_bytes", "uss_bytes", "pss_bytes"]
+
+def get_tree_memory(parent):
+    """
+    Sums the memory of a process tree.
+
+    RSS counts the pages shared with other processes in full for every process, USS only the
+    pages private to it, PSS splits every shared page evenly between the processes sharing it.
+    The PSS of all running instances adds up to the memory they really use together.
+    USS and PSS are None where the OS does not report them (PSS is Linux only).
+    """
+    memory = {field: 0 for field in MEMORY_FIELDS}
+    try:
+        procs = [parent] + parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return {**{field: None for field in MEMORY_FIELDS}, "process_count": 0}
+    for p in procs:
+        try:
+            info = p.memory_full_info()
+        except (psutil.AccessDenied, psutil.ZombieProcess):
+            try:
+                info = p.memory_info()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        except psutil.NoSuchProcess:
+            continue
+        for field in MEMORY_FIELDS:
+            value = getattr(info, field[:-len("_bytes")], None)
+            memory[field] = memory[field] + value if value is not None and memory[field] is not None else None
+    return {**memory, "process_count": len(procs)}
+
+def get_launch_offsets_ms(instance_count, launch_pattern, stagger_ms):
+    """Gets when every instance is launched, in ms after the first one."""
+    if launch_pattern == "staggered":
+        return [index * stagger_ms for index in range(instance_count)]
+    return [0] * instance_count
+
+class Instance:
+    """One launched instance of the app, sampled on its own thread until it meets the startup criteria."""
+
+    def __init__(self, index, exe_path, criteria, sampling, sampling_backend, timeout_ms):
+        self.index = index
+        self.exe_path = exe_path
+        self.criteria = criteria
+        self.sampling = sampling
+        self.sampling_backend = sampling_backend
+        self.timeout_ms = timeout_ms
+        self.proc = None
+        self.parent = None
+        self.sampler = None
+        self.moments = []
+        self.start_ns = None
+        self.error = None
+        self.exited = False
+
+    def startup_criteria_met(self, moments):
+        latest = moments[-1]
+        # An instance handing over to an already running one exits, it must not be sampled until the timeout.
+        if self.proc.poll() is not None:
+            self.exited = True
+            return True
+        if latest["elapsed_ms"] >= self.timeout_ms:
+            return True
+        windowed_cpu = get_windowed_cpu_percent(moments, self.sampling.get("cpu_window_ms", 0))
+        return windowed_cpu < self.criteria["cpu_threshold"] and latest["main_process_count"] >= self.criteria["expected_main_process_count"]
+
+    def launch(self):
+        try:
+            self.start_ns = time.monotonic_ns()
+            self.proc = subprocess.Popen([str(self.exe_path)])
+            self.parent = psutil.Process(self.proc.pid)
+            self.sampler = Sampler(
+                self.parent,
+                [collect_cpu, collect_main_process_count],
+                self.sampling,
+                stop_condition=self.startup_criteria_met,
+                start_ns=self.start_ns,
+                backend=self.sampling_backend,
+            )
+            self.sampler.start()
+        except (OSError, psutil.Error) as e:
+            self.error = str(e)
+
+    def join(self):
+        if self.sampler:
+            self.sampler.join()
+            self.moments = self.sampler.samples
+            if self.sampler.error is not None:
+                self.error = str(self.sampler.error)
+
+    def describe(self, batch_start_ns):
+        """Returns the startup of the instance, timed from its own launch."""
+        result = {"instance": self.index + 1, "success": False}
+        if self.start_ns is not None:
+            result["offset_ms"] = round((self.start_ns - batch_start_ns) / 1_000_000, 3)
+        if self.error is not None:
+            return {**result, "error": self.error}
+        stop_reason = "process_exited" if self.exited or self.proc.poll() is not None else self.sampler.stop_reason
+        if not self.moments:
+            # Exited before the first sample.
+            return {**result, "pid": self.proc.pid, "stop_reason": stop_reason, "error": "no samples"}
+        timed_out = stop_reason == "criteria_met" and self.moments[-1]["elapsed_ms"] >= self.timeout_ms
+        result.update({
+            "pid": self.proc.pid,
+            "success": stop_reason == "criteria_met" and not timed_out,
+            "stop_reason": "timeout" if timed_out else stop_reason,
+            "duration_ms": self.moments[-1]["elapsed_ms"],
+            "samples": len(self.moments),
+            "sampler_stats": self.sampler.describe()["sampler_stats"],
+        })
+        return result
+
+def monitor_concurrent_startup(exe_path, instance_count, criteria, launch_pattern="simultaneous", stagger_ms=DEFAULT_STAGGER_MS, sampling=None, sampling_backend="psutil", timeout_ms=DEFAULT_INSTANCE_TIMEOUT_MS):
+    """
+    Launches instance_count instances of the given .exe and waits for all of them to fully instance.
+
+    Every instance's process tree is sampled on its own and its startup ends like in
+    startup_performance.py, timed from its own launch. Once every instance started (or timed
+    out), the memory of every tree is read while all of them are still running.
+    """
+    if sampling is None:
+        sampling = get_sampling_config("fixed")
+    if not exe_path.exists():
+        print(f"Error: Executable not found at {exe_path}")
+        return {"success": False, "error": "Executable not found", "instances": []}
+
+    instances = [Instance(index, exe_path, criteria, sampling, sampling_backend, timeout_ms) for index in range(instance_count)]
+    offsets_ms = get_launch_offsets_ms(instance_count, launch_pattern, stagger_ms)
+    start_ms = int(time.time() * 1000)
+    batch_start_ns = time.monotonic_ns()
+    try:
+        for instance, offset_ms in zip(instances, offsets_ms):
+            delay_s = (batch_start_ns + offset_ms * 1_000_000 - time.monotonic_ns()) / 1_000_000_000
+            if delay_s > 0:
+                time.sleep(delay_s)
+            instance.launch()
+        for instance in instances:
+            instance.join()
+        all_ready_ms = round((time.monotonic_ns() - batch_start_ns) / 1_000_000, 3)
+
+        results = [instance.describe(batch_start_ns) for instance in instances]
+        for instance, result in zip(instances, results):
+            if instance.parent is not None and result.get("stop_reason") != "process_exited":
+                result.update(get_tree_memory(instance.parent))
+            status = f"{result['duration_ms']:.1f} ms" if result["success"] else result.get("stop_reason") or result.get("error")
+            print(f"Instance {result['instance']}/{instance_count}: {status}, {result.get('process_count', 0)} processes, PSS {(result.get('pss_bytes') or 0) / 1024**2:.1f} MiB")
+    finally:
+        # Threads, so a slow tree does not hold up the cleanup of the others.
+        cleanups = [threading.Thread(target=terminate_process_tree, args=(instance.parent,)) for instance in instances if instance.parent is not None]
+        for cleanup in cleanups:
+            cleanup.start()
+        for cleanup in cleanups:
+            cleanup.join()
+        for instance in instances:
+            if instance.proc is not None:
+                instance.proc.wait()
+
+    exited = [result["instance"] for result in results if result.get("stop_reason") == "process_exited"]
+    if exited:
+        print(f"Warning: instances {exited} exited during startup, the app may only allow a single instance.")
+
+    durations = [result["duration_ms"] for result in results if result["success"]]
+    totals = {
+        f"total_{field}": sum(result[field] for result in results) if all(result.get(field) is not None for result in results) else None
+        for field in MEMORY_FIELDS
+    }
+    return {
+        "start_ms": start_ms,
+        "end_ms": start_ms + int(all_ready_ms),
+        "instance_count": instance_count,
+        "launch_pattern": launch_pattern,
+        "stagger_ms": stagger_ms if launch_pattern == "staggered" else None,
+        "timeout_ms": timeout_ms,
+        "success": len(durations) == instance_count,
+        "all_ready_ms": all_ready_ms,
+        "mean_duration_ms": round(sum(durations) / len(durations), 3) if durations else None,
+        "max_duration_ms": max(durations) if durations else None,
+        **totals,
+        "sampling": sampling,
+        "instances": results,
+    }
+
+def get_batch_duration_ms(iteration):
+    """Gets the key metric of a concurrent iteration, the slowest instance startup, None when an instance failed."""
+    batch = iteration.get("concurrent_instances") or {}
+    return batch.get("max_duration_ms") if batch.get("success") else None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project_type", required=True)
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--output_dir", required=False)
+    parser.add_argument("--resume", action="store_true", help="Continue after the iterations already in the output directory")
+    parser.add_argument("--build_cache_dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no_build_cache", action="store_true", help="Always run npm install and the build commands on the first iteration")
+    parser.add_argument("--sampling_backend", choices=SAMPLING_BACKENDS, default="psutil")
+    add_iteration_arguments(parser, MIN_ITERATIONS)
+    parser.add_argument("--sampling_mode", choices=sorted(SAMPLING_MODES), default="fixed")
+    parser.add_argument("--instance_counts", type=int, nargs="+", default=DEFAULT_INSTANCE_COUNTS, help="Numbers of instances launched together, each runs its own iterations")
+    parser.add_argument("--launch_pattern", choices=LAUNCH_PATTERNS, default="simultaneous")
+    parser.add_argument("--stagger_ms", type=int, default=DEFAULT_STAGGER_MS, help="Delay between the launches of the staggered pattern")
+    parser.add_argument("--instance_timeout_ms", type=int, default=DEFAULT_INSTANCE_TIMEOUT_MS, help="An instance that did not meet the startup criteria by then counts as failed")
+    parser.add_argument("--calibrate", choices=CALIBRATION_MODES, default="auto", help="auto reuses the stored calibration of a test case while the executable is unchanged, off uses the fixed criteria")
+    parser.add_argument("--calibration_file", type=Path, required=False, help="Defaults to <config stem>.calibration.json next to the config")
+    parser.add_argument("--calibration_runs", type=int, default=DEFAULT_CALIBRATION_RUNS)
+    parser.add_argument("--calibration_duration_ms", type=int, default=DEFAULT_CALIBRATION_DURATION_MS)
+    args = parser.parse_args()
+    iteration_plan = get_iteration_plan(args, ITERATIONS)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    project_dir = Path(config["project_dir"])
+    if args.project_type == "tauri":
+        src_dir = project_dir / "src-tauri"
+    elif args.project_type == "electronjs":
+        src_dir = project_dir
+
+    # Use overridden result dir if given
+    if args.output_dir:
+        result_dir = Path(args.output_dir)
+    else:
+        result_dir = Path(config["result_dir"])
+    result_dir.mkdir(parents=True, exist_ok=True)
+
+    test_cases = config["tests"]
+    print(test_cases)
+    calibration_path = args.calibration_file or get_calibration_path(args.config)
+
+    for test_case in test_cases:
+        print(f"\n=== Running test case: {test_case['result_file_name']} ===")
+        writer = ResultWriter(result_dir, test_case["result_file_name"], resume=args.resume)
+        instance_counts = test_case.get("instance_counts", args.instance_counts)
+        launch_pattern = test_case.get("launch_pattern", args.launch_pattern)
+        stagger_ms = test_case.get("stagger_ms", args.stagger_ms)
+        sampling = get_sampling_config(test_case.get("sampling_mode", args.sampling_mode))
+        build_file_path = None
+        build_cache_info = None
+        criteria = None
+
+        system_info = get_system_info()
+        framework_versions = get_framework_versions(args.project_type, project_dir)
+
+        # Every instance count is its own series of iterations with its own stopping rule,
+        # numbered in blocks so --resume finds the iterations of every series.
+        for block, instance_count in enumerate(instance_counts):
+            print(f"\n=== {instance_count} instances, {launch_pattern} ===")
+            stopping_rule = StoppingRule("max_duration_ms", **iteration_plan)
+            first_iteration = block * stopping_rule.max_iterations + 1
+            stopping_rule.seed(
+                [record for record in writer.records if record.get("concurrent_instances", {}).get("instance_count") == instance_count],
+                get_batch_duration_ms,
+            )
+            if stopping_rule.is_done():
+                print("All iterations already done, skipping.")
+                continue
+
+            for i in range(stopping_rule.max_iterations):
+                iteration_number = first_iteration + i
+                if writer.is_completed(iteration_number):
+                    continue
+                print(f"\n--- {instance_count} instances, iteration {i+1}/{stopping_rule.max_iterations} ---")
+                iteration = {
+                    "iteration": iteration_number,
+                    "system_info": system_info,
+                    "framework_versions": framework_versions,
+                    "session_start_ms": time.time_ns() // 1_000_000,
+                    "build_commands_used": test_case.get("build_commands", [])
+                }
+
+                # Build on the first iteration that runs, which is not the first one when resuming.
+                if build_file_path is None:
+                    build_commands = test_case.get("build_commands", [])
+                    build_file_path = get_build_file_path(args.project_type, src_dir, test_case["executable_type"])
+                    if args.no_build_cache:
+                        build_executable(project_dir, build_commands)
+                    else:
+                        artifact_dir = get_artifact_dir(args.project_type, src_dir, test_case["executable_type"])
+                        build_file_path, build_cache_info = get_or_build_executable(
+                            args.build_cache_dir,
+                            lambda: get_cache_key_inputs(args.project_type, project_dir, test_case["executable_type"], build_commands, framework_versions),
+                            artifact_dir, build_file_path,
+                            lambda: build_executable(project_dir, build_commands),
+                        )
+                iteration["build_cache"] = build_cache_info
+
+                if build_file_path.exists():
+                    if criteria is None:
+                        criteria = get_startup_criteria(
+                            args.calibrate, args.project_type, build_file_path, calibration_path, test_case["result_file_name"],
+                            args.calibration_runs, args.calibration_duration_ms, args.sampling_backend,
+                        )
+                        print(f"Startup criteria ({criteria['source']}): {criteria['expected_main_process_count']} processes, CPU below {criteria['cpu_threshold']}%")
+                    iteration["startup_criteria"] = criteria
+                    iteration["concurrent_instances"] = monitor_concurrent_startup(
+                        build_file_path, instance_count, criteria, launch_pattern, stagger_ms,
+                        sampling, args.sampling_backend, args.instance_timeout_ms,
+                    )
+                else:
+                    print(f"Executable not found at {build_file_path}")
+
+                iteration["stopping_rule"] = stopping_rule.add(iteration_number, get_batch_duration_ms(iteration))
+                print(stopping_rule.describe())
+                writer.append(iteration)
+                if stopping_rule.is_done():
+                    break
+
+        writer.close()
+        print(f"\nResults saved to {writer.path}")
+
+
+if __name__ == "__main__":
+    main()
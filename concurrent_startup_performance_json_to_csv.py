@@ -0,0 +1,194 @@
+import json
+import csv
+import argparse
+from pathlib import Path
+from result_writer import list_result_files, read_results
+from aggregation import (
+    DEFAULT_BOOTSTRAP_RESAMPLES, DEFAULT_CONFIDENCE, describe_columns, get_statistics_rows,
+    load_column, nonzero_mean, to_metric_array, write_summary,
+)
+
+# Measured per instance, their distributions have one value per launched instance.
+INSTANCE_COLUMNS = {
+    "duration_ms": ("duration_ms", 1),
+    "duration_s": ("duration_ms", 1000),
+    "process_count": ("process_count", 1),
+    "rss_mb": ("rss_bytes", 1024 ** 2),
+    "uss_mb": ("uss_bytes", 1024 ** 2),
+    "pss_mb": ("pss_bytes", 1024 ** 2),
+}
+# Measured per batch of instances, their distributions have one value per iteration.
+BATCH_COLUMNS = {
+    "all_ready_ms": ("all_ready_ms", 1),
+    "total_rss_mb": ("total_rss_bytes", 1024 ** 2),
+    "total_pss_mb": ("total_pss_bytes", 1024 ** 2),
+}
+
+def get_metrics(rows, batches):
+    # A batch with a failed instance did not start completely, its totals are left out.
+    batches = [batch for batch in batches if batch.get("success")]
+    metrics = {metric: to_metric_array(load_column(rows, metric)) for metric, _ in INSTANCE_COLUMNS.values()}
+    metrics.update({metric: to_metric_array(load_column(batches, metric)) for metric, _ in BATCH_COLUMNS.values()})
+    return metrics
+
+def compute_averages(metrics, suffix=""):
+    return {
+        "file_name": f"AVERAGES{suffix}",
+        **{column: nonzero_mean(metrics[metric], divisor) for column, (metric, divisor) in {**INSTANCE_COLUMNS, **BATCH_COLUMNS}.items()},
+    }
+
+def get_scaling(descriptions_by_count):
+    """Relates the median startup and memory per instance of every instance count to the smallest count."""
+    counts = sorted(descriptions_by_count)
+    base = descriptions_by_count[counts[0]]
+
+    def ratio(descriptions, column):
+        value, base_value = descriptions[column]["median"], base[column]["median"]
+        return round(value / base_value, 3) if value and base_value else None
+
+    return [
+        {
+            "instance_count": count,
+            "duration_ms_median": descriptions_by_count[count]["duration_ms"]["median"],
+            "pss_mb_median": descriptions_by_count[count]["pss_mb"]["median"],
+            "rss_mb_median": descriptions_by_count[count]["rss_mb"]["median"],
+            "duration_ratio": ratio(descriptions_by_count[count], "duration_ms"),
+            "pss_ratio": ratio(descriptions_by_count[count], "pss_mb"),
+            "all_ready_ratio": ratio(descriptions_by_count[count], "all_ready_ms"),
+        }
+        for count in counts
+    ]
+
+def describe_scaling(row):
+    pss = f"{row['pss_mb_median']:.1f} MiB" if row["pss_mb_median"] is not None else "n/a"
+    duration = f"{row['duration_ms_median']:.1f} ms" if row["duration_ms_median"] is not None else "n/a"
+    ratio = f"x{row['duration_ratio']:.2f}" if row["duration_ratio"] is not None else "n/a"
+    return f"{row['instance_count']} instances: startup median {duration} ({ratio}), PSS per instance median {pss}"
+
+def convert(project_type, input_dir, output_csv, config_path, summary_json=None, confidence=DEFAULT_CONFIDENCE, bootstrap_resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Converts the result files of one concurrent startup run to a CSV, one row per instance, and a statistics summary JSON."""
+    input_dir = Path(input_dir)
+    config_path = Path(config_path)
+    output_csv = Path(output_csv)
+    summary_json = Path(summary_json) if summary_json else output_csv.with_name(f"{output_csv.stem}_summary.json")
+    summary = {
+        "suite": "concurrent",
+        "project_type": project_type,
+        "confidence": confidence,
+        "bootstrap_resamples": bootstrap_resamples,
+        "tests": {},
+    }
+
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    test_map = {test["result_file_name"]: test for test in config["tests"]}
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
+        fieldnames = [
+            "file_name", "iteration", "executable_type", "system_os", "system_cpu", "system_ram",
+            "cpu_cores", "cpu_threads",
+            "instance_count", "launch_pattern", "instance", "offset_ms", "success", "stop_reason",
+            "start_ms", "duration_ms", "duration_s", "process_count", "rss_mb", "uss_mb", "pss_mb",
+            "all_ready_ms", "total_rss_mb", "total_pss_mb",
+        ]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+
+        for result_file_name, json_file in list_result_files(input_dir):
+            if result_file_name not in test_map:
+                print(f"Skipping unrecognized file: {json_file.name}")
+                continue
+
+            test_params = test_map[result_file_name]
+
+            try:
+                iterations = read_results(json_file)
+            except Exception as e:
+                print(f"Failed to read {json_file.name}: {e}")
+                continue
+
+            rows_by_count = {}
+            batches_by_count = {}
+            for iter_data in iterations:
+                batch = iter_data.get("concurrent_instances")
+                if not batch or not batch.get("instances"):
+                    continue
+                instance_count = batch["instance_count"]
+                batches_by_count.setdefault(instance_count, []).append(batch)
+
+                for instance in batch["instances"]:
+                    duration_ms = instance.get("duration_ms") if instance.get("success") else None
+                    row = {
+                        "file_name": result_file_name,
+                        "iteration": iter_data.get("iteration", ""),
+                        "executable_type": test_params.get("executable_type", ""),
+                        "system_os": iter_data["system_info"].get("os", ""),
+                        "system_cpu": iter_data["system_info"].get("cpu", ""),
+                        "system_ram": iter_data["system_info"].get("ram", ""),
+                        "cpu_cores": iter_data["system_info"].get("cpu_cores", ""),
+                        "cpu_threads": iter_data["system_info"].get("cpu_threads", ""),
+                        "instance_count": instance_count,
+                        "launch_pattern": batch.get("launch_pattern", ""),
+                        "instance": instance["instance"],
+                        "offset_ms": instance.get("offset_ms", ""),
+                        "success": instance.get("success", ""),
+                        "stop_reason": instance.get("stop_reason") or instance.get("error", ""),
+                        "start_ms": batch.get("start_ms", ""),
+                        "duration_ms": duration_ms if duration_ms is not None else "",
+                        "duration_s": round(duration_ms / 1000, 2) if duration_ms is not None else "",
+                        "process_count": instance.get("process_count", ""),
+                        "all_ready_ms": batch.get("all_ready_ms", ""),
+                    }
+                    for field in ["rss_bytes", "uss_bytes", "pss_bytes"]:
+                        row[field] = instance.get(field)
+                        row[f"{field[:-len('_bytes')]}_mb"] = round(instance[field] / 1024 ** 2, 2) if instance.get(field) is not None else ""
+                    for field in ["total_rss_bytes", "total_pss_bytes"]:
+                        row[f"{field[:-len('_bytes')]}_mb"] = round(batch[field] / 1024 ** 2, 2) if batch.get(field) is not None else ""
+                    writer.writerow({field: row[field] for field in fieldnames})
+                    rows_by_count.setdefault(instance_count, []).append(row)
+
+            if not rows_by_count:
+                continue
+            # Every instance count is a separate distribution.
+            descriptions_by_count = {}
+            for instance_count in sorted(rows_by_count):
+                suffix = f"_N{instance_count}"
+                metrics = get_metrics(rows_by_count[instance_count], batches_by_count[instance_count])
+                writer.writerow(compute_averages(metrics, suffix))
+                descriptions = describe_columns(metrics, {**INSTANCE_COLUMNS, **BATCH_COLUMNS}, confidence, bootstrap_resamples)
+                for statistics_row in get_statistics_rows(descriptions, suffix, confidence):
+                    writer.writerow(statistics_row)
+                descriptions_by_count[instance_count] = descriptions
+            writer.writerow({})  # Empty line
+
+            scaling = get_scaling(descriptions_by_count)
+            print(f"{result_file_name}:")
+            for scaling_row in scaling:
+                print(f"  {describe_scaling(scaling_row)}")
+            summary["tests"][result_file_name] = {
+                "iterations": sum(len(batches) for batches in batches_by_count.values()),
+                "launch_pattern": sorted({batch.get("launch_pattern") for batches in batches_by_count.values() for batch in batches}),
+                "scaling": scaling,
+                "instance_counts": {str(count): {"iterations": len(batches_by_count[count]), "columns": descriptions_by_count[count]} for count in sorted(descriptions_by_count)},
+            }
+
+    write_summary(summary_json, summary)
+    print(f"\nConcurrent startup performance CSV created at: {output_csv}")
+    print(f"Statistics summary created at: {summary_json}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project_type", required=True)
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_csv", default="concurrent_results_detailed.csv")
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--summary_json", required=False, help="Defaults to <output_csv stem>_summary.json")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--bootstrap_resamples", type=int, default=DEFAULT_BOOTSTRAP_RESAMPLES)
+    args = parser.parse_args()
+
+    convert(args.project_type, args.input_dir, args.output_csv, args.config, args.summary_json, args.confidence, args.bootstrap_resamples)
+
+if __name__ == "__main__":
+    main()
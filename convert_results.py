@@ -0,0 +1,151 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import build_performance_json_to_csv
+import concurrent_startup_performance_json_to_csv
+import runtime_performance_json_to_csv
+import startup_performance_json_to_csv
+from aggregation import DEFAULT_BOOTSTRAP_RESAMPLES, DEFAULT_CONFIDENCE
+
+CONVERTERS = {
+    "build": build_performance_json_to_csv.convert,
+    "runtime": runtime_performance_json_to_csv.convert,
+    "startup": startup_performance_json_to_csv.convert,
+    "concurrent": concurrent_startup_performance_json_to_csv.convert,
+}
+SUITE_DIR_PATTERN = re.compile(r"^(tauri|electronjs)_(build|runtime|startup|concurrent)_performance_")
+STAMP_SUFFIX = ".inputs"
+
+def get_output_csv_name(project_type, suite):
+    """Gets the CSV name main.py gives the results of a suite run."""
+    prefix = "tauri" if project_type == "tauri" else "electron"
+    return f"{prefix}_{suite}_results.csv"
+
+def get_outputs(output_csv):
+    """Gets the CSV, summary JSON and hash stamp a conversion leaves next to each other."""
+    return {
+        "csv": output_csv,
+        "summary_json": output_csv.with_name(f"{output_csv.stem}_summary.json"),
+        "stamp": output_csv.with_name(f".{output_csv.name}{STAMP_SUFFIX}"),
+    }
+
+def discover_suite_runs(roots, config_dir):
+    """Finds every suite run directory (<project_type>_<suite>_performance_<timestamp>) under the result roots."""
+    runs = []
+    for root in roots:
+        root = Path(root)
+        candidates = [root] + sorted(root.rglob("*_performance_*"))
+        for run_dir in candidates:
+            match = SUITE_DIR_PATTERN.match(run_dir.name)
+            if not match or not run_dir.is_dir():
+                continue
+            project_type, suite = match.groups()
+            runs.append({
+                "project_type": project_type,
+                "suite": suite,
+                "input_dir": run_dir,
+                "config": Path(config_dir) / project_type / f"{suite}-performance-variations-{project_type}.json",
+                "output_csv": run_dir / get_output_csv_name(project_type, suite),
+            })
+    return runs
+
+def get_input_files(run):
+    """Lists the files a conversion reads, the result files with their samples and the test config."""
+    files = []
+    for path in sorted(run["input_dir"].rglob("*")):
+        # Converted CSVs, summaries and stamps of this or older conversions are outputs, command logs are not read.
+        if not path.is_file() or path.suffix in (".csv", ".log") or path.name.endswith("_summary.json") or path.name.endswith(STAMP_SUFFIX):
+            continue
+        files.append(path)
+    files.append(run["config"])
+    return files
+
+def get_fingerprint(run, options):
+    """Hashes the contents of every input file together with the conversion options."""
+    hashes = {}
+    for path in get_input_files(run):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        hashes[path.as_posix()] = digest.hexdigest()
+    return {"options": options, "inputs": hashes}
+
+def is_up_to_date(run, check, options):
+    """Checks if the outputs of a suite run are newer than (mtime) or were made from (hash) its current inputs."""
+    outputs = get_outputs(run["output_csv"])
+    if not outputs["csv"].exists() or not outputs["summary_json"].exists():
+        return False
+    if check == "hash":
+        if not outputs["stamp"].exists():
+            return False
+        with open(outputs["stamp"], "r", encoding="utf-8") as f:
+            return json.load(f) == get_fingerprint(run, options)
+    newest_input = max(path.stat().st_mtime_ns for path in get_input_files(run))
+    oldest_output = min(outputs["csv"].stat().st_mtime_ns, outputs["summary_json"].stat().st_mtime_ns)
+    return oldest_output >= newest_input
+
+def convert_run(run, check, options):
+    """Converts one suite run, returns its status and everything the converter printed."""
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            CONVERTERS[run["suite"]](run["project_type"], run["input_dir"], run["output_csv"], run["config"], **options)
+        if check == "hash":
+            with open(get_outputs(run["output_csv"])["stamp"], "w", encoding="utf-8") as f:
+                json.dump(get_fingerprint(run, options), f, indent=2)
+        return "converted", output.getvalue()
+    except Exception:
+        return "failed", output.getvalue() + traceback.format_exc()
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts every suite run under the given result roots to CSV.")
+    parser.add_argument("--roots", nargs="+", default=["results"], help="Result roots, project type directories or single suite run directories")
+    parser.add_argument("--config_dir", default="config")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--check", choices=["mtime", "hash"], default="mtime", help="How to tell if a suite run's outputs are up to date")
+    parser.add_argument("--force", action="store_true", help="Convert every suite run, even when its outputs are up to date")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--bootstrap_resamples", type=int, default=DEFAULT_BOOTSTRAP_RESAMPLES)
+    args = parser.parse_args()
+
+    options = {"confidence": args.confidence, "bootstrap_resamples": args.bootstrap_resamples}
+    runs = discover_suite_runs(args.roots, args.config_dir)
+    if not runs:
+        print(f"No suite runs found under {', '.join(args.roots)}")
+        return
+
+    pending = []
+    for run in runs:
+        if not run["config"].exists():
+            print(f"Skipping {run['input_dir']}: config {run['config']} not found")
+        elif not args.force and is_up_to_date(run, args.check, options):
+            print(f"Up to date: {run['input_dir']}")
+        else:
+            pending.append(run)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(pending) or 1))) as pool:
+        futures = {pool.submit(convert_run, run, args.check, options): run for run in pending}
+        for future in as_completed(futures):
+            run = futures[future]
+            status, output = future.result()
+            print(f"{status.capitalize()}: {run['input_dir']} -> {run['output_csv'].name}")
+            if status == "failed":
+                failed += 1
+                print(output)
+
+    print(f"\n{len(pending) - failed} converted, {len(runs) - len(pending)} up to date or skipped, {failed} failed.")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
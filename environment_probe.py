@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import psutil
+from build_cache import DEFAULT_CACHE_DIR, hash_lockfiles
+
+PROBE_CACHE_FORMAT_VERSION = 1
+DEFAULT_PROBE_CACHE_DIR = DEFAULT_CACHE_DIR / "environment"
+
+# Version commands per tool, with the prefix stripped from their output.
+TOOL_VERSION_COMMANDS = {
+    "node": ("node -v", ""),
+    "npm": ("npm -v", ""),
+    "cargo": ("cargo --version", "cargo "),
+    "rust": ("rustc --version", "rustc "),
+}
+PROJECT_TOOLS = {
+    "tauri": ["node", "npm", "cargo", "rust"],
+    "electronjs": ["node", "npm"],
+}
+TOOL_EXECUTABLES = {"node": "node", "npm": "npm", "cargo": "cargo", "rust": "rustc"}
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def read_proc_file_field(path, field):
+    """Reads the value of the first "field: value" line of a /proc file, or None."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name.strip() == field:
+                    return value.strip()
+    except OSError:
+        pass
+    return None
+
+def get_cpu_model():
+    """Get the CPU model human readable value."""
+    try:
+        if platform.system() == "Windows":
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DESCRIPTION\System\CentralProcessor\0") as key:
+                return winreg.QueryValueEx(key, "ProcessorNameString")[0].strip()
+        if platform.system() == "Linux":
+            return read_proc_file_field("/proc/cpuinfo", "model name") or platform.processor() or "Unknown"
+        if platform.system() == "Darwin":
+            return subprocess.check_output(["sysctl", "-n", "machdep.cpu.brand_string"]).decode().strip()
+        return platform.processor() or "Unknown"
+    except Exception as e:
+        print(f"Error detecting CPU model: {e}")
+        return "Unknown"
+
+def get_ram_total_bytes():
+    """Gets the installed memory, from /proc/meminfo on Linux."""
+    mem_total = read_proc_file_field("/proc/meminfo", "MemTotal")
+    if mem_total and mem_total.endswith("kB"):
+        return int(mem_total[:-2]) * 1024
+    return psutil.virtual_memory().total
+
+def get_gpu_model():
+    """Get the GPU model human readable value."""
+    try:
+        if platform.system() == "Windows":
+            gpu = subprocess.check_output("wmic path win32_VideoController get name", shell=True).decode()
+            return [line.strip() for line in gpu.splitlines() if line.strip()][1]
+        if platform.system() == "Linux" and shutil.which("lspci"):
+            for line in subprocess.check_output(["lspci"]).decode(errors="replace").splitlines():
+                if "VGA compatible controller" in line or "3D controller" in line:
+                    return line.split(": ", 1)[1].strip()
+    except Exception:
+        pass
+    return "Unknown"
+
+def probe_system_info():
+    """
+    Get system info, like CPU, GPU, core and thread count etc.
+    Source: https://stackoverflow.com/questions/37825360/determine-what-gpu-is-running-through-wmi
+    """
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            cpu = pool.submit(get_cpu_model)
+            gpu = pool.submit(get_gpu_model)
+            return {
+                "os": f"{platform.system()} {platform.release()} ({platform.version()})",
+                "cpu": cpu.result(),
+                "ram": f"{round(get_ram_total_bytes() / (1024**3))} GB",
+                "gpu": gpu.result(),
+                "cpu_cores": psutil.cpu_count(logical=False),
+                "cpu_threads": psutil.cpu_count(logical=True),
+            }
+    except Exception as e:
+        print(f"System info error: {e}")
+        return {}
+
+def get_tool_version_with_cmd(cmd):
+    """Executes a version retrieval command and return the result."""
+    try:
+        return subprocess.check_output(cmd, shell=True, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "Unknown"
+
+def get_tool_version(tool):
+    cmd, prefix = TOOL_VERSION_COMMANDS[tool]
+    return get_tool_version_with_cmd(cmd).replace(prefix, "", 1) if prefix else get_tool_version_with_cmd(cmd)
+
+def get_framework_version_from_package_json(project_type, project_root_directory):
+    """Gets projects frameworks version from package.json."""
+    package_json_path = os.path.join(project_root_directory, "package.json")
+    try:
+        with open(package_json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        deps = data.get("dependencies", {})
+        dev_deps = data.get("devDependencies", {})
+
+        if project_type == "tauri":
+            return deps.get("@tauri-apps/api") or dev_deps.get("@tauri-apps/api") or "Unknown"
+        elif project_type == "electronjs":
+            return deps.get("electron") or dev_deps.get("electron") or "Unknown"
+    except Exception:
+        return "Unknown"
+
+def probe_framework_versions(project_type, project_root_directory):
+    """Runs the version commands of every tool the project uses concurrently."""
+    tools = PROJECT_TOOLS.get(project_type, ["node", "npm"])
+    with ThreadPoolExecutor(max_workers=len(tools)) as pool:
+        versions = dict(zip(tools, pool.map(get_tool_version, tools)))
+    if project_type == "tauri":
+        return {"tauri": get_framework_version_from_package_json(project_type, project_root_directory), **versions}
+    elif project_type == "electronjs":
+        return {"electron": get_framework_version_from_package_json(project_type, project_root_directory), **versions}
+    return versions
+
+def get_executable_fingerprint(executable):
+    """Identifies the executable PATH resolves to, so an in-place upgrade changes the fingerprint."""
+    path = shutil.which(executable)
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+def get_fingerprint(kind, inputs):
+    """Hashes what a cached probe result depends on."""
+    key_inputs = {"format_version": PROBE_CACHE_FORMAT_VERSION, "kind": kind, **inputs}
+    return hashlib.sha256(json.dumps(key_inputs, sort_keys=True).encode()).hexdigest()
+
+def get_cached_probe(cache_dir, kind, inputs, probe):
+    """
+    Returns the probe result for the fingerprint of its inputs, running the probe only once.
+
+    Results are kept in memory for the run and in a fingerprint file under cache_dir across runs.
+    cache_dir=None disables the file.
+    """
+    fingerprint = get_fingerprint(kind, inputs)
+    with _memo_lock:
+        if fingerprint in _memo:
+            return _memo[fingerprint]
+
+    cache_file = Path(cache_dir) / f"{kind}-{fingerprint}.json" if cache_dir else None
+    result = None
+    if cache_file and cache_file.exists():
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                result = json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            result = None
+    if result is None:
+        result = probe()
+        if cache_file and result:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({"inputs": inputs, "result": result}, f, indent=2)
+            os.replace(temp_file, cache_file)
+
+    with _memo_lock:
+        _memo[fingerprint] = result
+    return result
+
+def get_system_info(cache_dir=DEFAULT_PROBE_CACHE_DIR):
+    """Get system info, probed once per boot of the machine."""
+    inputs = {
+        "node": platform.node(),
+        "os": [platform.system(), platform.release(), platform.version()],
+        "boot_time": psutil.boot_time(),
+    }
+    return get_cached_probe(cache_dir, "system", inputs, probe_system_info)
+
+def get_framework_versions(project_type, project_root_directory, cache_dir=DEFAULT_PROBE_CACHE_DIR):
+    """
+    Get the versions for the project used tools.
+
+    Cached on PATH, the executables it resolves to, package.json and the lockfiles, so the
+    version commands only run again after one of them changed.
+    """
+    package_json = Path(project_root_directory) / "package.json"
+    inputs = {
+        "project_type": project_type,
+        "project_dir": str(Path(project_root_directory).resolve()),
+        "path": os.environ.get("PATH", ""),
+        "executables": {tool: get_executable_fingerprint(TOOL_EXECUTABLES[tool]) for tool in PROJECT_TOOLS.get(project_type, ["node", "npm"])},
+        "package_json": hashlib.sha256(package_json.read_bytes()).hexdigest() if package_json.exists() else None,
+        "lockfiles": hash_lockfiles(project_root_directory),
+    }
+    return get_cached_probe(cache_dir, "framework", inputs, lambda: probe_framework_versions(project_type, project_root_directory))
@@ -155,13 +155,63 @@ def electronjs_startup(timestamp):
 
     return
 
+def tauri_concurrent(timestamp):
+    base_dir = Path("results/tauri")
+    config_path = Path("config/tauri/concurrent-performance-variations-tauri.json")
+    output_dir = base_dir / f"tauri_concurrent_performance_{timestamp}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    subprocess.run([
+        "python",
+        "concurrent_startup_performance.py",
+        "--project_type", str("tauri"),
+        "--config", str(config_path),
+        "--output_dir", str(output_dir)
+    ], check=True)
+
+    subprocess.run([
+        "python",
+        "concurrent_startup_performance_json_to_csv.py",
+        "--project_type", str("tauri"),
+        "--input_dir", str(output_dir),
+        "--output_csv", str(output_dir / "tauri_concurrent_results.csv"),
+        "--config", str(config_path)
+    ], check=True)
+
+    return
+
+def electronjs_concurrent(timestamp):
+    base_dir = Path("results/electronjs")
+    config_path = Path("config/electronjs/concurrent-performance-variations-electronjs.json")
+    output_dir = base_dir / f"electronjs_concurrent_performance_{timestamp}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    subprocess.run([
+        "python",
+        "concurrent_startup_performance.py",
+        "--project_type", str("electronjs"),
+        "--config", str(config_path),
+        "--output_dir", str(output_dir)
+    ], check=True)
+
+    subprocess.run([
+        "python",
+        "concurrent_startup_performance_json_to_csv.py",
+        "--project_type", str("electronjs"),
+        "--input_dir", str(output_dir),
+        "--output_csv", str(output_dir / "electron_concurrent_results.csv"),
+        "--config", str(config_path)
+    ], check=True)
+
+    return
+
 def main():
     """Executes tests and passes them their launch arguments."""
     
     if len(sys.argv) < 2:
-        print("Script usage: python main.py <test_name>, like tauri_build, electronjs_build, tauri_runtime, electronjs_runtime, tauri_startup, electronjs_startup")
+        print("Script usage: python main.py <test_name>, like tauri_build, electronjs_build, tauri_runtime, electronjs_runtime, tauri_startup, electronjs_startup, tauri_concurrent, electronjs_concurrent")
         return
-    # Possible values: tauri_build, electronjs_build, tauri_runtime, electronjs_runtime, tauri_startup, electronjs_startup, all_...
+    # Possible values: tauri_build, electronjs_build, tauri_runtime, electronjs_runtime, tauri_startup, electronjs_startup, tauri_concurrent, electronjs_concurrent, all_...
     test_name = sys.argv[1].lower()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
@@ -183,6 +233,12 @@ def main():
     elif test_name == "electronjs_startup":
         electronjs_startup(timestamp)
 
+    elif test_name == "tauri_concurrent":
+        tauri_concurrent(timestamp)
+
+    elif test_name == "electronjs_concurrent":
+        electronjs_concurrent(timestamp)
+
     elif test_name == "all":
         tauri_build(timestamp)
         electronjs_build(timestamp)
@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+import psutil
+
+LAUNCH_MODES = ["warm", "cold"]
+# Directories next to the executable that hold the resource bundles, e.g. app.asar of ElectronJS.
+RESOURCE_DIRS = ["resources", "locales"]
+
+def is_eviction_supported():
+    return hasattr(os, "posix_fadvise")
+
+def get_launch_files(exe_path):
+    """Gets the files a launch reads before any ran: the executable, the libraries next to it and its resource bundles."""
+    exe_path = Path(exe_path)
+    files = {exe_path}
+    for path in exe_path.parent.iterdir():
+        if path.is_file() and path.suffix.lower() in (".dll", ".so", ".pak", ".bin", ".dat", ".asar"):
+            files.add(path)
+    for name in RESOURCE_DIRS:
+        resource_dir = exe_path.parent / name
+        if resource_dir.is_dir():
+            files.update(path for path in resource_dir.rglob("*") if path.is_file())
+    return files
+
+def get_mapped_files(parent):
+    """Gets the files the process tree has mapped, which includes the shared libraries it loaded."""
+    files = set()
+    try:
+        procs = [parent] + parent.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return files
+    for p in procs:
+        try:
+            files.update(Path(m.path) for m in p.memory_maps() if os.path.isabs(m.path))
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess, AttributeError, NotImplementedError):
+            continue
+    return files
+
+def evict_files(files):
+    """
+    Drops the cached pages of the files from the OS page cache.
+
+    Dirty pages are written back first, posix_fadvise(DONTNEED) only drops clean ones.
+    Pages still mapped by a running process stay cached, so the previous instance has to
+    be gone. Returns how many files and bytes were evicted.
+    """
+    evicted = {"files": 0, "bytes": 0}
+    for path in files:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            evicted["files"] += 1
+            evicted["bytes"] += os.fstat(fd).st_size
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    return evicted
+
+class LaunchPreparer:
+    """
+    Prepares the page cache for the launches of one executable.
+
+    "warm" leaves the cache as the previous launch left it. "cold" evicts the launch files
+    before every launch; the files the app mapped during a launch, such as the shared
+    libraries it loaded, are remembered and evicted before the later launches too.
+    """
+
+    def __init__(self, mode, exe_path):
+        self.mode = mode
+        self.files = get_launch_files(exe_path) if mode == "cold" else set()
+
+    def prepare(self):
+        """Returns the launch description stored with the startup result."""
+        launch = {"mode": self.mode}
+        if self.mode != "cold":
+            return launch
+        if not is_eviction_supported():
+            return {**launch, "evicted": False, "evicted_files": 0, "evicted_bytes": 0}
+        evicted = evict_files(sorted(self.files))
+        return {**launch, "evicted": True, "evicted_files": evicted["files"], "evicted_bytes": evicted["bytes"]}
+
+    def observe(self, parent):
+        """Remembers the files the launched process tree mapped."""
+        if self.mode == "cold":
+            self.files.update(get_mapped_files(parent))
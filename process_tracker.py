@@ -0,0 +1,143 @@
+import os
+from contextlib import ExitStack
+import psutil
+
+class ProcessTracker:
+    """
+    Keeps track of a process tree between samples.
+
+    Tracked processes are kept in a PID -> (create_time, psutil.Process) map, so the same
+    psutil.Process object is reused on every tick and its CPU counters stay primed.
+    Each refresh only creates objects for descendants that were not seen before and drops
+    the ones that are no longer part of the tree.
+    On Linux, descendants are found through /proc/<pid>/task/<tid>/children, which only
+    touches the tracked processes instead of the whole system process table. Elsewhere the
+    OS only lists processes as a whole (a toolhelp snapshot on Windows), so one PID -> PPID
+    snapshot is taken per tick and walked from the parent.
+    """
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.processes = {}
+        self.stats = {
+            "discovered": 0,
+            "retired": 0,
+            "max_tracked": 0,
+        }
+        self._use_proc_children = os.path.exists(f"/proc/{parent.pid}/task/{parent.pid}/children")
+        self._track(self._create_process(parent.pid))
+
+    def _track(self, p):
+        """Starts tracking the given process and primes its CPU counter."""
+        try:
+            create_time = p.create_time()
+            p.cpu_percent(interval=None)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return False
+        parent = self.processes.get(self.parent.pid)
+        if parent is not None and create_time < parent[0]:
+            # Older than the parent, the PID of an exited child was reused by an unrelated process.
+            return False
+        self.processes[p.pid] = (create_time, p)
+        self.stats["discovered"] += 1
+        return True
+
+    def _create_process(self, pid):
+        """Creates the process object used for a newly discovered PID."""
+        return psutil.Process(pid)
+
+    def _retire(self, pid):
+        """Stops tracking the given PID."""
+        del self.processes[pid]
+        self.stats["retired"] += 1
+
+    def _read_proc_children(self, pid):
+        """Reads the direct child PIDs of every thread of the given process."""
+        child_pids = []
+        try:
+            for tid in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{tid}/children", "rb") as f:
+                    child_pids.extend(int(child_pid) for child_pid in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            pass
+        return child_pids
+
+    def _read_snapshot_children(self):
+        """Reads the direct child PIDs of every process from one snapshot of the process table."""
+        children_by_pid = {}
+        for pid, ppid in psutil._ppid_map().items():
+            children_by_pid.setdefault(ppid, []).append(pid)
+        return lambda pid: children_by_pid.get(pid, [])
+
+    def _find_descendant_pids(self):
+        """Returns the PIDs currently reachable from the parent process."""
+        if self._use_proc_children:
+            read_children = self._read_proc_children
+        elif hasattr(psutil, "_ppid_map"):
+            # Unlike children(recursive=True), this creates no process object for the descendants that are tracked already.
+            read_children = self._read_snapshot_children()
+        else:
+            return {p.pid for p in self.parent.children(recursive=True)}
+
+        descendant_pids = set()
+        pending = [self.parent.pid]
+        while pending:
+            for child_pid in read_children(pending.pop()):
+                if child_pid not in descendant_pids and child_pid != self.parent.pid:
+                    descendant_pids.add(child_pid)
+                    pending.append(child_pid)
+        return descendant_pids
+
+    def _parent_exited(self):
+        # An exited child that was not reaped yet is a zombie, is_running() is still True for it.
+        try:
+            return self.parent.status() == psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return True
+        except psutil.AccessDenied:
+            return False
+
+    def _is_same_process(self, p, create_time):
+        """Checks that the PID of a tracked process still belongs to it and was not reused."""
+        # The tracked object was created with the process, is_running() compares its create time with the PID's current one.
+        return p.is_running()
+
+    def refresh(self):
+        """Updates the tracked tree and returns its processes, parent first."""
+        if self._parent_exited():
+            raise psutil.NoSuchProcess(self.parent.pid)
+        if self.parent.pid in self.processes:
+            parent_create_time, parent = self.processes[self.parent.pid]
+            if not self._is_same_process(parent, parent_create_time):
+                raise psutil.NoSuchProcess(self.parent.pid)
+
+        descendant_pids = self._find_descendant_pids()
+
+        for pid, (create_time, p) in list(self.processes.items()):
+            if pid == self.parent.pid:
+                continue
+            if pid not in descendant_pids or not self._is_same_process(p, create_time):
+                # Gone from the tree, or the PID now belongs to a newer process that is tracked afresh below.
+                self._retire(pid)
+
+        for pid in descendant_pids:
+            if pid in self.processes:
+                continue
+            try:
+                self._track(self._create_process(pid))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        self.stats["max_tracked"] = max(self.stats["max_tracked"], len(self.processes))
+        return [p for _, p in self.processes.values()]
+
+    def oneshot(self, procs):
+        """Batches the reads of every given process until the returned context exits."""
+        stack = ExitStack()
+        for p in procs:
+            stack.enter_context(p.oneshot())
+        return stack
+
+    def close(self):
+        """Releases resources held for the tracked processes."""
+        pass
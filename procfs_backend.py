@@ -0,0 +1,179 @@
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+import psutil
+from process_tracker import ProcessTracker
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+READ_BUFFER_SIZE = 4096
+
+MemoryInfo = namedtuple("MemoryInfo", ["rss", "vms", "shared"])
+
+def is_procfs_available():
+    """Checks if the /proc reading backend can be used on this system."""
+    return sys.platform.startswith("linux") and os.path.exists(f"/proc/{os.getpid()}/statm")
+
+class ProcfsProcess:
+    """
+    Reads a single process straight from /proc.
+
+    Exposes the subset of the psutil.Process interface the collectors use. The stat, statm and
+    status files are opened once and re-read with pread() at offset 0 on every tick, which gives
+    one syscall per file instead of open/read/close. Anything not read here is forwarded to a
+    lazily created psutil.Process.
+    """
+
+    def __init__(self, pid, buffer):
+        self.pid = pid
+        self._buffer = buffer
+        self._fds = {}
+        self._psutil_process = None
+        self._stat = None
+        self._statm = None
+        self._status = None
+        self._last_cpu_ticks = None
+        self._last_cpu_ns = None
+        try:
+            for name in ("stat", "statm", "status"):
+                self._fds[name] = os.open(f"/proc/{pid}/{name}", os.O_RDONLY)
+        except FileNotFoundError:
+            self.close()
+            raise psutil.NoSuchProcess(pid)
+        except PermissionError:
+            self.close()
+            raise psutil.AccessDenied(pid)
+        try:
+            self.read()
+        except psutil.NoSuchProcess:
+            self.close()
+            raise
+
+    def __getattr__(self, name):
+        # Everything that the /proc reader does not cover falls back to psutil.
+        if self._psutil_process is None:
+            self._psutil_process = psutil.Process(self.pid)
+        return getattr(self._psutil_process, name)
+
+    def _pread(self, name):
+        try:
+            size = os.preadv(self._fds[name], [self._buffer], 0)
+        except ProcessLookupError:
+            size = 0
+        if size == 0:
+            raise psutil.NoSuchProcess(self.pid)
+        return bytes(self._buffer[:size])
+
+    def read(self):
+        """Reads stat, statm and status of the process in one pass."""
+        try:
+            stat = self._pread("stat")
+            statm = self._pread("statm")
+            status = self._pread("status")
+        except psutil.NoSuchProcess:
+            self._stat = None
+            raise
+
+        # The command name in stat may contain spaces and brackets, fields start after the last ")".
+        name_end = stat.rfind(b")")
+        self._name = stat[stat.find(b"(") + 1:name_end].decode(errors="replace")
+        self._stat = stat[name_end + 2:].split()
+        self._statm = statm.split()
+        self._status = status
+
+    def close(self):
+        """Closes the /proc file descriptors of the process."""
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+    def _require_stat(self):
+        if self._stat is None:
+            raise psutil.NoSuchProcess(self.pid)
+        return self._stat
+
+    def name(self):
+        self._require_stat()
+        return self._name
+
+    def create_time(self):
+        # Start time in clock ticks after boot, only used to identify the process.
+        return int(self._require_stat()[19]) / CLOCK_TICKS
+
+    def cpu_percent(self, interval=None):
+        stat = self._require_stat()
+        cpu_ticks = int(stat[11]) + int(stat[12]) # utime + stime
+        now_ns = time.monotonic_ns()
+        if self._last_cpu_ticks is None:
+            cpu_percent = 0.0
+        else:
+            elapsed_s = (now_ns - self._last_cpu_ns) / 1_000_000_000
+            cpu_s = (cpu_ticks - self._last_cpu_ticks) / CLOCK_TICKS
+            cpu_percent = round(cpu_s / elapsed_s * 100, 1) if elapsed_s > 0 else 0.0
+        self._last_cpu_ticks = cpu_ticks
+        self._last_cpu_ns = now_ns
+        return cpu_percent
+
+    def memory_info(self):
+        self._require_stat()
+        statm = self._statm
+        return MemoryInfo(
+            rss=int(statm[1]) * PAGE_SIZE,
+            vms=int(statm[0]) * PAGE_SIZE,
+            shared=int(statm[2]) * PAGE_SIZE,
+        )
+
+    def num_threads(self):
+        return int(self._require_stat()[17])
+
+    def peak_rss(self):
+        """Returns the peak RSS (VmHWM) of the process in bytes."""
+        self._require_stat()
+        start = self._status.find(b"VmHWM:")
+        if start == -1:
+            return 0
+        return int(self._status[start + 6:self._status.find(b"kB", start)]) * 1024
+
+    @contextmanager
+    def oneshot(self):
+        yield
+
+class ProcfsTracker(ProcessTracker):
+    """
+    Process tracker that samples the tracked tree straight from /proc.
+
+    Discovery works like ProcessTracker, but every tracked process is a ProcfsProcess and
+    refresh() reads the whole tree in one pass before the collectors run, sharing one read buffer.
+    """
+
+    def __init__(self, parent):
+        self._buffer = bytearray(READ_BUFFER_SIZE)
+        super().__init__(parent)
+
+    def _create_process(self, pid):
+        return ProcfsProcess(pid, self._buffer)
+
+    def _retire(self, pid):
+        self.processes[pid][1].close()
+        super()._retire(pid)
+
+    def _is_same_process(self, p, create_time):
+        # Reads the process for this tick. The descriptors of a reused PID still point at the
+        # old process and fail, a changed start time is checked too.
+        try:
+            p.read()
+        except psutil.NoSuchProcess:
+            return False
+        return p.create_time() == create_time
+
+    @contextmanager
+    def oneshot(self, procs):
+        # refresh() already read every tracked process.
+        yield
+
+    def close(self):
+        """Closes the /proc file descriptors of every tracked process."""
+        for _, p in self.processes.values():
+            p.close()
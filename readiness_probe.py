@@ -0,0 +1,113 @@
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+READINESS_MODES = ["heuristic", "file", "stdout", "socket"]
+DEFAULT_READY_TIMEOUT_MS = 15000
+READY_FILE_ENV = "STARTUP_READY_FILE"
+READY_ADDRESS_ENV = "STARTUP_READY_ADDRESS"
+READY_LINE = b"STARTUP_READY"
+FILE_POLL_INTERVAL_S = 0.001
+
+class ReadinessSignal:
+    """
+    Waits for the launched app to signal that its first frame is ready.
+
+    The channel is passed to the app through its environment:
+    "file" - the app creates the file named by STARTUP_READY_FILE, polled every millisecond.
+    "stdout" - the app prints a line containing STARTUP_READY to stdout.
+    "socket" - the app connects to the TCP address 127.0.0.1:<port> in STARTUP_READY_ADDRESS.
+    The signal is timestamped with the monotonic clock on the listener thread the moment it
+    arrives, on_signal is called right after.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.event = threading.Event()
+        self.signal_ns = None
+        self.on_signal = None
+        self._closed = threading.Event()
+        self._temp_dir = None
+        self._ready_file = None
+        self._server = None
+        self._thread = None
+
+    def get_popen_kwargs(self):
+        """Creates the channel and returns the Popen arguments that hand it to the app."""
+        env = dict(os.environ)
+        kwargs = {"env": env}
+        if self.mode == "file":
+            self._temp_dir = Path(tempfile.mkdtemp(prefix="startup-ready-"))
+            self._ready_file = self._temp_dir / "ready"
+            env[READY_FILE_ENV] = str(self._ready_file)
+        elif self.mode == "socket":
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.bind(("127.0.0.1", 0))
+            self._server.listen(1)
+            # accept() returns as soon as the app connects, the timeout only lets close() end the wait.
+            self._server.settimeout(0.05)
+            env[READY_ADDRESS_ENV] = f"127.0.0.1:{self._server.getsockname()[1]}"
+        elif self.mode == "stdout":
+            kwargs["stdout"] = subprocess.PIPE
+        return kwargs
+
+    def start(self, proc):
+        """Starts listening for the signal of the launched process."""
+        target = {"file": self._poll_file, "stdout": self._read_stdout, "socket": self._accept}[self.mode]
+        self._thread = threading.Thread(target=target, args=(proc,), name="readiness", daemon=True)
+        self._thread.start()
+
+    def _signal(self):
+        if self.event.is_set():
+            return
+        self.signal_ns = time.monotonic_ns()
+        self.event.set()
+        if self.on_signal:
+            self.on_signal()
+
+    def _poll_file(self, proc):
+        while not self._closed.is_set():
+            if self._ready_file.exists():
+                self._signal()
+                return
+            time.sleep(FILE_POLL_INTERVAL_S)
+
+    def _read_stdout(self, proc):
+        # Keeps draining after the signal, so the app never blocks on a full pipe.
+        for line in proc.stdout:
+            if READY_LINE in line:
+                self._signal()
+
+    def _accept(self, proc):
+        while not self._closed.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self._signal()
+            connection.close()
+            return
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def get_signal_ms(self, start_ns):
+        """Returns when the signal arrived in ms since start_ns, or None."""
+        return round((self.signal_ns - start_ns) / 1_000_000, 3) if self.signal_ns is not None else None
+
+    def close(self):
+        """Stops listening and removes the channel."""
+        self._closed.set()
+        if self._thread and self.mode != "stdout":
+            self._thread.join(1)
+        if self._server:
+            self._server.close()
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
@@ -0,0 +1,93 @@
+import os
+import psutil
+from sampler import Sampler, get_sampling_config
+
+DEFAULT_RESOURCE_INTERVAL_MS = 200
+# ru_inblock and ru_oublock count 512 byte blocks on Linux.
+RUSAGE_BLOCK_BYTES = 512
+
+class ResourceAccount:
+    """
+    Accounts the resources a command's process tree uses.
+
+    Every sample sums the RSS and counts the processes of the tree, which gives the peak
+    aggregate RSS and the maximum concurrency. CPU time and I/O of every process are kept
+    as last seen, so processes that exited still count with what they had used at their
+    last sample. When the command is reaped with os.wait4, the exact CPU time and block I/O
+    of the whole waited-for tree replace the sampled ones.
+    """
+
+    def __init__(self):
+        self.last_seen = {}
+        self.peak_rss_bytes = 0
+        self.max_processes = 0
+        self.samples = 0
+        self.rusage = None
+
+    def collect(self, procs, tick):
+        rss_bytes = 0
+        for p in procs:
+            try:
+                key = (p.pid, p.create_time())
+                usage = {"rss_bytes": p.memory_info().rss}
+                cpu_times = p.cpu_times()
+                usage["cpu_user_s"] = cpu_times.user
+                usage["cpu_system_s"] = cpu_times.system
+                try:
+                    io = p.io_counters()
+                    usage["read_bytes"] = io.read_bytes
+                    usage["write_bytes"] = io.write_bytes
+                except (AttributeError, psutil.AccessDenied):
+                    pass
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            rss_bytes += usage["rss_bytes"]
+            self.last_seen[key] = usage
+        self.peak_rss_bytes = max(self.peak_rss_bytes, rss_bytes)
+        self.max_processes = max(self.max_processes, len(procs))
+        self.samples += 1
+        return {}
+
+    def wait(self, proc):
+        """Waits for the command like proc.wait(), reaping it with os.wait4 where available."""
+        if not hasattr(os, "wait4"):
+            return proc.wait()
+        _, status, self.rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return proc.returncode
+
+    def totals(self):
+        def sampled(key):
+            return sum(usage.get(key, 0) for usage in self.last_seen.values())
+
+        if self.rusage is not None:
+            account = {
+                "cpu_user_s": round(self.rusage.ru_utime, 3),
+                "cpu_system_s": round(self.rusage.ru_stime, 3),
+                "read_bytes": self.rusage.ru_inblock * RUSAGE_BLOCK_BYTES,
+                "write_bytes": self.rusage.ru_oublock * RUSAGE_BLOCK_BYTES,
+                "source": "rusage",
+            }
+        else:
+            account = {
+                "cpu_user_s": round(sampled("cpu_user_s"), 3),
+                "cpu_system_s": round(sampled("cpu_system_s"), 3),
+                "read_bytes": sampled("read_bytes"),
+                "write_bytes": sampled("write_bytes"),
+                "source": "sampled",
+            }
+        return {
+            **account,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "max_processes": self.max_processes,
+            "samples": self.samples,
+        }
+
+def start_resource_sampler(pid, account, interval_ms=DEFAULT_RESOURCE_INTERVAL_MS):
+    """Starts sampling the process tree of pid into account, returns None if the process already exited."""
+    try:
+        sampler = Sampler(psutil.Process(pid), [account.collect], get_sampling_config("fixed", interval_ms=interval_ms))
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+    sampler.start()
+    return sampler
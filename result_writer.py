@@ -0,0 +1,97 @@
+import json
+import os
+from pathlib import Path
+
+STREAM_SUFFIX = ".ndjson"
+
+def get_stream_path(result_dir, result_file_name):
+    """Gets the NDJSON path that results for the configured result file name are streamed to."""
+    return Path(result_dir) / Path(result_file_name).with_suffix(STREAM_SUFFIX).name
+
+def read_stream(path):
+    """
+    Reads the records of an NDJSON result file.
+
+    Returns the records and the byte length of the valid prefix. A last line that was cut off
+    by a crash is not part of the valid prefix and is left out.
+    """
+    records = []
+    valid_length = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+            valid_length += len(line)
+    return records, valid_length
+
+def read_results(path):
+    """Reads the iterations of a result file, streamed (.ndjson) or written in one go (.json)."""
+    path = Path(path)
+    if path.suffix == STREAM_SUFFIX:
+        return read_stream(path)[0]
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def list_result_files(input_dir):
+    """
+    Lists the result files in a directory as (result_file_name, path) pairs.
+
+    result_file_name is the name the test case config uses. When a test case has both a
+    streamed and a .json file, the streamed one is used.
+    """
+    result_files = {}
+    for path in sorted(Path(input_dir).glob("*.json")):
+        result_files[path.name] = path
+    for path in sorted(Path(input_dir).glob(f"*{STREAM_SUFFIX}")):
+        result_files[path.with_suffix(".json").name] = path
+    return sorted(result_files.items())
+
+class ResultWriter:
+    """
+    Appends iteration results to an NDJSON file, one record per line.
+
+    Every record is flushed and fsynced before append() returns, so a crash loses at most the
+    iteration that was running. With resume, records already in the file are kept and a line
+    cut off by a crash is dropped, otherwise the file is started over.
+    """
+
+    def __init__(self, result_dir, result_file_name, resume=False):
+        self.path = get_stream_path(result_dir, result_file_name)
+        self.completed_iterations = set()
+        self.records = []
+
+        if resume and self.path.exists():
+            records, valid_length = read_stream(self.path)
+            self.records = records
+            self.completed_iterations = {record["iteration"] for record in records}
+            self._file = open(self.path, "r+b")
+            self._file.truncate(valid_length)
+            self._file.seek(valid_length)
+            if self.completed_iterations:
+                print(f"Resuming {self.path.name}, iterations {sorted(self.completed_iterations)} already done.")
+        else:
+            self._file = open(self.path, "wb")
+
+    def is_completed(self, iteration_number):
+        """Checks if the iteration was already written by an earlier run."""
+        return iteration_number in self.completed_iterations
+
+    def append(self, record):
+        """Writes one iteration record and makes sure it reached the disk."""
+        self._file.write(json.dumps(record).encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed_iterations.add(record["iteration"])
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,103 +1,22 @@
 import subprocess
 import time
 import psutil
-import os
 import sys
 import json
 import shutil
 import argparse
 from pathlib import Path
-import platform
+from command_runner import run_command
+from environment_probe import get_framework_versions, get_system_info
+from build_cache import DEFAULT_CACHE_DIR, get_artifact_dir, get_cache_key_inputs, get_or_build_executable
+from result_writer import ResultWriter
+from sample_store import SAMPLE_FORMATS, get_samples_dir, load_samples, store_samples
+from stopping_rule import StoppingRule, add_iteration_arguments, get_iteration_plan
+from aggregation import load_metric, nonzero_mean
+from sampler import SAMPLING_BACKENDS, Sampler, collect_cpu, collect_process_count, get_sampling_config
 
 ITERATIONS = 10
-
-def get_cpu_model():
-    """Get the CPU model human readable value."""
-    try:
-        if platform.system() == "Windows":
-            output = subprocess.check_output("wmic cpu get Name", shell=True).decode()
-            lines = [line.strip() for line in output.splitlines() if line.strip()]
-            return lines[1] if len(lines) > 1 else "Unknown"
-        else:
-            return platform.processor() or "Unknown"
-    except Exception as e:
-        print(f"Error detecting CPU model: {e}")
-        return "Unknown"
-
-def get_system_info():
-    """
-    Get system info, like CPU, GPU, core and thread count etc.
-    Source: https://stackoverflow.com/questions/37825360/determine-what-gpu-is-running-through-wmi
-    """
-    try:
-        cpu = get_cpu_model()
-        cores = psutil.cpu_count(logical=False)
-        threads = psutil.cpu_count(logical=True)
-        ram = f"{round(psutil.virtual_memory().total / (1024**3))} GB"
-        os_info = f"{platform.system()} {platform.release()} ({platform.version()})"
-        try:
-            gpu = subprocess.check_output("wmic path win32_VideoController get name", shell=True).decode()
-            gpu = [line.strip() for line in gpu.splitlines() if line.strip()][1]
-        except Exception:
-            gpu = "Unknown"
-        return {
-            "os": os_info,
-            "cpu": cpu,
-            "ram": ram,
-            "gpu": gpu,
-            "cpu_cores": cores,
-            "cpu_threads": threads
-        }
-    except Exception as e:
-        print(f"System info error: {e}")
-        return {}
-
-def get_tool_version_with_cmd(cmd):
-    """Executes a version retrieval command and return the result."""
-    try:
-        return subprocess.check_output(cmd, shell=True).decode().strip()
-    except Exception:
-        return "Unknown"
-
-def get_framework_version_from_package_json(project_type, project_root_directory):
-    """Gets projects frameworks version from package.json."""
-    package_json_path = os.path.join(project_root_directory, "package.json")
-    try:
-        with open(package_json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        deps = data.get("dependencies", {})
-        dev_deps = data.get("devDependencies", {})
-        
-        if project_type == "tauri":
-            return deps.get("@tauri-apps/api") or dev_deps.get("@tauri-apps/api") or "Unknown"
-        elif project_type == "electronjs":
-            return deps.get("electron") or dev_deps.get("electron") or "Unknown"
-    except Exception:
-        return "Unknown"
-
-def get_framework_versions(project_type, project_root_directory):
-    """Get the versions for the project used tools."""
-    framework_version = get_framework_version_from_package_json(project_type, project_root_directory)
-    if project_type == "tauri":
-        return {
-            "tauri": framework_version,
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-            "cargo": get_tool_version_with_cmd("cargo --version").replace("cargo ", ""),
-            "rust": get_tool_version_with_cmd("rustc --version").replace("rustc ", ""),
-        }
-    elif project_type == "electronjs":
-        return {
-            "electron": framework_version,
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-        }
-    else:
-        return {
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-        }
-
+MIN_ITERATIONS = 3
 
 def get_build_file_path(project_type, src_dir, executable_type):
     """Gets the .exe file path."""
@@ -108,40 +27,119 @@ def get_build_file_path(project_type, src_dir, executable_type):
         exe_path = src_dir / "dist" / "win-unpacked" / "blendio-electronjs.exe"
         return exe_path   
 
-def run_command(cmd, cwd):
-    """Executes a given cmd and outputs its stdout to the terminal."""
-    
-    print(f"\nRunning passed command: {cmd} (in {cwd})")
-    start_ms = time.time_ns() // 1_000_000
-    proc = subprocess.Popen(cmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    if proc.stdout:
-        for line in proc.stdout:
-            print(line, end='')
-    
-    proc.wait()
-    end_ms = time.time_ns() // 1_000_000 # From ns to ms.
-    return {
-        "cmd": cmd,
-        "cwd": str(cwd),
-        "start_ms": start_ms,
-        "end_ms": end_ms,
-        "duration_ms": end_ms - start_ms,
-        "success": proc.returncode == 0,
-    }
+def build_executable(project_dir, build_commands):
+    """Installs dependencies and runs the build commands, returns True if every step succeeded."""
+    steps = [run_command("npm install", cwd=project_dir)]
+    for cmd in build_commands:
+        steps.append(run_command(cmd, cwd=project_dir))
+    return all(step["success"] for step in steps)
     
 def convert_bytes_to_mb(bytes_val):
     """Format byes to megabytes."""
     return f"{bytes_val / (1024 * 1024):.2f} MB"
 
-def get_process_memory(p: psutil.Process):
-    """Return memory in USS (if available), else RSS"""
+def read_smaps_rollup(pid):
+    """Reads RSS, PSS and USS from /proc/<pid>/smaps_rollup, or returns None where it is unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "rb") as f:
+            content = f.read()
+    except OSError:
+        return None
+
+    fields = {}
+    for line in content.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2:
+            fields[parts[0]] = int(parts[1]) * 1024 # From kB to bytes.
+    return {
+        "rss": fields.get(b"Rss:", 0),
+        "pss": fields.get(b"Pss:", 0),
+        "uss": fields.get(b"Private_Clean:", 0) + fields.get(b"Private_Dirty:", 0) + fields.get(b"Private_Hugetlb:", 0),
+        "source": "smaps_rollup",
+    }
+
+def get_process_memory(p: psutil.Process, tier="full"):
+    """
+    Returns the memory of a process for the given tier.
+
+    The "rss" tier only reads RSS (statm on Linux) and is cheap enough for every tick.
+    The "full" tier also reads USS and PSS, through smaps_rollup where the kernel provides it
+    and through memory_full_info() otherwise, which parses the whole smaps file on Linux.
+    """
     try:
-        mem_info = p.memory_full_info()
-        return getattr(mem_info, 'uss', p.memory_info().rss)
+        if tier == "full":
+            memory = read_smaps_rollup(p.pid)
+            if memory is not None:
+                return memory
+            mem_info = p.memory_full_info()
+            return {
+                "rss": mem_info.rss,
+                "pss": getattr(mem_info, "pss", None),
+                "uss": getattr(mem_info, "uss", None),
+                "source": "memory_full_info",
+            }
+        return {
+            "rss": p.memory_info().rss,
+            "pss": None,
+            "uss": None,
+            "source": "memory_info",
+        }
     except (psutil.NoSuchProcess, psutil.AccessDenied):
-        return 0
+        return {"rss": 0, "pss": None, "uss": None, "source": "unavailable"}
+
+def sum_reported(values):
+    """Sums the values that were reported, None when none was."""
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
 
-def monitor_runtime_resource_usage(exe_path, duration_seconds=10):
+class MemoryCollector:
+    """
+    Collects the memory of a process tree in tiers.
+
+    RSS is read on every tick, USS and PSS only on every full_memory_every-th tick
+    or on the next tick after request_full_sample().
+    ram_bytes keeps its USS meaning and is only set on full ticks. USS and PSS sum the
+    processes that report them and stay None where none of the tree does (PSS on Windows).
+    """
+
+    def __init__(self, full_memory_every=5):
+        self.full_memory_every = full_memory_every
+        self._full_sample_requested = False
+
+    def request_full_sample(self):
+        """Reads USS and PSS on the next tick regardless of the tick interval."""
+        self._full_sample_requested = True
+
+    def __call__(self, procs, tick):
+        tier = "rss"
+        if self._full_sample_requested or tick % self.full_memory_every == 0:
+            tier = "full"
+            self._full_sample_requested = False
+
+        memories = [get_process_memory(p, tier) for p in procs]
+        sample = {
+            "memory_tier": tier,
+            "memory_source": ",".join(sorted({m["source"] for m in memories})),
+            "rss_bytes": sum(m["rss"] for m in memories),
+            "uss_bytes": None,
+            "pss_bytes": None,
+            "ram_bytes": None,
+        }
+        if tier == "full":
+            sample["uss_bytes"] = sum_reported(m["uss"] for m in memories)
+            sample["pss_bytes"] = sum_reported(m["pss"] for m in memories)
+            sample["ram_bytes"] = sample["uss_bytes"]
+        return sample
+
+def get_mean_ram_bytes(iteration, result_dir):
+    """Gets the key metric of a runtime iteration, the mean USS of the tree, None when monitoring failed."""
+    runtime = iteration.get("runtime_resource_usage") or {}
+    if not runtime.get("success"):
+        return None
+    mean = nonzero_mean(load_metric(load_samples(runtime, "resource_usage_instances", result_dir), "ram_bytes"))
+    return mean if mean != "" else None
+
+def monitor_runtime_resource_usage(exe_path, duration_seconds=10, full_memory_every=5, sampling_backend="psutil"):
     """Launches the given .exe and logs CPU/RAM usage and process count over time."""
     if not exe_path.exists():
         print(f"Error: Executable not found at {exe_path}")
@@ -153,69 +151,28 @@ def monitor_runtime_resource_usage(exe_path, duration_seconds=10):
         print(f"Launched {exe_path.name} with PID {proc.pid}")
         parent = psutil.Process(proc.pid)
 
-        
-        parent.cpu_percent(interval=None)
-        for child in parent.children(recursive=True):
-            child.cpu_percent(interval=None)
-
-        resource_usage_instances = []
-
         start_ms = int(time.time() * 1000)
 
-        for p in [parent] + parent.children(recursive=True):
-            try:
-                p.cpu_percent(interval=None)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-
-        interval_seconds = 1
-        samples_target = duration_seconds
-
-        for i in range(samples_target):
-            iteration_start = time.time()
-
-            try:
-                all_procs = parent.children(recursive=True)
-                all_procs.insert(0, parent)
-
-                timestamp_ms = int(time.time() * 1000)
-
-                total_ram = 0
-                total_cpu = 0.0
-                process_count = 0
-
-                for p in all_procs:
-                    if not p.is_running():
-                        continue
-                    try:
-                        ram = get_process_memory(p)
-                        cpu = p.cpu_percent(interval=None)
-                        total_ram += ram
-                        total_cpu += cpu
-                        process_count += 1
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-
-                resource_usage_instances.append({
-                    "timestamp_ms": timestamp_ms,
-                    "main_pid": parent.pid,
-                    "main_name": parent.name(),
-                    "ram_bytes": total_ram,
-                    "cpu_percent": total_cpu,
-                    "process_count": process_count
-                })
-
-                print(f"[{timestamp_ms}] {parent.name()} (PID {parent.pid}): "
-                    f"{convert_bytes_to_mb(total_ram)} RAM | {total_cpu:.1f}% CPU | {process_count} procs")
-
-            except psutil.NoSuchProcess:
-                print("Main process ended.")
-                break
-
-            # Sleep just enough to maintain interval
-            iteration_duration = time.time() - iteration_start
-            time_to_sleep = max(0, interval_seconds - iteration_duration)
-            time.sleep(time_to_sleep)
+        def print_instance(instance):
+            memory = f"{convert_bytes_to_mb(instance['rss_bytes'])} RSS"
+            if instance["ram_bytes"] is not None:
+                memory += f", {convert_bytes_to_mb(instance['ram_bytes'])} USS"
+            print(f"[{instance['timestamp_ms']}] {instance['main_name']} (PID {instance['main_pid']}): "
+                f"{memory} | {instance['cpu_percent']:.1f}% CPU | {instance['process_count']} procs")
+
+        sampling = get_sampling_config("fixed", interval_ms=1000)
+        sampler = Sampler(
+            parent,
+            [MemoryCollector(full_memory_every), collect_cpu, collect_process_count],
+            sampling,
+            max_ticks=duration_seconds * 1000 // sampling["interval_ms"],
+            on_sample=print_instance,
+            backend=sampling_backend,
+        )
+        resource_usage_instances = sampler.run()
+
+        if sampler.stop_reason == "process_exited":
+            print("Main process ended.")
 
         end_ms = int(time.time() * 1000)
         duration_ms = end_ms - start_ms
@@ -240,6 +197,8 @@ def monitor_runtime_resource_usage(exe_path, duration_seconds=10):
             "end_ms": end_ms,
             "duration_ms": duration_ms,
             "success": True,
+            "full_memory_every": full_memory_every,
+            **sampler.describe(),
             "resource_usage_instances": resource_usage_instances
         }
 
@@ -271,7 +230,17 @@ def main():
     parser.add_argument("--project_type", required=True)
     parser.add_argument("--config", required=True)
     parser.add_argument("--output_dir", required=False)
+    parser.add_argument("--resume", action="store_true", help="Continue after the iterations already in the output directory")
+    parser.add_argument("--build_cache_dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no_build_cache", action="store_true", help="Always run npm install and the build commands on the first iteration")
+    parser.add_argument("--sampling_backend", choices=SAMPLING_BACKENDS, default="psutil")
+    parser.add_argument("--sample_format", choices=SAMPLE_FORMATS, default="columnar", help="Store samples as binary columns next to the results or inline as JSON")
+    add_iteration_arguments(parser, MIN_ITERATIONS)
+    parser.add_argument("--full_memory_every", type=int, default=5, help="Read USS/PSS on every Nth sample, RSS is read on every sample")
     args = parser.parse_args()
+    if args.full_memory_every < 1:
+        parser.error("--full_memory_every must be at least 1")
+    iteration_plan = get_iteration_plan(args, ITERATIONS)
 
     with open(args.config, "r", encoding="utf-8") as f:
         config = json.load(f)
@@ -293,13 +262,22 @@ def main():
 
     for test_case in test_cases:
         print(f"\n=== Running test case: {test_case['result_file_name']} ===")
-        all_results = []
+        writer = ResultWriter(result_dir, test_case["result_file_name"], resume=args.resume)
+        stopping_rule = StoppingRule("ram_bytes", **iteration_plan)
+        stopping_rule.seed(writer.records, lambda record: get_mean_ram_bytes(record, result_dir))
+        if stopping_rule.is_done():
+            print("All iterations already done, skipping.")
+            writer.close()
+            continue
+        build_file_path = None
 
         system_info = get_system_info()
         framework_versions = get_framework_versions(args.project_type, project_dir)
 
-        for i in range(ITERATIONS):
-            print(f"\n--- Iteration {i+1}/{ITERATIONS} ---")
+        for i in range(stopping_rule.max_iterations):
+            if writer.is_completed(i + 1):
+                continue
+            print(f"\n--- Iteration {i+1}/{stopping_rule.max_iterations} ---")
             session_start_ms = time.time_ns() // 1_000_000
             iteration = {
                 "iteration": i + 1,
@@ -309,28 +287,40 @@ def main():
                 "build_commands_used": test_case.get("build_commands", [])
             }
 
-            if i == 0:
-                run_command("npm install", cwd=project_dir)
-            if i == 0:
-                for cmd in test_case.get("build_commands", []):
-                    run_command(cmd, cwd=project_dir)
+            # Build on the first iteration that runs, which is not the first one when resuming.
+            if build_file_path is None:
+                build_commands = test_case.get("build_commands", [])
+                build_file_path = get_build_file_path(args.project_type, src_dir, test_case["executable_type"])
+                build_cache_info = None
+                if args.no_build_cache:
+                    build_executable(project_dir, build_commands)
+                else:
+                    artifact_dir = get_artifact_dir(args.project_type, src_dir, test_case["executable_type"])
+                    build_file_path, build_cache_info = get_or_build_executable(
+                        args.build_cache_dir,
+                        lambda: get_cache_key_inputs(args.project_type, project_dir, test_case["executable_type"], build_commands, framework_versions),
+                        artifact_dir, build_file_path,
+                        lambda: build_executable(project_dir, build_commands),
+                    )
+            iteration["build_cache"] = build_cache_info
         
-            build_file_path = get_build_file_path(args.project_type, src_dir, test_case["executable_type"])
             if build_file_path.exists():
                 print(f"\nLaunching and monitoring: {build_file_path}")
-                usage_result = monitor_runtime_resource_usage(build_file_path, duration_seconds=60)
+                usage_result = monitor_runtime_resource_usage(build_file_path, duration_seconds=60, full_memory_every=args.full_memory_every, sampling_backend=args.sampling_backend)
                 iteration["runtime_resource_usage"] = usage_result
+                if args.sample_format == "columnar":
+                    store_samples(usage_result, "resource_usage_instances", get_samples_dir(result_dir, test_case["result_file_name"]), i + 1)
             else:
                 print(f"Executable not found at {build_file_path}")
-            
-            all_results.append(iteration)
 
-        # Write results to the corresponding test case's file
-        result_file = result_dir / test_case["result_file_name"]
-        with open(result_file, "w", encoding="utf-8") as f:
-            json.dump(all_results, f, indent=2)
+            iteration["stopping_rule"] = stopping_rule.add(i + 1, get_mean_ram_bytes(iteration, result_dir))
+            print(stopping_rule.describe())
+            writer.append(iteration)
+            if stopping_rule.is_done():
+                break
 
-        print(f"\nResults saved to {result_file}")
+        writer.close()
+        print(f"\nResults saved to {writer.path}")
 
 
 if __name__ == "__main__":
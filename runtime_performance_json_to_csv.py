@@ -2,34 +2,42 @@ import json
 import csv
 import argparse
 from pathlib import Path
-from collections import defaultdict
-
-def compute_averages(rows, iteration=None):
-    def safe_avg(key):
-        values = [float(r[key]) for r in rows if r.get(key)]
-        return round(sum(values) / len(values), 2) if values else ""
-
+from result_writer import list_result_files, read_results
+from sample_store import load_samples
+from aggregation import (
+    DEFAULT_BOOTSTRAP_RESAMPLES, DEFAULT_CONFIDENCE, describe_columns, get_statistics_rows,
+    load_column, load_metric, nonzero_mean, to_metric_array, write_rows, write_summary,
+)
+
+# Fields that change from sample to sample, everything else is shared by the iteration.
+SAMPLE_FIELDS = [
+    "timestamp_ms", "main_pid", "main_name",
+    "cpu_percent", "ram_bytes", "process_count",
+    "rss_bytes", "uss_bytes", "pss_bytes", "memory_tier",
+]
+AVERAGED_FIELDS = ["cpu_percent", "ram_bytes", "process_count", "rss_bytes", "uss_bytes", "pss_bytes", "duration_ms", "duration_s"]
+AVERAGED_COLUMNS = {field: (field, 1) for field in AVERAGED_FIELDS}
+
+def compute_averages(metrics, iteration=None):
     label = f"AVERAGE_{iteration}" if iteration is not None else "AVERAGES"
     return {
         "file_name": label,
-        "cpu_percent": safe_avg("cpu_percent"),
-        "ram_bytes": safe_avg("ram_bytes"),
-        "process_count": safe_avg("process_count"),
-        "duration_ms": safe_avg("duration_ms"),
-        "duration_s": safe_avg("duration_s"),
+        **{key: nonzero_mean(metrics[key]) for key in AVERAGED_FIELDS},
     }
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--project_type", required=True)
-    parser.add_argument("--input_dir", required=True)
-    parser.add_argument("--output_csv", default="runtime_results_detailed.csv")
-    parser.add_argument("--config", required=True)
-    args = parser.parse_args()
-
-    input_dir = Path(args.input_dir)
-    config_path = Path(args.config)
-    output_csv = Path(args.output_csv)
+def convert(project_type, input_dir, output_csv, config_path, summary_json=None, confidence=DEFAULT_CONFIDENCE, bootstrap_resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Converts the result files of one suite run to a CSV and a statistics summary JSON."""
+    input_dir = Path(input_dir)
+    config_path = Path(config_path)
+    output_csv = Path(output_csv)
+    summary_json = Path(summary_json) if summary_json else output_csv.with_name(f"{output_csv.stem}_summary.json")
+    summary = {
+        "suite": "runtime",
+        "project_type": project_type,
+        "confidence": confidence,
+        "bootstrap_resamples": bootstrap_resamples,
+        "tests": {},
+    }
 
     with open(config_path, "r", encoding="utf-8") as f:
         config = json.load(f)
@@ -38,7 +46,7 @@ def main():
 
     with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
         fieldnames = []
-        if args.project_type == "tauri":
+        if project_type == "tauri":
             fieldnames = [
                 "file_name", "iteration", "timestamp_ms", "main_pid", "main_name",
                 "executable_type", "system_os", "system_cpu", "system_gpu", "system_ram",
@@ -46,9 +54,10 @@ def main():
                 "tauri", "node_version", "npm_version", "cargo_version", "rust_version",
                 "build_commands_used",
                 "start_ms", "end_ms", "duration_ms", "duration_s", "success",
-                "cpu_percent", "ram_bytes", "process_count"
+                "cpu_percent", "ram_bytes", "process_count",
+                "rss_bytes", "uss_bytes", "pss_bytes", "memory_tier"
             ]
-        elif args.project_type == "electronjs":
+        elif project_type == "electronjs":
             fieldnames = [
                 "file_name", "iteration", "timestamp_ms", "main_pid", "main_name",
                 "executable_type", "system_os", "system_cpu", "system_gpu", "system_ram",
@@ -56,108 +65,109 @@ def main():
                 "electron", "node_version", "npm_version",
                 "build_commands_used",
                 "start_ms", "end_ms", "duration_ms", "duration_s", "success",
-                "cpu_percent", "ram_bytes", "process_count"
+                "cpu_percent", "ram_bytes", "process_count",
+                "rss_bytes", "uss_bytes", "pss_bytes", "memory_tier"
             ]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
-        for json_file in sorted(input_dir.glob("*.json")):
-            if json_file.name not in test_map:
+        for result_file_name, json_file in list_result_files(input_dir):
+            if result_file_name not in test_map:
                 print(f"Skipping unrecognized file: {json_file.name}")
                 continue
 
-            test_params = test_map[json_file.name]
+            test_params = test_map[result_file_name]
 
             try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    iterations = json.load(f)
+                iterations = read_results(json_file)
             except Exception as e:
                 print(f"Failed to read {json_file.name}: {e}")
                 continue
 
-            all_rows = []
-            iteration_rows = defaultdict(list)
+            iteration_averages = []
+            iteration_descriptions = {}
 
             for iter_data in iterations:
-                usage_instances = iter_data["runtime_resource_usage"]["resource_usage_instances"]
+                runtime = iter_data["runtime_resource_usage"]
+                usage_instances = load_samples(runtime, "resource_usage_instances", json_file.parent)
                 if not usage_instances:
                     continue
 
-                runtime = iter_data["runtime_resource_usage"]
                 iteration = iter_data["iteration"]
-
-                for instance in usage_instances:
-                    row = {}
-                    if args.project_type == "tauri":
-                        row = {
-                            "file_name": json_file.name,
-                            "iteration": iteration,
-                            "timestamp_ms": instance.get("timestamp_ms", ""),
-                            "main_pid": instance.get("main_pid", ""),
-                            "main_name": instance.get("main_name", ""),
-                            "executable_type": test_params.get("executable_type", ""),
-                            "system_os": iter_data["system_info"].get("os", ""),
-                            "system_cpu": iter_data["system_info"].get("cpu", ""),
-                            "system_gpu": iter_data["system_info"].get("gpu", ""),
-                            "system_ram": iter_data["system_info"].get("ram", ""),
-                            "cpu_cores": iter_data["system_info"].get("cpu_cores", ""),
-                            "cpu_threads": iter_data["system_info"].get("cpu_threads", ""),
-                            "node_version": iter_data["framework_versions"].get("node", ""),
-                            "npm_version": iter_data["framework_versions"].get("npm", ""),
-                            "cargo_version": iter_data["framework_versions"].get("cargo", ""),
-                            "rust_version": iter_data["framework_versions"].get("rust", ""),
-                            "build_commands_used": "; ".join(iter_data.get("build_commands_used", [])),
-                            "start_ms": runtime.get("start_ms", ""),
-                            "end_ms": runtime.get("end_ms", ""),
-                            "duration_ms": runtime.get("duration_ms", ""),
-                            "duration_s": round(runtime.get("duration_ms", 0) / 1000, 2),
-                            "success": runtime.get("success", ""),
-                            "cpu_percent": instance.get("cpu_percent", ""),
-                            "ram_bytes": instance.get("ram_bytes", ""),
-                            "process_count": instance.get("process_count", "")
-                        }
-                    elif args.project_type == "electronjs":
-                        row = {
-                            "file_name": json_file.name,
-                            "iteration": iter_data["iteration"],
-                            "timestamp_ms": instance.get("timestamp_ms", ""),
-                            "main_pid": instance.get("main_pid", ""),
-                            "main_name": instance.get("main_name", ""),
-                            "executable_type": test_params.get("executable_type", ""),
-                            "system_os": iter_data["system_info"].get("os", ""),
-                            "system_cpu": iter_data["system_info"].get("cpu", ""),
-                            "system_gpu": iter_data["system_info"].get("gpu", ""),
-                            "system_ram": iter_data["system_info"].get("ram", ""),
-                            "cpu_cores": iter_data["system_info"].get("cpu_cores", ""),
-                            "cpu_threads": iter_data["system_info"].get("cpu_threads", ""),
-                            "node_version": iter_data["framework_versions"].get("node", ""),
-                            "npm_version": iter_data["framework_versions"].get("npm", ""),
-                            "build_commands_used": "; ".join(iter_data.get("build_commands_used", [])),
-                            "start_ms": runtime.get("start_ms", ""),
-                            "end_ms": runtime.get("end_ms", ""),
-                            "duration_ms": runtime.get("duration_ms", ""),
-                            "duration_s": round(runtime.get("duration_ms", 0) / 1000, 2),
-                            "success": runtime.get("success", ""),
-                            "cpu_percent": instance.get("cpu_percent", ""),
-                            "ram_bytes": instance.get("ram_bytes", ""),
-                            "process_count": instance.get("process_count", "")
-                        }
-                   
-                    writer.writerow(row)
-                    all_rows.append(row)
-                    iteration_rows[iteration].append(row)
+                count = len(usage_instances)
+                # Results without tiers read USS on every sample.
+                columns = {key: load_column(usage_instances, key, "full" if key == "memory_tier" else "") for key in SAMPLE_FIELDS}
+
+                constants = {
+                    "file_name": result_file_name,
+                    "iteration": iteration,
+                    "executable_type": test_params.get("executable_type", ""),
+                    "system_os": iter_data["system_info"].get("os", ""),
+                    "system_cpu": iter_data["system_info"].get("cpu", ""),
+                    "system_gpu": iter_data["system_info"].get("gpu", ""),
+                    "system_ram": iter_data["system_info"].get("ram", ""),
+                    "cpu_cores": iter_data["system_info"].get("cpu_cores", ""),
+                    "cpu_threads": iter_data["system_info"].get("cpu_threads", ""),
+                    "node_version": iter_data["framework_versions"].get("node", ""),
+                    "npm_version": iter_data["framework_versions"].get("npm", ""),
+                    "build_commands_used": "; ".join(iter_data.get("build_commands_used", [])),
+                    "start_ms": runtime.get("start_ms", ""),
+                    "end_ms": runtime.get("end_ms", ""),
+                    "duration_ms": runtime.get("duration_ms", ""),
+                    "duration_s": round(runtime.get("duration_ms", 0) / 1000, 2),
+                    "success": runtime.get("success", ""),
+                }
+                if project_type == "tauri":
+                    constants["cargo_version"] = iter_data["framework_versions"].get("cargo", "")
+                    constants["rust_version"] = iter_data["framework_versions"].get("rust", "")
+
+                write_rows(csvfile, fieldnames, columns, constants, count)
 
                 # Write iteration average row
-                iter_avg = compute_averages(iteration_rows[iteration], iteration=iteration)
+                metrics = {key: load_metric(usage_instances, key, columns[key]) for key in SAMPLE_FIELDS if key in AVERAGED_FIELDS}
+                metrics["duration_ms"] = to_metric_array([constants["duration_ms"]]) * count
+                metrics["duration_s"] = to_metric_array([constants["duration_s"]]) * count
+                iter_avg = compute_averages(metrics, iteration=iteration)
                 writer.writerow(iter_avg)
-                writer.writerow({})  # Empty line between iterations
+                iteration_averages.append(iter_avg)
 
-            # if all_rows:
-            #     # Final overall average
-            #     avg_row = compute_averages(all_rows)
-            #     writer.writerow(avg_row)
+                # Consecutive samples of one run are not independent, so iterations get no bootstrap interval.
+                descriptions = describe_columns(metrics, AVERAGED_COLUMNS, resamples=0)
+                for statistics_row in get_statistics_rows(descriptions, suffix=f"_{iteration}", include_ci=False):
+                    writer.writerow(statistics_row)
+                iteration_descriptions[iteration] = descriptions
+                writer.writerow({})  # Empty line between iterations
 
+            if iteration_averages:
+                # The test case is described by the averages of its iterations, which are independent runs.
+                metrics = {key: to_metric_array(load_column(iteration_averages, key)) for key in AVERAGED_FIELDS}
+                writer.writerow(compute_averages(metrics))
+                descriptions = describe_columns(metrics, AVERAGED_COLUMNS, confidence, bootstrap_resamples)
+                for statistics_row in get_statistics_rows(descriptions, confidence=confidence):
+                    writer.writerow(statistics_row)
+                writer.writerow({})  # Empty line
+                summary["tests"][result_file_name] = {
+                    "iterations": len(iteration_averages),
+                    "columns": descriptions,
+                    "per_iteration": iteration_descriptions,
+                }
+
+    write_summary(summary_json, summary)
     print(f"\nRuntime performance CSV created at: {output_csv}")
+    print(f"Statistics summary created at: {summary_json}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project_type", required=True)
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_csv", default="runtime_results_detailed.csv")
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--summary_json", required=False, help="Defaults to <output_csv stem>_summary.json")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--bootstrap_resamples", type=int, default=DEFAULT_BOOTSTRAP_RESAMPLES)
+    args = parser.parse_args()
+
+    convert(args.project_type, args.input_dir, args.output_csv, args.config, args.summary_json, args.confidence, args.bootstrap_resamples)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,194 @@
+import json
+import math
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+
+SAMPLE_FORMATS = ["columnar", "json"]
+SAMPLES_SUFFIX = ".samples"
+COLUMN_FORMAT_VERSION = 1
+COLUMN_ALIGNMENT = 8
+
+def get_samples_dir(result_dir, result_file_name):
+    """Gets the directory the columnar samples of a test case are stored in, next to its result file."""
+    return Path(result_dir) / Path(result_file_name).with_suffix(SAMPLES_SUFFIX).name
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def encode_column(values):
+    """
+    Picks the most compact encoding for the values of one column.
+
+    Columns with a single value (main_pid, main_name) are kept in the header only. Numbers
+    become a typed array, int64 when every value is an int, float64 otherwise with NaN for
+    missing values. Everything else is stored as codes into a list of categories.
+    """
+    first = values[0]
+    if all(value == first and type(value) is type(first) for value in values):
+        return {"encoding": "constant", "value": first}, None
+
+    if all(value is None or is_number(value) for value in values):
+        if all(isinstance(value, int) for value in values):
+            return {"encoding": "array", "typecode": "q", "kind": "int"}, array("q", values)
+        kind = "int" if all(value is None or isinstance(value, int) for value in values) else "float"
+        data = array("d", (math.nan if value is None else value for value in values))
+        return {"encoding": "array", "typecode": "d", "kind": kind}, data
+
+    categories = []
+    codes = {}
+    for value in values:
+        key = json.dumps(value)
+        if key not in codes:
+            codes[key] = len(categories)
+            categories.append(value)
+    typecode = "H" if len(categories) <= 0xFFFF else "L"
+    data = array(typecode, (codes[json.dumps(value)] for value in values))
+    return {"encoding": "categorical", "typecode": typecode, "categories": categories}, data
+
+def write_samples(samples_dir, iteration_number, samples):
+    """
+    Writes the samples of one iteration as a binary column file with a JSON header next to it.
+
+    Returns the reference that replaces the sample list in the result record.
+    """
+    samples_dir = Path(samples_dir)
+    samples_dir.mkdir(parents=True, exist_ok=True)
+    name = f"iteration_{iteration_number}"
+
+    column_names = []
+    for sample in samples:
+        for key in sample:
+            if key not in column_names:
+                column_names.append(key)
+
+    header = {
+        "format_version": COLUMN_FORMAT_VERSION,
+        "count": len(samples),
+        "byteorder": sys.byteorder,
+        "columns": {},
+    }
+    offset = 0
+    with open(samples_dir / f"{name}.bin", "wb") as f:
+        for column_name in column_names:
+            column, data = encode_column([sample.get(column_name) for sample in samples])
+            if data is not None:
+                padding = -offset % COLUMN_ALIGNMENT
+                f.write(b"\0" * padding)
+                column["offset"] = offset + padding
+                data.tofile(f)
+                offset += padding + len(data) * data.itemsize
+            header["columns"][column_name] = column
+        f.flush()
+        os.fsync(f.fileno())
+
+    with open(samples_dir / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+    return {
+        "format": "columnar",
+        "path": f"{samples_dir.name}/{name}",
+        "count": len(samples),
+    }
+
+def store_samples(container, key, samples_dir, iteration_number):
+    """Moves the sample list under key of a result into the columnar store, empty lists stay inline."""
+    samples = container.get(key)
+    if samples:
+        container[key] = write_samples(samples_dir, iteration_number, samples)
+
+class SampleColumns:
+    """
+    Read-only view of one iteration stored by write_samples().
+
+    The column file is memory-mapped and column() returns typed memoryviews into it, so no
+    per-sample objects are created unless rows are asked for. Rows come back as dicts with
+    the same values the samples were written with.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        with open(path.with_suffix(".json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        self.count = header["count"]
+        self.columns = header["columns"]
+        self._swap_bytes = header["byteorder"] != sys.byteorder
+        self._buffer = None
+        bin_path = path.with_suffix(".bin")
+        if bin_path.stat().st_size > 0:
+            with open(bin_path, "rb") as f:
+                self._buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        self._cache = {}
+
+    def __len__(self):
+        return self.count
+
+    def column(self, name):
+        """Returns the values of a column, typed columns as a memoryview over the mapped file."""
+        if name in self._cache:
+            return self._cache[name]
+        column = self.columns.get(name)
+        if column is None:
+            values = [None] * self.count
+        elif column["encoding"] == "constant":
+            values = [column["value"]] * self.count
+        else:
+            itemsize = array(column["typecode"]).itemsize
+            start = column["offset"]
+            values = self._buffer[start:start + self.count * itemsize].cast(column["typecode"])
+            if self._swap_bytes:
+                values = array(column["typecode"], values.tobytes())
+                values.byteswap()
+            if column["encoding"] == "categorical":
+                categories = column["categories"]
+                values = [categories[code] for code in values]
+        self._cache[name] = values
+        return values
+
+    def values(self, name):
+        """Returns every value of a column as a list, with the same values get_value() returns."""
+        column = self.columns.get(name)
+        values = self.column(name)
+        if column is None or column["encoding"] != "array":
+            return list(values)
+        values = values.tolist()
+        if column["typecode"] == "d":
+            if column["kind"] == "int":
+                return [None if value != value else int(value) for value in values]
+            return [None if value != value else value for value in values]
+        return values
+
+    def get_value(self, name, index):
+        """Returns a single value as it was written, NaN in float columns of ints reads back as None."""
+        column = self.columns.get(name)
+        if column is None:
+            return None
+        value = self.column(name)[index]
+        if column["encoding"] == "array" and column["typecode"] == "d":
+            if math.isnan(value):
+                return None
+            if column["kind"] == "int":
+                return int(value)
+        return value
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("sample index out of range")
+        return {name: self.get_value(name, index) for name in self.columns}
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+def load_samples(container, key, base_dir):
+    """Returns the samples under key of a result, reading them from the columnar store when referenced."""
+    samples = container.get(key)
+    if isinstance(samples, dict) and samples.get("format") == "columnar":
+        return SampleColumns(Path(base_dir) / samples["path"])
+    return samples or []
@@ -0,0 +1,210 @@
+import threading
+import time
+import psutil
+from process_tracker import ProcessTracker
+from procfs_backend import ProcfsTracker, is_procfs_available
+
+SAMPLING_BACKENDS = ["psutil", "procfs"]
+
+# Sampling cadences shared by the monitors.
+# "fixed" samples once per interval, "adaptive" samples fast right after launch
+# and backs off once the process tree has settled.
+SAMPLING_MODES = {
+    "fixed": {
+        "mode": "fixed",
+        "interval_ms": 1000,
+    },
+    "adaptive": {
+        "mode": "adaptive",
+        "fast_interval_ms": 10,
+        "fast_phase_ms": 3000,
+        "slow_interval_ms": 250,
+        "settle_samples": 20,
+        "cpu_window_ms": 100,
+    },
+}
+
+def get_sampling_config(sampling_mode, **overrides):
+    """Returns a copy of the sampling cadence for the given mode."""
+    if sampling_mode not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling_mode}")
+    sampling = dict(SAMPLING_MODES[sampling_mode])
+    sampling.update(overrides)
+    return sampling
+
+def get_next_sample_interval_ms(sampling, elapsed_ms, stable_samples, previous_interval_ms):
+    """Returns the delay until the next sample for the given sampling cadence."""
+    if sampling["mode"] == "fixed":
+        return sampling["interval_ms"]
+
+    # Poll fast right after launch and while the process tree keeps changing.
+    if elapsed_ms < sampling["fast_phase_ms"] or stable_samples < sampling["settle_samples"]:
+        return sampling["fast_interval_ms"]
+
+    # Tree has settled, back off gradually towards the slow interval.
+    return min(previous_interval_ms * 2, sampling["slow_interval_ms"])
+
+def create_tracker(parent, backend="psutil"):
+    """Creates the process tracker for the given sampling backend, falling back to psutil."""
+    if backend == "procfs":
+        if is_procfs_available():
+            return ProcfsTracker(parent)
+        print("Warning: /proc sampling backend is not available on this system, using psutil.")
+    return ProcessTracker(parent)
+
+def collect_cpu(procs, tick):
+    """Sums the CPU usage of the given processes."""
+    total_cpu = 0.0
+    for p in procs:
+        try:
+            total_cpu += p.cpu_percent(interval=None)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return {"cpu_percent": total_cpu}
+
+def collect_process_count(procs, tick):
+    """Counts the given processes."""
+    return {"process_count": len(procs)}
+
+class Sampler:
+    """
+    Samples a process tree on a dedicated thread.
+
+    Samples are scheduled against monotonic deadlines, so a slow tick does not shift the
+    ones after it. Deadlines that have already passed when a tick finishes are skipped
+    and counted as missed, which keeps every sample on the configured grid.
+    Each collector is called as collector(procs, tick) and returns the fields it adds to the sample.
+    The process tree is kept by a tracker of the chosen backend and all collectors of a tick
+    share one batched read of the tree.
+    """
+
+    def __init__(self, parent, collectors, sampling, max_ticks=None, stop_condition=None, on_sample=None, start_ns=None, backend="psutil"):
+        self.parent = parent
+        self.collectors = collectors
+        self.sampling = sampling
+        self.max_ticks = max_ticks
+        self.stop_condition = stop_condition
+        self.on_sample = on_sample
+        self.start_ns = start_ns
+        self.tracker = create_tracker(parent, backend)
+        self.backend = "procfs" if isinstance(self.tracker, ProcfsTracker) else "psutil"
+        self.samples = []
+        self.stop_reason = None
+        self.error = None
+        self.stats = {
+            "ticks": 0,
+            "missed_ticks": 0,
+            "max_lateness_ms": 0.0,
+            "mean_lateness_ms": 0.0,
+        }
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampler", daemon=True)
+
+    def start(self):
+        """Starts sampling on the background thread."""
+        if self.start_ns is None:
+            self.start_ns = time.monotonic_ns()
+        self._thread.start()
+
+    def stop(self):
+        """Asks the sampling thread to stop after the current tick."""
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        """Waits for the sampling thread to finish."""
+        self._thread.join(timeout)
+
+    def run(self):
+        """Samples until a stop condition is reached and returns the samples."""
+        self.start()
+        self.join()
+        if self.error is not None:
+            raise self.error
+        return self.samples
+
+    def _run(self):
+        try:
+            self._sample_loop()
+        except Exception as e:
+            self.error = e
+            self.stop_reason = "error"
+        finally:
+            self.tracker.close()
+
+    def _sample_loop(self):
+        main_pid = self.parent.pid
+        main_name = self.parent.name()
+        interval_ms = self.sampling.get("fast_interval_ms", self.sampling.get("interval_ms"))
+        total_lateness_ms = 0.0
+        stable_samples = 0
+        previous_count = None
+        tick = 0
+        deadline_ns = time.monotonic_ns()
+
+        while not self._stop_event.is_set():
+            timestamp_ns = time.monotonic_ns()
+            try:
+                procs = self.tracker.refresh()
+                sample = {
+                    "tick": tick,
+                    "timestamp_ms": time.time_ns() // 1_000_000,
+                    "timestamp_ns": timestamp_ns,
+                    "elapsed_ms": round((timestamp_ns - self.start_ns) / 1_000_000, 3),
+                    "main_pid": main_pid,
+                    "main_name": main_name,
+                }
+                with self.tracker.oneshot(procs):
+                    for collector in self.collectors:
+                        sample.update(collector(procs, tick))
+            except psutil.NoSuchProcess:
+                self.stop_reason = "process_exited"
+                break
+
+            lateness_ms = (timestamp_ns - deadline_ns) / 1_000_000
+            total_lateness_ms += lateness_ms
+            self.stats["ticks"] += 1
+            self.stats["max_lateness_ms"] = round(max(self.stats["max_lateness_ms"], lateness_ms), 3)
+            self.samples.append(sample)
+
+            if self.on_sample:
+                self.on_sample(sample)
+
+            if self.stop_condition and self.stop_condition(self.samples):
+                self.stop_reason = "criteria_met"
+                break
+
+            stable_samples = stable_samples + 1 if len(procs) == previous_count else 0
+            previous_count = len(procs)
+
+            # Advance along the deadline grid, skipping and counting deadlines already missed.
+            interval_ms = get_next_sample_interval_ms(self.sampling, sample["elapsed_ms"], stable_samples, interval_ms)
+            interval_ns = int(interval_ms * 1_000_000)
+            deadline_ns += interval_ns
+            tick += 1
+            now_ns = time.monotonic_ns()
+            if now_ns > deadline_ns:
+                missed = (now_ns - deadline_ns) // interval_ns + 1
+                deadline_ns += missed * interval_ns
+                tick += missed
+                self.stats["missed_ticks"] += missed
+
+            # The last deadline is still waited for, so the grid covers max_ticks full intervals.
+            self._stop_event.wait((deadline_ns - time.monotonic_ns()) / 1_000_000_000)
+
+            if self.max_ticks is not None and tick >= self.max_ticks:
+                self.stop_reason = "max_ticks"
+                break
+
+        if self.stop_reason is None:
+            self.stop_reason = "stopped"
+        if self.stats["ticks"]:
+            self.stats["mean_lateness_ms"] = round(total_lateness_ms / self.stats["ticks"], 3)
+
+    def describe(self):
+        """Returns the sampling cadence and scheduling statistics for storing with results."""
+        return {
+            "sampling": self.sampling,
+            "sampling_backend": self.backend,
+            "sampler_stats": dict(self.stats, stop_reason=self.stop_reason),
+            "tracker_stats": dict(self.tracker.stats),
+        }
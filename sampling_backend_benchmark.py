@@ -0,0 +1,83 @@
+import subprocess
+import sys
+import time
+import json
+import argparse
+import statistics
+import psutil
+from sampler import SAMPLING_BACKENDS, collect_cpu, collect_process_count, create_tracker
+from runtime_performance import MemoryCollector
+from startup_calibration import terminate_process_tree
+
+def spawn_process_tree(child_count):
+    """Launches an idle parent process with the given number of idle children."""
+    script = (
+        "import subprocess, sys, time\n"
+        f"children = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(600)']) for _ in range({child_count})]\n"
+        "time.sleep(600)\n"
+    )
+    proc = subprocess.Popen([sys.executable, "-c", script])
+    parent = psutil.Process(proc.pid)
+
+    # Wait until every child is up, so both backends see the same tree.
+    deadline = time.monotonic() + 30
+    while len(parent.children(recursive=True)) < child_count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return proc, parent
+
+def measure_backend(parent, backend, ticks):
+    """Measures the per-tick cost of refreshing and reading the tree with the given backend."""
+    tracker = create_tracker(parent, backend)
+    collectors = [MemoryCollector(full_memory_every=ticks + 1), collect_cpu, collect_process_count]
+    durations_us = []
+    try:
+        # The first tick discovers the tree, only the steady state is measured.
+        for tick in range(ticks + 1):
+            start_ns = time.perf_counter_ns()
+            procs = tracker.refresh()
+            with tracker.oneshot(procs):
+                for collector in collectors:
+                    collector(procs, tick + 1)
+            if tick > 0:
+                durations_us.append((time.perf_counter_ns() - start_ns) / 1000)
+    finally:
+        tracker.close()
+
+    durations_us.sort()
+    return {
+        "backend": backend,
+        "process_count": len(procs),
+        "ticks": ticks,
+        "mean_us": round(statistics.mean(durations_us), 1),
+        "median_us": round(statistics.median(durations_us), 1),
+        "p95_us": round(durations_us[int(len(durations_us) * 0.95) - 1], 1),
+        "max_us": round(durations_us[-1], 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the per-tick sampling cost of the psutil and /proc backends.")
+    parser.add_argument("--child_counts", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--output_json", required=False)
+    args = parser.parse_args()
+
+    results = []
+    for child_count in args.child_counts:
+        proc, parent = spawn_process_tree(child_count)
+        try:
+            for backend in SAMPLING_BACKENDS:
+                result = measure_backend(parent, backend, args.ticks)
+                results.append(result)
+                print(f"{result['backend']:>6} | {result['process_count']:>3} procs | "
+                    f"mean {result['mean_us']:>8.1f} us | median {result['median_us']:>8.1f} us | p95 {result['p95_us']:>8.1f} us")
+        finally:
+            terminate_process_tree(parent)
+            proc.wait()
+
+    if args.output_json:
+        with open(args.output_json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output_json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import subprocess
+import time
+from collections import Counter
+from pathlib import Path
+import psutil
+from aggregation import percentile
+from sampler import Sampler, collect_cpu, collect_process_count, get_sampling_config
+
+CALIBRATION_MODES = ["auto", "always", "off"]
+CALIBRATION_SUFFIX = ".calibration.json"
+DEFAULT_CALIBRATION_RUNS = 3
+DEFAULT_CALIBRATION_DURATION_MS = 10000
+CALIBRATION_INTERVAL_MS = 100
+# The tail of every calibration launch taken as the app's steady state, at most a third of the launch.
+STEADY_WINDOW_MS = 3000
+# Added to the idle CPU floor, so the threshold stays the 1.0 % used so far for an app that idles at 0 %.
+CPU_THRESHOLD_MARGIN = 1.0
+
+# Criteria used before calibration, and with --calibrate off.
+DEFAULT_STARTUP_CRITERIA = {
+    "tauri": {"expected_main_process_count": 7, "cpu_threshold": 1.0},
+    "electronjs": {"expected_main_process_count": 4, "cpu_threshold": 1.0},
+}
+
+def get_calibration_path(config_path):
+    """Gets the sidecar file the calibrations of a startup config are stored in, next to the config."""
+    config_path = Path(config_path)
+    return config_path.with_name(f"{config_path.stem}{CALIBRATION_SUFFIX}")
+
+def read_calibrations(calibration_path):
+    if not Path(calibration_path).exists():
+        return {}
+    with open(calibration_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_calibration(calibration_path, result_file_name, calibration):
+    """Stores the calibration of one test case, keeping the others in the sidecar file."""
+    calibration_path = Path(calibration_path)
+    calibrations = read_calibrations(calibration_path)
+    calibrations[result_file_name] = calibration
+    temp_path = calibration_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(calibrations, f, indent=2)
+    os.replace(temp_path, calibration_path)
+
+def get_executable_fingerprint(exe_path):
+    """Identifies the build a calibration was made with by content, every test case run rebuilds the executable."""
+    digest = hashlib.sha256()
+    with open(exe_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"path": str(exe_path), "size": Path(exe_path).stat().st_size, "sha256": digest.hexdigest()}
+
+def terminate_process_tree(parent):
+    """Terminates the parent process and all of its descendants."""
+    try:
+        procs = parent.children(recursive=True) + [parent]
+        for p in procs:
+            p.terminate()
+        gone, alive = psutil.wait_procs(procs, timeout=5)
+        for p in alive:
+            p.kill()
+    except psutil.NoSuchProcess:
+        pass
+
+def measure_steady_state(exe_path, duration_ms, sampling_backend="psutil"):
+    """Launches the app once, samples it for duration_ms and describes its steady state."""
+    sampling = get_sampling_config("fixed", interval_ms=CALIBRATION_INTERVAL_MS)
+    proc = subprocess.Popen([str(exe_path)])
+    parent = psutil.Process(proc.pid)
+    sampler = Sampler(parent, [collect_cpu, collect_process_count], sampling, max_ticks=duration_ms // CALIBRATION_INTERVAL_MS, backend=sampling_backend)
+    try:
+        moments = sampler.run()
+        exited = proc.poll() is not None
+    finally:
+        terminate_process_tree(parent)
+        proc.wait()
+    if exited or sampler.stop_reason == "process_exited" or not moments:
+        raise RuntimeError(f"{exe_path.name} exited during calibration")
+
+    window_start_ms = moments[-1]["elapsed_ms"] - min(STEADY_WINDOW_MS, duration_ms // 3)
+    window = [m for m in moments if m["elapsed_ms"] >= window_start_ms]
+    process_count = Counter(m["process_count"] for m in window).most_common(1)[0][0]
+    settled = next(m for m in moments if m["process_count"] >= process_count)
+    return {
+        "process_count": process_count,
+        "max_process_count": max(m["process_count"] for m in moments),
+        "cpu_floor_percent": round(percentile(sorted(m["cpu_percent"] for m in window), 90), 2),
+        "process_count_reached_ms": settled["elapsed_ms"],
+    }
+
+def calibrate_startup(exe_path, runs=DEFAULT_CALIBRATION_RUNS, duration_ms=DEFAULT_CALIBRATION_DURATION_MS, sampling_backend="psutil"):
+    """
+    Learns the startup criteria of an app from a few launches.
+
+    The expected process count is the smallest steady-state count of the launches, the CPU
+    threshold is the highest idle CPU floor (90th percentile of the steady state) plus a margin.
+    """
+    print(f"Calibrating startup criteria of {exe_path.name} with {runs} launches of {duration_ms} ms...")
+    measurements = []
+    for run in range(runs):
+        measurement = measure_steady_state(exe_path, duration_ms, sampling_backend)
+        print(f"Calibration launch {run + 1}/{runs}: {measurement['process_count']} processes, idle CPU {measurement['cpu_floor_percent']:.2f}%")
+        measurements.append(measurement)
+
+    counts = sorted({m["process_count"] for m in measurements})
+    if len(counts) > 1:
+        print(f"Warning: calibration launches settled at different process counts {counts}, using {counts[0]}.")
+    return {
+        "expected_main_process_count": counts[0],
+        "cpu_threshold": round(max(m["cpu_floor_percent"] for m in measurements) + CPU_THRESHOLD_MARGIN, 2),
+        "executable": get_executable_fingerprint(exe_path),
+        "calibrated_ms": time.time_ns() // 1_000_000,
+        "duration_ms": duration_ms,
+        "launches": measurements,
+    }
+
+def get_startup_criteria(mode, project_type, exe_path, calibration_path, result_file_name, runs=DEFAULT_CALIBRATION_RUNS, duration_ms=DEFAULT_CALIBRATION_DURATION_MS, sampling_backend="psutil"):
+    """
+    Gets the startup criteria of a test case.
+
+    "auto" uses the stored calibration when it was made with the same executable and
+    calibrates otherwise, "always" calibrates again, "off" uses the fixed defaults.
+    """
+    default = {**DEFAULT_STARTUP_CRITERIA[project_type], "source": "default"}
+    if mode == "off":
+        return default
+
+    calibration = read_calibrations(calibration_path).get(result_file_name)
+    if mode == "auto" and calibration and calibration["executable"] == get_executable_fingerprint(exe_path):
+        print(f"Using the calibration from {calibration_path.name}.")
+    else:
+        try:
+            calibration = calibrate_startup(exe_path, runs, duration_ms, sampling_backend)
+        except (RuntimeError, psutil.Error, OSError) as e:
+            print(f"Warning: calibration failed ({e}), using the default startup criteria.")
+            return default
+        # A lone process means the app never got past its launcher, judging startups by it would pass every launch.
+        if calibration["expected_main_process_count"] == 1 < default["expected_main_process_count"]:
+            print(f"Warning: calibration settled at a single process, {project_type} apps start {default['expected_main_process_count']}; using the default startup criteria.")
+            return default
+        write_calibration(calibration_path, result_file_name, calibration)
+        print(f"Calibration saved to {calibration_path}")
+
+    return {
+        "expected_main_process_count": calibration["expected_main_process_count"],
+        "cpu_threshold": calibration["cpu_threshold"],
+        "source": "calibrated",
+        "calibrated_ms": calibration["calibrated_ms"],
+    }
+
+def check_divergence(criteria, startup):
+    """Lists how a startup measurement diverged from the criteria it was measured with."""
+    warnings = []
+    readiness = startup.get("readiness") or {}
+    if readiness.get("signalled"):
+        return warnings
+    if readiness.get("mode", "heuristic") != "heuristic":
+        warnings.append("the app did not signal readiness, the heuristic decided")
+    final_count = startup.get("final_process_count")
+    expected = criteria["expected_main_process_count"]
+    if final_count is not None and final_count != expected:
+        warnings.append(f"the app had {final_count} processes when startup ended, the criteria expect {expected}")
+    return warnings
@@ -0,0 +1,77 @@
+MILESTONE_FIELDS = ["first_child_ms", "peak_cpu_ms", "peak_cpu_percent", "quiescence_ms", "peak_to_quiescence_ms"]
+
+def get_process_count_field(count):
+    return f"processes_{count}_ms"
+
+def get_process_count(moment):
+    # Startup moments written by the monitor count the tree as main_process_count.
+    return moment.get("main_process_count", moment.get("process_count")) or 0
+
+def get_observed_process_counts(moments):
+    """Gets the distinct process counts above the main process that the moments went through."""
+    return {count for count in map(get_process_count, moments) if count > 1}
+
+def get_elapsed_ms(moments, start_ms=None):
+    """
+    Gets the time of every moment in ms since launch.
+
+    Moments recorded before the sampler timed them only have timestamp_ms, their time is
+    taken from the start_ms of the startup, or from the first moment without one.
+    """
+    if all("elapsed_ms" in moment for moment in moments):
+        return [moment["elapsed_ms"] for moment in moments]
+    origin_ms = start_ms if start_ms is not None else moments[0]["timestamp_ms"]
+    return [moment["timestamp_ms"] - origin_ms for moment in moments]
+
+def get_windowed_cpu(moments, elapsed_ms, window_ms):
+    """Averages the CPU usage of every moment over the trailing window ending at it."""
+    windowed = []
+    total = 0.0
+    first = 0
+    for index, moment in enumerate(moments):
+        total += moment["cpu_percent"]
+        while elapsed_ms[first] < elapsed_ms[index] - window_ms:
+            total -= moments[first]["cpu_percent"]
+            first += 1
+        windowed.append(total / (index - first + 1))
+    return windowed
+
+def get_startup_milestones(moments, cpu_threshold, cpu_window_ms=0, process_counts=(), start_ms=None):
+    """
+    Derives the milestones of one startup from its moments, in ms since launch (start_ms).
+
+    first_child_ms is the first moment with more than the main process, processes_<n>_ms the
+    first moment with at least n processes. Quiescence is the first moment after the CPU peak
+    from which the (windowed) CPU usage stays below cpu_threshold until the last moment.
+    Milestones that were not reached are None.
+    """
+    milestones = {field: None for field in MILESTONE_FIELDS}
+    milestones.update({get_process_count_field(count): None for count in process_counts})
+    moments = list(moments)
+    if not moments:
+        return milestones
+    elapsed_ms = get_elapsed_ms(moments, start_ms)
+
+    for moment, moment_ms in zip(moments, elapsed_ms):
+        count = get_process_count(moment)
+        if count > 1 and milestones["first_child_ms"] is None:
+            milestones["first_child_ms"] = moment_ms
+        for milestone in process_counts:
+            field = get_process_count_field(milestone)
+            if count >= milestone and milestones[field] is None:
+                milestones[field] = moment_ms
+
+    cpu = get_windowed_cpu(moments, elapsed_ms, cpu_window_ms)
+    peak = max(range(len(moments)), key=lambda index: cpu[index])
+    milestones["peak_cpu_ms"] = elapsed_ms[peak]
+    milestones["peak_cpu_percent"] = round(cpu[peak], 2)
+
+    quiescence = None
+    for index in range(len(moments) - 1, peak - 1, -1):
+        if cpu[index] >= cpu_threshold:
+            break
+        quiescence = index
+    if quiescence is not None:
+        milestones["quiescence_ms"] = elapsed_ms[quiescence]
+        milestones["peak_to_quiescence_ms"] = round(elapsed_ms[quiescence] - elapsed_ms[peak], 3)
+    return milestones
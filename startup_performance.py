@@ -4,97 +4,21 @@ import psutil
 import json
 import argparse
 from pathlib import Path
-import platform
-import os
+from command_runner import run_command
+from environment_probe import get_framework_versions, get_system_info
+from build_cache import DEFAULT_CACHE_DIR, get_artifact_dir, get_cache_key_inputs, get_or_build_executable
+from result_writer import ResultWriter
+from sample_store import SAMPLE_FORMATS, get_samples_dir, store_samples
+from page_cache import LAUNCH_MODES, LaunchPreparer
+from startup_calibration import CALIBRATION_MODES, DEFAULT_CALIBRATION_DURATION_MS, DEFAULT_CALIBRATION_RUNS, check_divergence, get_calibration_path, get_startup_criteria
+from stopping_rule import StoppingRule, add_iteration_arguments, get_iteration_plan
+from readiness_probe import DEFAULT_READY_TIMEOUT_MS, READINESS_MODES, ReadinessSignal
+from sampler import SAMPLING_BACKENDS, SAMPLING_MODES, Sampler, collect_cpu, get_sampling_config
 
 ITERATIONS = 50
-
-def get_cpu_model():
-    """Get the CPU model human readable value."""
-    try:
-        if platform.system() == "Windows":
-            output = subprocess.check_output("wmic cpu get Name", shell=True).decode()
-            lines = [line.strip() for line in output.splitlines() if line.strip()]
-            return lines[1] if len(lines) > 1 else "Unknown"
-        else:
-            return platform.processor() or "Unknown"
-    except Exception as e:
-        print(f"Error identifying CPU model: {e}")
-        return "Unknown"
-
-def get_system_info():
-    """
-    Get system info, like CPU, GPU, core and thread count etc.
-    Source: https://stackoverflow.com/questions/37825360/determine-what-gpu-is-running-through-wmi
-    """
-    try:
-        cpu = get_cpu_model()
-        cores = psutil.cpu_count(logical=False)
-        threads = psutil.cpu_count(logical=True)
-        ram = f"{round(psutil.virtual_memory().total / (1024**3))} GB"
-        os_info = f"{platform.system()} {platform.release()} ({platform.version()})"
-        try:
-            gpu = subprocess.check_output("wmic path win32_VideoController get name", shell=True).decode()
-            gpu = [line.strip() for line in gpu.splitlines() if line.strip()][1]
-        except Exception:
-            gpu = "Unknown"
-        return {
-            "os": os_info,
-            "cpu": cpu,
-            "ram": ram,
-            "gpu": gpu,
-            "cpu_cores": cores,
-            "cpu_threads": threads
-        }
-    except Exception as e:
-        print(f"Error identifying system info: {e}")
-        return {}
-
-def get_tool_version_with_cmd(cmd):
-    """Executes a version retrieval command and return the result."""
-    try:
-        return subprocess.check_output(cmd, shell=True).decode().strip()
-    except Exception:
-        return "Unknown"
-
-def get_framework_version_from_package_json(project_type, project_root_directory):
-    """Gets projects frameworks version from package.json."""
-    package_json_path = os.path.join(project_root_directory, "package.json")
-    try:
-        with open(package_json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        deps = data.get("dependencies", {})
-        dev_deps = data.get("devDependencies", {})
-        
-        if project_type == "tauri":
-            return deps.get("@tauri-apps/api") or dev_deps.get("@tauri-apps/api") or "Unknown"
-        elif project_type == "electronjs":
-            return deps.get("electron") or dev_deps.get("electron") or "Unknown"
-    except Exception:
-        return "Unknown"
-
-def get_framework_versions(project_type, project_root_directory):
-    """Get the versions for the project used tools."""
-    framework_version = get_framework_version_from_package_json(project_type, project_root_directory)
-    if project_type == "tauri":
-        return {
-            "tauri": framework_version,
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-            "cargo": get_tool_version_with_cmd("cargo --version").replace("cargo ", ""),
-            "rust": get_tool_version_with_cmd("rustc --version").replace("rustc ", ""),
-        }
-    elif project_type == "electronjs":
-        return {
-            "electron": framework_version,
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-        }
-    else:
-        return {
-            "node": get_tool_version_with_cmd("node -v"),
-            "npm": get_tool_version_with_cmd("npm -v"),
-        }
+MIN_ITERATIONS = 10
+# Startup that did not end by then failed, whatever the app is waiting for.
+DEFAULT_STARTUP_TIMEOUT_MS = 120000
 
 def get_build_file_path(project_type, src_dir, executable_type):
     """Gets the .exe file path."""
@@ -105,106 +29,125 @@ def get_build_file_path(project_type, src_dir, executable_type):
         exe_path = src_dir / "dist" / "win-unpacked" / "blendio-electronjs.exe"
         return exe_path  
 
-def run_command(cmd, cwd):
-    """Executes a given cmd and outputs its stdout to the terminal."""
-    
-    print(f"\nRunning passed command: {cmd} (in {cwd})")
-    start_ms = time.time_ns() // 1_000_000
-    proc = subprocess.Popen(cmd, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    if proc.stdout:
-        for line in proc.stdout:
-            print(line, end='')
-    
-    proc.wait()
-    end_ms = time.time_ns() // 1_000_000 # From ns to ms.
-    return {
-        "cmd": cmd,
-        "cwd": str(cwd),
-        "start_ms": start_ms,
-        "end_ms": end_ms,
-        "duration_ms": end_ms - start_ms,
-        "success": proc.returncode == 0,
-    }
-    
-def monitor_startup_performance(exe_path, expected_main_process_count, cpu_threshold):
-    """Launches the given .exe and waits for it to fully instance."""
+def build_executable(project_dir, build_commands):
+    """Installs dependencies and runs the build commands, returns True if every step succeeded."""
+    steps = [run_command("npm install", cwd=project_dir)]
+    for cmd in build_commands:
+        steps.append(run_command(cmd, cwd=project_dir))
+    return all(step["success"] for step in steps)
     
+def get_windowed_cpu_percent(start_up_instance_moments, window_ms):
+    """Averages the CPU usage of the samples that fall within the trailing window."""
+    latest = start_up_instance_moments[-1]
+    if window_ms <= 0:
+        return latest["cpu_percent"]
+    window_start_ms = latest["elapsed_ms"] - window_ms
+    window = [m["cpu_percent"] for m in start_up_instance_moments if m["elapsed_ms"] >= window_start_ms]
+    return sum(window) / len(window)
+
+def collect_main_process_count(procs, tick):
+    """Counts the processes of the launched application."""
+    return {"main_process_count": len(procs)}
+
+def get_startup_duration_ms(iteration):
+    """Gets the key metric of a startup iteration, None when the launch failed."""
+    startup = iteration.get("startup_instances") or {}
+    return startup.get("duration_ms") if startup.get("success") else None
+
+def monitor_startup_performance(exe_path, expected_main_process_count, cpu_threshold, sampling=None, sampling_backend="psutil", readiness="heuristic", ready_timeout_ms=DEFAULT_READY_TIMEOUT_MS, launch=None, startup_timeout_ms=DEFAULT_STARTUP_TIMEOUT_MS):
+    """
+    Launches the given .exe and waits for it to fully instance.
+
+    launch is the LaunchPreparer of the executable, it evicts the page cache before a cold launch.
+
+    By default startup ends at the first sample with the expected process count and CPU usage
+    below the threshold. Any other readiness mode ends it when the app signals its first frame
+    over that channel (see ReadinessSignal), timed when the signal arrives. The heuristic is the
+    fallback for apps that did not signal within ready_timeout_ms. A startup that did not end
+    within startup_timeout_ms, or whose process exited, is not successful.
+    """
+
+    if sampling is None:
+        sampling = get_sampling_config("fixed")
+
     if not exe_path.exists():
         print(f"Error: Executable not found at {exe_path}")
         return {
             "success": False,
             "error": "Executable not found",
+            "sampling": sampling,
             "start_up_instance_moments": []
         }
 
+    ready_signal = ReadinessSignal(readiness) if readiness != "heuristic" else None
     try:
-        proc = subprocess.Popen([str(exe_path)])
+        launch_info = launch.prepare() if launch else {"mode": "warm"}
+        popen_kwargs = ready_signal.get_popen_kwargs() if ready_signal else {}
+        # Startup is timed from right before Popen on the monotonic clock,
+        # wall clock values are only kept for correlating with other results.
+        start_ms = int(time.time() * 1000)
+        start_ns = time.monotonic_ns()
+        proc = subprocess.Popen([str(exe_path)], **popen_kwargs)
+        if ready_signal:
+            ready_signal.start(proc)
         parent = psutil.Process(proc.pid)
         print(f"Launched {exe_path.name} with PID {proc.pid}")
 
-        # Warm-up CPU counters for accurate immediate readings
-        for p in [parent] + parent.children(recursive=True):
-            try:
-                p.cpu_percent(interval=None)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-
-        start_ms = int(time.time() * 1000)
-        start_up_instance_moments = []
-
-        while True:
-            iteration_start = time.time()
-
-            if proc.poll() is not None:
-                print("Process exited early during startup.")
-                break
-
-            try:
-                all_procs = parent.children(recursive=True)
-                all_procs.insert(0, parent)
-
-                timestamp_ms = int(time.time() * 1000)
-
-                total_cpu = 0.0
-                main_process_count = 0
-
-                for p in all_procs:
-                    if not p.is_running():
-                        continue
-                    try:
-                        cpu = p.cpu_percent(interval=None)
-                        total_cpu += cpu
-                        main_process_count += 1
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        continue
-
-                # Log the current state
-                start_up_instance_moments.append({
-                    "timestamp_ms": timestamp_ms,
-                    "main_pid": parent.pid,
-                    "main_name": parent.name(),
-                    "cpu_percent": total_cpu,
-                    "main_process_count": main_process_count
-                })
-
-                print(f"[{timestamp_ms}] CPU: {total_cpu:.2f}% | Main procs: {main_process_count}")
-
-                # Check if criteria are met
-                if total_cpu < cpu_threshold and main_process_count >= expected_main_process_count:
-                    print("Startup criteria met.")
-                    break
-
-            except psutil.NoSuchProcess:
-                print("Main process ended.")
-                break
-
-            # Maintain consistent interval
-            iteration_duration = time.time() - iteration_start
-            time_to_sleep = max(0, 1.0 - iteration_duration)
-            time.sleep(time_to_sleep)
-
-        end_ms = int(time.time() * 1000)
-        duration_ms = end_ms - start_ms
+        cpu_window_ms = sampling.get("cpu_window_ms", 0)
+
+        def startup_criteria_met(start_up_instance_moments):
+            latest = start_up_instance_moments[-1]
+            if latest["elapsed_ms"] >= startup_timeout_ms:
+                return True
+            if ready_signal and (ready_signal.is_set() or latest["elapsed_ms"] < ready_timeout_ms):
+                return ready_signal.is_set()
+            # Short samples are too coarse for per-tick CPU readings,
+            # so the threshold is checked against a trailing window.
+            windowed_cpu = get_windowed_cpu_percent(start_up_instance_moments, cpu_window_ms)
+            return windowed_cpu < cpu_threshold and latest["main_process_count"] >= expected_main_process_count
+
+        def print_moment(moment):
+            print(f"[{moment['elapsed_ms']:.1f} ms] CPU: {moment['cpu_percent']:.2f}% | Main procs: {moment['main_process_count']}")
+
+        sampler = Sampler(
+            parent,
+            [collect_cpu, collect_main_process_count],
+            sampling,
+            stop_condition=startup_criteria_met,
+            on_sample=print_moment,
+            start_ns=start_ns,
+            backend=sampling_backend,
+        )
+        if ready_signal:
+            # Ends the wait for the next sample as soon as the app signals.
+            ready_signal.on_signal = sampler.stop
+        start_up_instance_moments = sampler.run()
+        signal_ms = ready_signal.get_signal_ms(start_ns) if ready_signal else None
+
+        timed_out = signal_ms is None and sampler.stop_reason == "criteria_met" and start_up_instance_moments[-1]["elapsed_ms"] >= startup_timeout_ms
+        if signal_ms is not None:
+            print(f"App signalled readiness after {signal_ms:.1f} ms.")
+        elif timed_out:
+            print(f"Startup did not end within {startup_timeout_ms} ms.")
+        elif sampler.stop_reason == "criteria_met":
+            print("Startup criteria met." if not ready_signal else "No readiness signal, startup criteria met.")
+        elif sampler.stop_reason == "process_exited":
+            print("Process exited early during startup.")
+
+        end_ns = time.monotonic_ns()
+        duration_ms = round((end_ns - start_ns) / 1_000_000, 3)
+        if signal_ms is not None:
+            duration_ms = signal_ms
+        elif start_up_instance_moments:
+            # Startup ends at the sample that met the criteria, not after the bookkeeping.
+            duration_ms = start_up_instance_moments[-1]["elapsed_ms"]
+        end_ms = start_ms + int(duration_ms)
+        if launch:
+            launch.observe(parent)
+        try:
+            final_process_count = len(parent.children(recursive=True)) + 1
+        except psutil.NoSuchProcess:
+            final_process_count = None
 
         # Cleanup
         try:
@@ -217,23 +160,39 @@ def monitor_startup_performance(exe_path, expected_main_process_count, cpu_thres
                 p.kill()
         except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
             print(f"Warning: Failed to cleanly terminate processes: {e}")
+        if ready_signal:
+            ready_signal.close()
 
+        error = "Startup timed out" if timed_out else "Process exited during startup" if sampler.stop_reason == "process_exited" else None
         return {
             "start_ms": start_ms,
             "end_ms": end_ms,
             "duration_ms": duration_ms,
-            "success": True,
+            "success": error is None,
+            **({"error": error} if error else {}),
+            "final_process_count": final_process_count,
+            "launch": launch_info,
+            "readiness": {
+                "mode": readiness,
+                "signalled": signal_ms is not None,
+                "signal_ms": signal_ms,
+                "ready_timeout_ms": ready_timeout_ms if ready_signal else None,
+            },
+            **sampler.describe(),
             "start_up_instance_moments": start_up_instance_moments
         }
 
     except Exception as e:
         print(f"Error during startup monitoring: {e}")
+        if ready_signal:
+            ready_signal.close()
         return {
             "start_ms": int(time.time() * 1000),
             "end_ms": int(time.time() * 1000),
             "duration_ms": 0,
             "success": False,
             "error": str(e),
+            "sampling": sampling,
             "start_up_instance_moments": []
         }
         
@@ -242,7 +201,23 @@ def main():
     parser.add_argument("--project_type", required=True)
     parser.add_argument("--config", required=True)
     parser.add_argument("--output_dir", required=False)
+    parser.add_argument("--resume", action="store_true", help="Continue after the iterations already in the output directory")
+    parser.add_argument("--build_cache_dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no_build_cache", action="store_true", help="Always run npm install and the build commands on the first iteration")
+    parser.add_argument("--sampling_backend", choices=SAMPLING_BACKENDS, default="psutil")
+    parser.add_argument("--sample_format", choices=SAMPLE_FORMATS, default="columnar", help="Store samples as binary columns next to the results or inline as JSON")
+    add_iteration_arguments(parser, MIN_ITERATIONS)
+    parser.add_argument("--sampling_mode", choices=sorted(SAMPLING_MODES), default="fixed")
+    parser.add_argument("--launch_mode", choices=LAUNCH_MODES, default="warm", help="cold evicts the executable, its libraries and resources from the page cache before every launch")
+    parser.add_argument("--readiness", choices=READINESS_MODES, default="heuristic", help="How the end of startup is detected, every mode but heuristic waits for a signal from the app")
+    parser.add_argument("--calibrate", choices=CALIBRATION_MODES, default="auto", help="auto reuses the stored calibration of a test case while the executable is unchanged, off uses the fixed criteria")
+    parser.add_argument("--calibration_file", type=Path, required=False, help="Defaults to <config stem>.calibration.json next to the config")
+    parser.add_argument("--calibration_runs", type=int, default=DEFAULT_CALIBRATION_RUNS)
+    parser.add_argument("--calibration_duration_ms", type=int, default=DEFAULT_CALIBRATION_DURATION_MS)
+    parser.add_argument("--startup_timeout_ms", type=int, default=DEFAULT_STARTUP_TIMEOUT_MS, help="A startup that did not end by then fails")
+    parser.add_argument("--ready_timeout_ms", type=int, default=DEFAULT_READY_TIMEOUT_MS, help="Falls back to the heuristic when the app did not signal within this time")
     args = parser.parse_args()
+    iteration_plan = get_iteration_plan(args, ITERATIONS)
 
     with open(args.config, "r", encoding="utf-8") as f:
         config = json.load(f)
@@ -262,16 +237,28 @@ def main():
 
     test_cases = config["tests"]
     print(test_cases)
+    calibration_path = args.calibration_file or get_calibration_path(args.config)
 
     for test_case in test_cases:
         print(f"\n=== Running test case: {test_case['result_file_name']} ===")
-        all_results = []
+        writer = ResultWriter(result_dir, test_case["result_file_name"], resume=args.resume)
+        stopping_rule = StoppingRule("duration_ms", **iteration_plan)
+        stopping_rule.seed(writer.records, get_startup_duration_ms)
+        if stopping_rule.is_done():
+            print("All iterations already done, skipping.")
+            writer.close()
+            continue
+        build_file_path = None
+        criteria = None
+        launch = None
 
         system_info = get_system_info()
         framework_versions = get_framework_versions(args.project_type, project_dir)
 
-        for i in range(ITERATIONS):
-            print(f"\n--- Iteration {i+1}/{ITERATIONS} ---")
+        for i in range(stopping_rule.max_iterations):
+            if writer.is_completed(i + 1):
+                continue
+            print(f"\n--- Iteration {i+1}/{stopping_rule.max_iterations} ---")
             session_start_ms = time.time_ns() // 1_000_000
             iteration = {
                 "iteration": i + 1,
@@ -281,32 +268,57 @@ def main():
                 "build_commands_used": test_case.get("build_commands", [])
             }
 
-            if i == 0:
-                run_command("npm install", cwd=project_dir)
-            if i == 0:
-                for cmd in test_case.get("build_commands", []):
-                    run_command(cmd, cwd=project_dir)
+            # Build on the first iteration that runs, which is not the first one when resuming.
+            if build_file_path is None:
+                build_commands = test_case.get("build_commands", [])
+                build_file_path = get_build_file_path(args.project_type, src_dir, test_case["executable_type"])
+                build_cache_info = None
+                if args.no_build_cache:
+                    build_executable(project_dir, build_commands)
+                else:
+                    artifact_dir = get_artifact_dir(args.project_type, src_dir, test_case["executable_type"])
+                    build_file_path, build_cache_info = get_or_build_executable(
+                        args.build_cache_dir,
+                        lambda: get_cache_key_inputs(args.project_type, project_dir, test_case["executable_type"], build_commands, framework_versions),
+                        artifact_dir, build_file_path,
+                        lambda: build_executable(project_dir, build_commands),
+                    )
+            iteration["build_cache"] = build_cache_info
         
-            build_file_path = get_build_file_path(args.project_type, src_dir, test_case["executable_type"])
             if build_file_path.exists():
                 print(f"\nLaunching and monitoring: {build_file_path}")
                 usage_result = {}
-                if args.project_type == "tauri":
-                    usage_result = monitor_startup_performance(build_file_path, 7, 1.0)
-                elif args.project_type == "electronjs":
-                    usage_result = monitor_startup_performance(build_file_path, 4, 1.0)
+                sampling = get_sampling_config(test_case.get("sampling_mode", args.sampling_mode))
+                readiness = test_case.get("readiness", args.readiness)
+                if criteria is None:
+                    criteria = get_startup_criteria(
+                        args.calibrate, args.project_type, build_file_path, calibration_path, test_case["result_file_name"],
+                        args.calibration_runs, args.calibration_duration_ms, args.sampling_backend,
+                    )
+                    print(f"Startup criteria ({criteria['source']}): {criteria['expected_main_process_count']} processes, CPU below {criteria['cpu_threshold']}%")
+                if launch is None:
+                    launch = LaunchPreparer(test_case.get("launch_mode", args.launch_mode), build_file_path)
+                    print(f"Launch mode: {launch.mode}")
+                usage_result = monitor_startup_performance(build_file_path, criteria["expected_main_process_count"], criteria["cpu_threshold"], sampling, args.sampling_backend, readiness, args.ready_timeout_ms, launch, args.startup_timeout_ms)
+                if usage_result.get("launch", {}).get("evicted") is False:
+                    print("Warning: the page cache cannot be evicted on this platform, the cold launch ran warm.")
                 iteration["startup_instances"] = usage_result
+                iteration["startup_criteria"] = {**criteria, "warnings": check_divergence(criteria, usage_result) if usage_result.get("success") else []}
+                for warning in iteration["startup_criteria"]["warnings"]:
+                    print(f"Warning: {warning}.")
+                if args.sample_format == "columnar":
+                    store_samples(usage_result, "start_up_instance_moments", get_samples_dir(result_dir, test_case["result_file_name"]), i + 1)
             else:
                 print(f"Executable not found at {build_file_path}")
-            
-            all_results.append(iteration)
 
-        # Write results to the corresponding test case's file
-        result_file = result_dir / test_case["result_file_name"]
-        with open(result_file, "w", encoding="utf-8") as f:
-            json.dump(all_results, f, indent=2)
+            iteration["stopping_rule"] = stopping_rule.add(i + 1, get_startup_duration_ms(iteration))
+            print(stopping_rule.describe())
+            writer.append(iteration)
+            if stopping_rule.is_done():
+                break
 
-        print(f"\nResults saved to {result_file}")
+        writer.close()
+        print(f"\nResults saved to {writer.path}")
 
 
 if __name__ == "__main__":
@@ -2,39 +2,95 @@ import json
 import csv
 import argparse
 from pathlib import Path
+from result_writer import list_result_files, read_results
+from sample_store import load_samples
+from startup_calibration import DEFAULT_STARTUP_CRITERIA
+from startup_milestones import MILESTONE_FIELDS, get_observed_process_counts, get_process_count_field, get_startup_milestones
+from aggregation import (
+    DEFAULT_BOOTSTRAP_RESAMPLES, DEFAULT_CONFIDENCE, describe_columns, get_statistics_rows,
+    load_column, nonzero_mean, to_metric_array, write_summary,
+)
 
-def compute_averages(rows):
-    def safe_avg(key):
-        values = [float(r[key]) for r in rows if r.get(key)]
-        return round(sum(values) / len(values), 2) if values else ""
+# Results written before the sampling cadence was recorded were polled once per second.
+LEGACY_SAMPLING = {"mode": "fixed", "interval_ms": 1000}
 
+def describe_sampling(sampling):
+    """Returns a short label for the sampling cadence stored in a result."""
+    sampling = sampling or LEGACY_SAMPLING
+    if sampling["mode"] == "fixed":
+        return f"fixed({sampling['interval_ms']}ms)"
+    return f"{sampling['mode']}({sampling['fast_interval_ms']}-{sampling['slow_interval_ms']}ms)"
+
+def describe_readiness(readiness):
+    """Returns how the end of startup was detected, the signal mode or "<mode>_fallback" when the heuristic decided."""
+    if not readiness or readiness["mode"] == "heuristic":
+        return "heuristic"
+    return readiness["mode"] if readiness["signalled"] else f"{readiness['mode']}_fallback"
+
+def describe_launch_mode(launch):
+    """Returns the launch mode of a startup, "cold_unevicted" when the page cache could not be evicted."""
+    if not launch:
+        return "warm"
+    return "cold_unevicted" if launch.get("evicted") is False else launch["mode"]
+
+def get_milestone_columns(process_counts):
+    """Gets the startup milestone columns for the given process counts, see startup_milestones.py."""
+    return MILESTONE_FIELDS + [get_process_count_field(count) for count in process_counts]
+
+def get_averaged_fields(process_counts):
+    return ["process_count", "duration_ms", "duration_s", *get_milestone_columns(process_counts)]
+
+def get_metrics(rows, averaged_fields):
+    return {key: to_metric_array(load_column(rows, key)) for key in averaged_fields}
+
+def compute_averages(metrics, averaged_fields, suffix=""):
     return {
-        "file_name": "AVERAGES",
-        "process_count": safe_avg("process_count"),
-        "duration_ms": safe_avg("duration_ms"),
-        "duration_s": safe_avg("duration_s"),
+        "file_name": f"AVERAGES{suffix}",
+        **{key: nonzero_mean(metrics[key]) for key in averaged_fields},
     }
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--project_type", required=True)
-    parser.add_argument("--input_dir", required=True)
-    parser.add_argument("--output_csv", default="runtime_results_detailed.csv")
-    parser.add_argument("--config", required=True)
-    args = parser.parse_args()
-
-    input_dir = Path(args.input_dir)
-    config_path = Path(args.config)
-    output_csv = Path(args.output_csv)
+def convert(project_type, input_dir, output_csv, config_path, summary_json=None, confidence=DEFAULT_CONFIDENCE, bootstrap_resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+    """Converts the result files of one suite run to a CSV and a statistics summary JSON."""
+    input_dir = Path(input_dir)
+    config_path = Path(config_path)
+    output_csv = Path(output_csv)
+    summary_json = Path(summary_json) if summary_json else output_csv.with_name(f"{output_csv.stem}_summary.json")
+    summary = {
+        "suite": "startup",
+        "project_type": project_type,
+        "confidence": confidence,
+        "bootstrap_resamples": bootstrap_resamples,
+        "tests": {},
+    }
 
     with open(config_path, "r", encoding="utf-8") as f:
         config = json.load(f)
 
     test_map = {test["result_file_name"]: test for test in config["tests"]}
 
+    result_files = []
+    for result_file_name, json_file in list_result_files(input_dir):
+        if result_file_name not in test_map:
+            print(f"Skipping unrecognized file: {json_file.name}")
+            continue
+        try:
+            result_files.append((result_file_name, json_file, read_results(json_file)))
+        except Exception as e:
+            print(f"Failed to read {json_file.name}: {e}")
+
+    # Every process count a launch went through gets a milestone column, the header is shared by all result files.
+    process_counts = set()
+    for _, json_file, iterations in result_files:
+        for iter_data in iterations:
+            startup = iter_data.get("startup_instances")
+            if startup:
+                process_counts.update(get_observed_process_counts(load_samples(startup, "start_up_instance_moments", json_file.parent)))
+    process_counts = sorted(process_counts)
+    averaged_fields = get_averaged_fields(process_counts)
+
     with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
-        if args.project_type == "tauri":
+        if project_type == "tauri":
             fieldnames = [
                 "file_name", "iteration", "timestamp_ms", "main_pid", "main_name",
                 "executable_type", "system_os", "system_cpu", "system_gpu", "system_ram",
@@ -42,9 +98,10 @@ def main():
                 "node_version", "npm_version", "cargo_version", "rust_version",
                 "build_commands_used",
                 "start_ms", "end_ms", "duration_ms", "duration_s", "success",
-                "process_count",
+                "process_count", "sampling", "readiness", "launch_mode",
+                *get_milestone_columns(process_counts),
             ]
-        elif args.project_type == "electronjs":
+        elif project_type == "electronjs":
             fieldnames = [
                 "file_name", "iteration", "timestamp_ms", "main_pid", "main_name",
                 "executable_type", "system_os", "system_cpu", "system_gpu", "system_ram",
@@ -52,38 +109,42 @@ def main():
                 "node_version", "npm_version",
                 "build_commands_used",
                 "start_ms", "end_ms", "duration_ms", "duration_s", "success",
-                "process_count",
+                "process_count", "sampling", "readiness", "launch_mode",
+                *get_milestone_columns(process_counts),
             ]
 
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
-        for json_file in sorted(input_dir.glob("*.json")):
-            if json_file.name not in test_map:
-                print(f"Skipping unrecognized file: {json_file.name}")
-                continue
-
-            test_params = test_map[json_file.name]
-
-            try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    iterations = json.load(f)
-            except Exception as e:
-                print(f"Failed to read {json_file.name}: {e}")
-                continue
-
+        for result_file_name, json_file, iterations in result_files:
+            test_params = test_map[result_file_name]
             all_rows = []
+            samplings = set()
+            readinesses = set()
+            # Launches that failed before the first sample have no row.
+            unsampled_failures = {}
 
             for iter_data in iterations:
                 startup = iter_data.get("startup_instances")
-                if not startup or not startup.get("start_up_instance_moments"):
+                if not startup:
                     continue
+                launch_mode = describe_launch_mode(startup.get("launch"))
+                moments = load_samples(startup, "start_up_instance_moments", json_file.parent)
+                if not moments:
+                    if not startup.get("success"):
+                        unsampled_failures[launch_mode] = unsampled_failures.get(launch_mode, 0) + 1
+                    continue
+
+                sampling = describe_sampling(startup.get("sampling"))
+                samplings.add(sampling)
+                readiness = describe_readiness(startup.get("readiness"))
+                readinesses.add(readiness)
 
-                instance = startup["start_up_instance_moments"][-1]
+                instance = moments[-1]
                 row = {}
-                if args.project_type == "tauri":
+                if project_type == "tauri":
                     row = {
-                        "file_name": json_file.name,
+                        "file_name": result_file_name,
                         "iteration": iter_data.get("iteration", ""),
                         "timestamp_ms": instance.get("end_ms", ""),
                         "main_pid": instance.get("main_pid", ""),
@@ -105,11 +166,14 @@ def main():
                         "duration_ms": startup.get("duration_ms", ""),
                         "duration_s": round(startup.get("duration_ms", 0) / 1000, 2),
                         "success": startup.get("success", ""),
-                        "process_count": instance.get("process_count", "")
+                        "process_count": instance.get("process_count", ""),
+                        "sampling": sampling,
+                        "readiness": readiness,
+                        "launch_mode": launch_mode,
                     }
-                elif args.project_type == "electronjs":
+                elif project_type == "electronjs":
                     row = {
-                        "file_name": json_file.name,
+                        "file_name": result_file_name,
                         "iteration": iter_data.get("iteration", ""),
                         "timestamp_ms": instance.get("end_ms", ""),
                         "main_pid": instance.get("main_pid", ""),
@@ -129,19 +193,69 @@ def main():
                         "duration_ms": startup.get("duration_ms", ""),
                         "duration_s": round(startup.get("duration_ms", 0) / 1000, 2),
                         "success": startup.get("success", ""),
-                        "process_count": instance.get("process_count", "")
+                        "process_count": instance.get("process_count", ""),
+                        "sampling": sampling,
+                        "readiness": readiness,
+                        "launch_mode": launch_mode,
                     }
-                
+
+                criteria = iter_data.get("startup_criteria") or DEFAULT_STARTUP_CRITERIA[project_type]
+                milestones = get_startup_milestones(
+                    moments, criteria["cpu_threshold"], (startup.get("sampling") or {}).get("cpu_window_ms", 0),
+                    process_counts, startup.get("start_ms"),
+                )
+                row.update({field: "" if value is None else value for field, value in milestones.items()})
                 writer.writerow(row)
                 all_rows.append(row)
 
-            if all_rows:
-                avg_row = compute_averages(all_rows)
+            if len(samplings) > 1:
+                print(f"Warning: {json_file.name} mixes sampling cadences {sorted(samplings)}, averages are not comparable.")
+            if len(readinesses) > 1:
+                print(f"Warning: {json_file.name} mixes readiness detection {sorted(readinesses)}, averages are not comparable.")
+
+            # Cold and warm launches are separate distributions, a file holding both gets statistics per launch mode.
+            launch_modes = sorted({row["launch_mode"] for row in all_rows} | set(unsampled_failures))
+            for launch_mode in launch_modes:
+                rows = [row for row in all_rows if row["launch_mode"] == launch_mode]
+                # A launch that timed out or exited lasted as long as the monitor waited, it is left out of the statistics.
+                successful_rows = [row for row in rows if row["success"] is True]
+                failures = len(rows) - len(successful_rows) + unsampled_failures.get(launch_mode, 0)
+                if failures:
+                    print(f"Warning: {json_file.name} has {failures} failed {launch_mode} launch(es), they are left out of the statistics.")
+                suffix = f"_{launch_mode.upper()}" if len(launch_modes) > 1 else ""
+                metrics = get_metrics(successful_rows, averaged_fields)
+                avg_row = compute_averages(metrics, averaged_fields, suffix)
                 writer.writerow(avg_row)
+                descriptions = describe_columns(metrics, {field: (field, 1) for field in averaged_fields}, confidence, bootstrap_resamples)
+                for statistics_row in get_statistics_rows(descriptions, suffix, confidence):
+                    writer.writerow(statistics_row)
+                summary["tests"][f"{result_file_name}[{launch_mode}]" if suffix else result_file_name] = {
+                    "iterations": len(successful_rows),
+                    "failures": failures,
+                    "sampling": sorted(samplings),
+                    "readiness": sorted(readinesses),
+                    "launch_mode": launch_mode,
+                    "columns": descriptions,
+                }
+            if launch_modes:
                 writer.writerow({})  # Empty line
 
+    write_summary(summary_json, summary)
     print(f"\nStartup performance CSV created at: {output_csv}")
+    print(f"Statistics summary created at: {summary_json}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--project_type", required=True)
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_csv", default="runtime_results_detailed.csv")
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--summary_json", required=False, help="Defaults to <output_csv stem>_summary.json")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument("--bootstrap_resamples", type=int, default=DEFAULT_BOOTSTRAP_RESAMPLES)
+    args = parser.parse_args()
 
+    convert(args.project_type, args.input_dir, args.output_csv, args.config, args.summary_json, args.confidence, args.bootstrap_resamples)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,119 @@
+from aggregation import DEFAULT_BOOTSTRAP_RESAMPLES, DEFAULT_CONFIDENCE, bootstrap_mean_ci, get_present_values, student_t_mean_ci
+
+# Below this many values the percentile bootstrap of the mean is far too narrow, the t interval is used instead.
+BOOTSTRAP_MIN_VALUES = 30
+
+def get_iteration_plan(args, iterations):
+    """Reads the iteration options of a suite, iterations is the fixed count used without --target_ci_width."""
+    max_iterations = (args and args.max_iterations) or iterations
+    if args is None or args.target_ci_width is None:
+        return {
+            "min_iterations": max_iterations,
+            "max_iterations": max_iterations,
+        }
+    return {
+        "min_iterations": args.min_iterations,
+        "max_iterations": max_iterations,
+        "target_ci_width": args.target_ci_width,
+        "confidence": args.confidence,
+    }
+
+def add_iteration_arguments(parser, min_iterations):
+    """Adds the options that decide how many iterations every test case runs."""
+    parser.add_argument("--min_iterations", type=int, default=min_iterations, help="Iterations before the stopping rule is checked")
+    parser.add_argument("--max_iterations", type=int, required=False, help="Defaults to the fixed iteration count of the suite")
+    parser.add_argument("--target_ci_width", type=float, required=False, help="Stop once the confidence interval of the key metric is narrower than this fraction of its mean, e.g. 0.05")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+
+class StoppingRule:
+    """
+    Decides how many iterations a test case runs.
+
+    Without a target width every test case runs max_iterations, like the fixed ITERATIONS did.
+    With one, a test case runs at least min_iterations and stops once the confidence interval
+    of the mean of its key metric is narrower than target_ci_width times the mean, or after
+    max_iterations. Below BOOTSTRAP_MIN_VALUES values the interval is a Student-t interval,
+    from BOOTSTRAP_MIN_VALUES values on it is a percentile bootstrap. Iterations without a
+    value for the metric (failed runs) count towards the limits but not towards the interval.
+    """
+
+    def __init__(self, metric, min_iterations, max_iterations, target_ci_width=None, confidence=DEFAULT_CONFIDENCE, resamples=DEFAULT_BOOTSTRAP_RESAMPLES):
+        self.metric = metric
+        self.min_iterations = min(min_iterations, max_iterations)
+        self.max_iterations = max_iterations
+        self.target_ci_width = target_ci_width
+        self.confidence = confidence
+        self.resamples = resamples
+        self.values = {}
+        self.decision = None
+
+    def seed(self, records, get_value):
+        """Feeds the iterations an earlier run already wrote, preferring the value it recorded."""
+        for record in sorted(records, key=lambda record: record["iteration"]):
+            recorded = record.get("stopping_rule")
+            value = recorded["value"] if recorded else get_value(record)
+            self.values[record["iteration"]] = value
+        if self.values:
+            self.decision = self.evaluate()
+        return self.decision
+
+    def add(self, iteration_number, value):
+        """Records the key metric of a finished iteration and returns the decision taken after it."""
+        self.values[iteration_number] = value
+        self.decision = {"value": value, **self.evaluate()}
+        return self.decision
+
+    def is_done(self):
+        return self.decision is not None and self.decision["decision"] == "stop"
+
+    def evaluate(self):
+        iterations = len(self.values)
+        values = get_present_values(value for value in self.values.values() if value is not None)
+        decision = {
+            "metric": self.metric,
+            "iterations": iterations,
+            "min_iterations": self.min_iterations,
+            "max_iterations": self.max_iterations,
+            "target_ci_width": self.target_ci_width,
+            "confidence": self.confidence,
+            "mean": None,
+            "ci_low": None,
+            "ci_high": None,
+            "ci_width": None,
+            "interval": None,
+        }
+        if len(values) > 1:
+            mean = sum(values) / len(values)
+            if len(values) < BOOTSTRAP_MIN_VALUES:
+                ci_low, ci_high = student_t_mean_ci(values, self.confidence)
+                decision["interval"] = "student_t"
+            else:
+                ci_low, ci_high = bootstrap_mean_ci(values, self.confidence, self.resamples)
+                decision["interval"] = "bootstrap"
+            decision.update({
+                "mean": round(mean, 2),
+                "ci_low": round(ci_low, 2),
+                "ci_high": round(ci_high, 2),
+                "ci_width": round((ci_high - ci_low) / mean, 4),
+            })
+
+        if iterations >= self.max_iterations:
+            return {**decision, "decision": "stop", "reason": "max_iterations"}
+        if self.target_ci_width is None:
+            return {**decision, "decision": "continue", "reason": "fixed"}
+        if iterations < self.min_iterations:
+            return {**decision, "decision": "continue", "reason": "min_iterations"}
+        if decision["ci_width"] is not None and decision["ci_width"] <= self.target_ci_width:
+            return {**decision, "decision": "stop", "reason": "ci_width"}
+        return {**decision, "decision": "continue", "reason": "ci_too_wide"}
+
+    def describe(self):
+        """Returns a one line summary of the latest decision."""
+        decision = self.decision
+        if decision["ci_width"] is None:
+            width = "no interval yet"
+        else:
+            width = f"CI width {decision['ci_width']:.1%} of the mean"
+            if self.target_ci_width is not None:
+                width += f" (target {self.target_ci_width:.1%})"
+        return f"{self.metric} after {decision['iterations']} iterations: {width}, {decision['decision']} ({decision['reason']})"
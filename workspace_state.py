@@ -0,0 +1,138 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+STATE_LINK_MODES = ["auto", "reflink", "hardlink", "copy"]
+
+def get_state_paths(project_type):
+    """Gets the project relative directories that make up the build state."""
+    if project_type == "tauri":
+        return ["node_modules", "src-tauri/target", "dist"]
+    return ["node_modules", "dist"]
+
+def get_preconditions(test_case, project_type):
+    """
+    Derives the state every iteration after the first one starts from.
+
+    A directory the test case deletes starts out "absent", every other one starts from the
+    "snapshot" taken after the first, fully clean iteration. cargo clean is a timed step,
+    so target is restored and then cleaned by the iteration itself.
+    """
+    preconditions = {
+        "node_modules": "absent" if test_case.get("delete_node_modules") else "snapshot",
+        "dist": "absent" if test_case.get("delete_dist") else "snapshot",
+    }
+    if project_type == "tauri":
+        preconditions["src-tauri/target"] = "snapshot"
+    return preconditions
+
+def get_trash_dir(project_dir):
+    """Gets the directory deleted build state is moved to, next to the project on the same file system."""
+    project_dir = Path(project_dir)
+    return project_dir.parent / f".{project_dir.name}-trash"
+
+def move_to_trash(path, project_dir):
+    """Moves a directory out of the project with a single rename instead of deleting it file by file."""
+    path = Path(path)
+    if not path.exists():
+        return False
+    trash_dir = get_trash_dir(project_dir)
+    trash_dir.mkdir(parents=True, exist_ok=True)
+    path.rename(trash_dir / f"{path.name}-{uuid.uuid4().hex}")
+    return True
+
+def empty_trash(project_dir):
+    """Deletes everything moved to the trash, meant to run outside of timed steps."""
+    trash_dir = get_trash_dir(project_dir)
+    if trash_dir.exists():
+        shutil.rmtree(trash_dir, ignore_errors=True)
+
+def supports_reflink(directory):
+    """Checks if copies in the given directory can share blocks through reflinks."""
+    if not sys.platform.startswith("linux"):
+        return False
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    probe = directory / f".reflink-probe-{uuid.uuid4().hex}"
+    probe_copy = probe.with_suffix(".copy")
+    try:
+        probe.write_bytes(b"reflink probe")
+        result = subprocess.run(["cp", "--reflink=always", str(probe), str(probe_copy)], capture_output=True)
+        return result.returncode == 0
+    except OSError:
+        return False
+    finally:
+        for p in (probe, probe_copy):
+            if p.exists():
+                p.unlink()
+
+def copy_tree(src, dst, mode):
+    """Copies a directory tree with reflinks, hardlinks or plain copies."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if mode == "reflink":
+        subprocess.run(["cp", "-a", "--reflink=always", str(src), str(dst)], check=True)
+    elif mode == "hardlink":
+        shutil.copytree(src, dst, symlinks=True, copy_function=os.link)
+    else:
+        shutil.copytree(src, dst, symlinks=True)
+
+class WorkspaceState:
+    """
+    Snapshots the build state of a project once and restores it before iterations.
+
+    Reflinks give every restore its own copy-on-write files. Hardlinks are faster than copies
+    but share files with the snapshot, so a tool that rewrites a file in place (cargo
+    fingerprints do) also changes the snapshot. "auto" therefore only picks reflinks or copies.
+    """
+
+    def __init__(self, project_dir, state_dir, state_paths, mode="auto"):
+        self.project_dir = Path(project_dir)
+        self.state_dir = Path(state_dir)
+        self.state_paths = state_paths
+        if mode == "auto":
+            mode = "reflink" if supports_reflink(self.state_dir) else "copy"
+        self.mode = mode
+        # A snapshot left on disk by an interrupted run is picked up again when resuming.
+        self.snapshotted = {state_path: (self.state_dir / state_path).exists() for state_path in state_paths}
+
+    def snapshot(self):
+        """Stores the current build state, replacing any earlier snapshot."""
+        start_ns = time.monotonic_ns()
+        for state_path in self.state_paths:
+            src = self.project_dir / state_path
+            dst = self.state_dir / state_path
+            if dst.exists():
+                move_to_trash(dst, self.project_dir)
+            self.snapshotted[state_path] = src.exists()
+            if src.exists():
+                copy_tree(src, dst, self.mode)
+        duration_ms = (time.monotonic_ns() - start_ns) // 1_000_000
+        print(f"Snapshotted build state {self.state_paths} ({self.mode}) in {duration_ms} ms")
+        return duration_ms
+
+    def restore(self, preconditions):
+        """Brings every state directory into its declared precondition and returns what was done."""
+        start_ns = time.monotonic_ns()
+        restored = {}
+        for state_path, precondition in preconditions.items():
+            target = self.project_dir / state_path
+            move_to_trash(target, self.project_dir)
+            if precondition == "snapshot" and self.snapshotted.get(state_path):
+                copy_tree(self.state_dir / state_path, target, self.mode)
+                restored[state_path] = "snapshot"
+            else:
+                restored[state_path] = "absent"
+        return {
+            "mode": self.mode,
+            "paths": restored,
+            "duration_ms": (time.monotonic_ns() - start_ns) // 1_000_000,
+        }
+
+    def discard(self):
+        """Removes the snapshot."""
+        move_to_trash(self.state_dir, self.project_dir)
+        self.snapshotted = {}